@@ -8,7 +8,18 @@ from app.auth.middleware import get_current_user
 from app.config import get_settings
 from app.database.database import get_db
 from app.database.models import AgentConfig
-from app.agents.manager import init_agent_manager
+from app.agents.manager import get_agent_manager
+from app.agents.admission import admission_controller
+from app.agents.column_values import value_dictionary_stats
+from app.agents.engine_registry import engine_registry
+from app.agents.join_graph import join_graph_stats
+from app.agents.query_export import export_slots
+from app.agents.query_guard import plan_cache
+from app.agents.result_store import result_store
+from app.agents.schema_catalog import catalog_stats, get_schema_catalog
+from app.agents.sql_tools import query_cache
+from app.agents.tool_executor import single_flight, tool_executor
+from app.llm.client_pool import llm_client_pool
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
@@ -23,6 +34,9 @@ class AgentResponse(BaseModel):
     schema_name: str | None
     is_active: bool
     tool_names: str | None
+    max_query_cost: float | None
+    pool_size: int | None
+    max_overflow: int | None
 
     class Config:
         orm_mode = True
@@ -36,6 +50,9 @@ class AgentUpdateRequest(BaseModel):
     schema_name: str | None = None
     is_active: bool | None = None
     tool_names: str | None = None
+    max_query_cost: float | None = None
+    pool_size: int | None = None
+    max_overflow: int | None = None
 
 
 @router.get("/agents", response_model=List[AgentResponse])
@@ -73,18 +90,90 @@ def update_agent(
         agent.is_active = payload.is_active
     if payload.tool_names is not None:
         agent.tool_names = payload.tool_names
+    if payload.max_query_cost is not None:
+        agent.max_query_cost = payload.max_query_cost
+    if payload.pool_size is not None:
+        agent.pool_size = payload.pool_size
+    if payload.max_overflow is not None:
+        agent.max_overflow = payload.max_overflow
 
     db.add(agent)
     db.commit()
     db.refresh(agent)
 
-    # Reinitialize AgentManager so changes take effect immediately
-    settings = get_settings()
-    init_agent_manager(settings)
+    # Ricostruisce solo l'agente modificato: gli altri agenti e i loro client restano in uso
+    get_agent_manager().reload_agent(agent.name)
 
     return agent
 
 
+# ========================================
+# METRICS & QUERY CACHE ENDPOINTS
+# ========================================
+
+@router.get("/metrics")
+def get_metrics(user_id: int = Depends(get_current_user)):
+    """Return runtime metrics of the SQL tools (thread pool, per-db queues, caches, pools)."""
+    return {
+        "sql_tools": tool_executor.stats(),
+        "single_flight": single_flight.stats(),
+        "exports": export_slots.stats(),
+        "query_cache": query_cache.stats(),
+        "query_plans": plan_cache.stats(),
+        "engines": engine_registry.stats(),
+        "schema_catalogs": catalog_stats(),
+        "column_values": value_dictionary_stats(),
+        "join_graphs": join_graph_stats(),
+        "result_store": result_store.stats(),
+        "llm_clients": llm_client_pool.stats(),
+        "admission": admission_controller.stats(),
+    }
+
+
+@router.get("/cache/stats")
+def get_query_cache_stats(user_id: int = Depends(get_current_user)):
+    """Return hit/miss counters and occupancy of the sql_select result cache."""
+    return query_cache.stats()
+
+
+@router.post("/agents/{agent_id}/cache/flush")
+def flush_agent_query_cache(
+    agent_id: int,
+    user_id: int = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Flush the cached sql_select results of the agent's database."""
+    agent = db.query(AgentConfig).filter(AgentConfig.id == agent_id).first()
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agente non trovato.")
+
+    # Le chiavi della cache usano "" per il database di default
+    removed = query_cache.invalidate(agent.db_uri or "")
+    return {"agent": agent.name, "removed_entries": removed}
+
+
+@router.post("/agents/{agent_id}/schema/refresh")
+def refresh_agent_schema_catalog(
+    agent_id: int,
+    user_id: int = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Reload the agent's in-memory schema catalog (get_schema tool and schema digest in the prompt)."""
+    agent = db.query(AgentConfig).filter(AgentConfig.id == agent_id).first()
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agente non trovato.")
+
+    catalog = get_schema_catalog(agent.db_uri, agent.schema_name)
+    try:
+        catalog.load()
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Refresh catalogo fallito: {exc}")
+
+    # Il riepilogo dello schema nel system prompt segue il catalogo ricaricato
+    get_agent_manager().refresh_schema_digests()
+    return catalog.stats()
+
+
 # ========================================
 # SCHEDULED TASKS ENDPOINTS
 # ========================================
@@ -93,12 +182,15 @@ from datetime import datetime
 from app.database.models import ScheduledTask
 from app.services.scheduler_service import get_scheduler_service
 from app.services.email_service import EmailService
-from app.agents.manager import get_agent_manager
 import json
 import logging
+from app.llm.factory import resolve_provider
 
 logger = logging.getLogger(__name__)
 
+# Chiave di ammissione comune a tutti i report schedulati (gli utenti reali hanno id interi)
+SCHEDULED_TASKS_USER = "scheduled"
+
 
 class ScheduleCreateRequest(BaseModel):
     name: str
@@ -189,9 +281,20 @@ async def execute_scheduled_task(task_id: int, db: Session):
         if not agent:
             raise ValueError(f"Agent '{task.agent_name}' not found")
 
-        # Execute agent query using datapizza-ai Agent API
-        # Use a_run() instead of ainvoke() - it's the correct async method
-        result = await agent.a_run(task.prompt)
+        # Ammissione come per la chat: i task schedulati sono un unico "utente" nella coda
+        # equa, così molti report alla stessa ora non occupano gli slot degli utenti
+        ticket = admission_controller.request(
+            SCHEDULED_TASKS_USER, task.agent_name, resolve_provider(get_settings(), "agent")
+        )
+        try:
+            # Nessun timeout di coda: nessuno attende la risposta, il report aspetta il suo turno
+            async for position in ticket.queue_positions(timeout=0):
+                logger.info(f"Scheduled task {task.name} waiting for admission (queue position {position})")
+            # Execute agent query using datapizza-ai Agent API
+            # Use a_run() instead of ainvoke() - it's the correct async method
+            result = await agent.a_run(task.prompt)
+        finally:
+            ticket.release()
 
         # Extract response content
         if hasattr(result, "text") and getattr(result, "text", None):
@@ -0,0 +1,294 @@
+"""
+Controllo di ammissione delle richieste chat prima di agent.a_run().
+
+A fine mese decine di utenti interrogano lo stesso agente nello stesso momento:
+ogni chat_stream avviava subito agent.a_run(), con errori 529 dal provider LLM
+e SQL Server sovraccarico. Qui ogni esecuzione deve prima ottenere uno slot
+rispettando tre limiti (0 = nessun limite):
+- per agente    (ADMISSION_MAX_PER_AGENT)
+- per provider  (ADMISSION_MAX_PER_PROVIDER), condiviso da tutti gli agenti
+- per utente    (ADMISSION_MAX_PER_USER)
+
+Le richieste che non rientrano attendono in una coda per utente; gli slot
+liberati vengono assegnati a turno tra gli utenti in attesa (round-robin),
+così chi invia molte domande non scavalca gli altri. Durante l'attesa
+chat_stream invia al client la posizione stimata in coda; oltre
+ADMISSION_QUEUE_TIMEOUT_SECONDS la richiesta viene rifiutata.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, List, Optional, Tuple
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class AdmissionTimeoutError(RuntimeError):
+    """La richiesta è rimasta in coda oltre ADMISSION_QUEUE_TIMEOUT_SECONDS."""
+
+
+def _resolve_waiter(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionTicket:
+    """Una richiesta in attesa (o in esecuzione) sotto il controllo di ammissione."""
+
+    def __init__(
+        self,
+        controller: "AdmissionController",
+        user_id: Hashable,
+        agent_name: str,
+        provider: str,
+        loop: asyncio.AbstractEventLoop,
+    ):
+        self.controller = controller
+        self.user_id = user_id
+        self.agent_name = agent_name
+        self.provider = provider
+        self.loop = loop
+        self.admitted = False
+        self.released = False
+        self.queued_at = time.perf_counter()
+        # Risolto (e sostituito) ad ogni ammissione o cambio della coda
+        self._changed: asyncio.Future = loop.create_future()
+
+    @property
+    def resources(self) -> Tuple[Tuple[str, Hashable], ...]:
+        return (("agent", self.agent_name), ("provider", self.provider), ("user", self.user_id))
+
+    def _notify(self) -> None:
+        """Wake the waiting request. Caller holds the controller lock."""
+        changed, self._changed = self._changed, self.loop.create_future()
+        try:
+            self.loop.call_soon_threadsafe(_resolve_waiter, changed)
+        except RuntimeError:
+            pass  # Loop già chiuso: nessuno sta più aspettando
+
+    async def queue_positions(self, timeout: Optional[float] = None) -> AsyncIterator[int]:
+        """
+        Wait for admission, yielding the estimated queue position whenever it changes.
+
+        Yields nothing when the request is admitted straight away.
+
+        Raises:
+            AdmissionTimeoutError: If not admitted within ``timeout`` seconds
+        """
+        timeout = settings.admission_queue_timeout_seconds if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        last_position = None
+        while True:
+            with self.controller._lock:
+                if self.admitted:
+                    return
+                changed = self._changed
+                position = self.controller._position(self)
+
+            if position != last_position:
+                last_position = position
+                yield position
+
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                with self.controller._lock:
+                    self.controller._counters.timeouts += 1
+                raise AdmissionTimeoutError(
+                    f"Servizio occupato: troppe richieste in coda per l'agente '{self.agent_name}'. "
+                    "Riprova tra qualche minuto."
+                )
+            await asyncio.wait({changed}, timeout=remaining)
+
+    def release(self) -> None:
+        """Free the slot (or leave the queue). Idempotent."""
+        self.controller._release(self)
+
+
+class _Counters:
+    def __init__(self):
+        self.admitted = 0
+        self.queued = 0  # Richieste che hanno dovuto attendere
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+
+class AdmissionController:
+    """
+    Slot di esecuzione per agente, provider e utente con coda equa tra utenti.
+
+    Come DatabaseGate (tool_executor) lo stato è protetto da un lock e ogni
+    richiesta viene risvegliata sul proprio event loop.
+
+    Example:
+        >>> ticket = admission_controller.request(user_id, "vendite", "anthropic")
+        >>> try:
+        ...     async for position in ticket.queue_positions():
+        ...         print("in coda", position)
+        ...     await agent.a_run(message)
+        ... finally:
+        ...     ticket.release()
+    """
+
+    def __init__(self, max_per_agent: int, max_per_provider: int, max_per_user: int):
+        self.limits = {"agent": max_per_agent, "provider": max_per_provider, "user": max_per_user}
+        self._lock = threading.Lock()
+        self._active: Dict[Tuple[str, Hashable], int] = {}
+        # Coda per utente; l'ordine delle chiavi è il turno del round-robin
+        self._queues: "OrderedDict[Hashable, Deque[AdmissionTicket]]" = OrderedDict()
+        self._counters = _Counters()
+
+    def _fits(self, ticket: AdmissionTicket) -> bool:
+        for resource in ticket.resources:
+            limit = self.limits[resource[0]]
+            if limit > 0 and self._active.get(resource, 0) >= limit:
+                return False
+        return True
+
+    def _grant(self, ticket: AdmissionTicket) -> None:
+        """Caller holds ``_lock``."""
+        for resource in ticket.resources:
+            self._active[resource] = self._active.get(resource, 0) + 1
+        ticket.admitted = True
+        wait_ms = (time.perf_counter() - ticket.queued_at) * 1000
+        self._counters.admitted += 1
+        self._counters.wait_ms_total += wait_ms
+        self._counters.wait_ms_max = max(self._counters.wait_ms_max, wait_ms)
+
+    def _dispatch(self) -> None:
+        """
+        Admit waiting requests, one user at a time in round-robin order. Caller holds ``_lock``.
+
+        Within a user's queue the oldest request that fits the limits goes first
+        (a request blocked on its agent does not hold back the same user's
+        requests to other agents). After each admission the user moves to the
+        end of the rotation.
+        """
+        granted = True
+        while granted:
+            granted = False
+            for user_id, queue in self._queues.items():
+                ticket = next((t for t in queue if self._fits(t)), None)
+                if ticket is None:
+                    continue
+                queue.remove(ticket)
+                self._grant(ticket)
+                ticket._notify()
+                if queue:
+                    self._queues.move_to_end(user_id)
+                else:
+                    del self._queues[user_id]
+                granted = True
+                break
+
+    def _notify_waiting(self) -> None:
+        """Let every waiting request recompute its position. Caller holds ``_lock``."""
+        for queue in self._queues.values():
+            for ticket in queue:
+                ticket._notify()
+
+    def _position(self, ticket: AdmissionTicket) -> int:
+        """
+        Estimated 1-based position of a waiting request. Caller holds ``_lock``.
+
+        With round-robin, the k-th request (0-based) of a user is preceded by
+        its own k requests and, for every other waiting user, by up to k + 1
+        requests if that user comes earlier in the rotation, k otherwise.
+        """
+        queue = self._queues.get(ticket.user_id)
+        if not queue or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        ahead, earlier = 0, True
+        for user_id, other in self._queues.items():
+            if user_id == ticket.user_id:
+                earlier = False
+                continue
+            ahead += min(len(other), index + 1 if earlier else index)
+        return 1 + index + ahead
+
+    def request(self, user_id: Hashable, agent_name: str, provider: str) -> AdmissionTicket:
+        """
+        Enqueue a request; it is admitted immediately when a slot is free.
+
+        The caller must always call ``release()`` on the returned ticket.
+        """
+        ticket = AdmissionTicket(self, user_id, agent_name, provider, asyncio.get_running_loop())
+        with self._lock:
+            self._queues.setdefault(user_id, deque()).append(ticket)
+            self._dispatch()
+            if not ticket.admitted:
+                self._counters.queued += 1
+                self._notify_waiting()
+        return ticket
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket.admitted:
+                for resource in ticket.resources:
+                    self._active[resource] -= 1
+                    if not self._active[resource]:
+                        del self._active[resource]
+            else:
+                # Uscita dalla coda: timeout o client disconnesso
+                queue = self._queues.get(ticket.user_id)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[ticket.user_id]
+            self._dispatch()
+            self._notify_waiting()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return active/queued requests and saturation per agent and provider."""
+        with self._lock:
+            waiting: List[AdmissionTicket] = [t for queue in self._queues.values() for t in queue]
+            active = dict(self._active)
+            counters = self._counters
+            admitted = counters.admitted
+
+            def usage(kind: str) -> Dict[str, Dict[str, Any]]:
+                limit = self.limits[kind]
+                queued: Dict[Hashable, int] = {}
+                for ticket in waiting:
+                    name = dict(ticket.resources)[kind]
+                    queued[name] = queued.get(name, 0) + 1
+                names = {name for (k, name) in active if k == kind} | set(queued)
+                result = {}
+                for name in sorted(names, key=str):
+                    running = active.get((kind, name), 0)
+                    result[str(name)] = {
+                        "active": running,
+                        "limit": limit,
+                        "queued": queued.get(name, 0),
+                        "saturation": round(running / limit, 2) if limit > 0 else None,
+                    }
+                return result
+
+            return {
+                "limits": dict(self.limits),
+                "queue_timeout_seconds": settings.admission_queue_timeout_seconds,
+                "agents": usage("agent"),
+                "providers": usage("provider"),
+                "active_users": sum(1 for (kind, _) in active if kind == "user"),
+                "waiting_users": len(self._queues),
+                "queued": len(waiting),
+                "admitted": admitted,
+                "queued_total": counters.queued,
+                "timeouts": counters.timeouts,
+                "wait_ms_avg": round(counters.wait_ms_total / admitted, 2) if admitted else 0.0,
+                "wait_ms_max": round(counters.wait_ms_max, 2),
+            }
+
+
+admission_controller = AdmissionController(
+    max_per_agent=settings.admission_max_per_agent,
+    max_per_provider=settings.admission_max_per_provider,
+    max_per_user=settings.admission_max_per_user,
+)
@@ -16,6 +16,7 @@ from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from datapizza.clients.anthropic import AnthropicClient
 import anthropic
+import httpx
 import json
 import time
 from datetime import datetime
@@ -44,7 +45,14 @@ class RetryAnthropicClient(AnthropicClient):
         [2025-11-23 10:30:46] [I/O TRACE] OUTPUT: "Hello! How can I help you?"
     """
 
-    def __init__(self, *args, trace_io: bool = False, temperature: float = 1.0, **kwargs):
+    def __init__(
+        self,
+        *args,
+        trace_io: bool = False,
+        temperature: float = 1.0,
+        keepalive_seconds: Optional[float] = None,
+        **kwargs,
+    ):
         """
         Inizializza il client con opzioni retry e tracing.
 
@@ -53,10 +61,40 @@ class RetryAnthropicClient(AnthropicClient):
                      ATTENZIONE: in produzione può generare log molto grandi
             temperature: Temperatura LLM (0.0-1.0, default: 1.0)
                         0.0 = risposte deterministiche, 1.0 = risposte creative
+            keepalive_seconds: Durata delle connessioni HTTP inattive
+                        (None = default dell'SDK, 5 secondi)
         """
+        # Impostato prima di super().__init__, che crea subito il client sincrono
+        self.keepalive_seconds = keepalive_seconds
         super().__init__(*args, temperature=temperature, **kwargs)
         self.trace_io = trace_io  # Flag per abilitare/disabilitare I/O tracing
 
+    def _connection_limits(self) -> httpx.Limits:
+        # Stessi limiti di default dell'SDK Anthropic, con durata keep-alive configurabile
+        return httpx.Limits(
+            max_connections=1000,
+            max_keepalive_connections=100,
+            keepalive_expiry=self.keepalive_seconds,
+        )
+
+    def _set_client(self):
+        if self.keepalive_seconds is None:
+            return super()._set_client()
+        if not self.client:
+            self.client = anthropic.Anthropic(
+                api_key=self.api_key,
+                http_client=anthropic.DefaultHttpxClient(limits=self._connection_limits()),
+            )
+
+    def _set_a_client(self):
+        if self.keepalive_seconds is None:
+            return super()._set_a_client()
+        if not self.a_client:
+            self.a_client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=self._connection_limits()),
+            )
+
     def _log_io(self, direction: str, data: Any, duration_ms: float = None):
         """
         Logga input/output delle chiamate LLM per debugging.
@@ -0,0 +1,325 @@
+"""
+Dizionario dei valori delle colonne categoriche per il tool get_column_values.
+
+Il modello scrive spesso query di prova come SELECT DISTINCT Famiglia FROM
+vendite.Movimenti solo per sapere quali valori usare nei filtri. Qui ogni
+(db_uri, schema_name) ha un dizionario precalcolato in background:
+- Colonne candidate: testo (char/varchar/nchar/nvarchar) di lunghezza massima
+  fino a COLUMN_VALUES_MAX_LENGTH, delle sole tabelle (non viste) del catalogo
+- Per ogni colonna una query su un campione delle prime COLUMN_VALUES_SAMPLE_ROWS
+  righe (GROUP BY sul campione, NOLOCK su SQL Server): i conteggi sono
+  approssimati e riportati al numero di righe della tabella (sys.partitions)
+- Colonne con più di COLUMN_VALUES_MAX_DISTINCT valori distinti sono marcate ad
+  alta cardinalità: per quelle il tool suggerisce un filtro LIKE
+
+Il dizionario viene ricostruito dallo scheduler ogni COLUMN_VALUES_REFRESH_MINUTES
+e salvato accanto agli snapshot del catalogo (SCHEMA_SNAPSHOT_DIR). Il tool
+legge solo la memoria: nessuna query sulle tabelle durante la conversazione.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import column as sql_column, func, select, table as sql_table, text
+
+from app.agents.engine_registry import engine_registry
+from app.agents.schema_catalog import (
+    SchemaCatalog,
+    TableInfo,
+    get_schema_catalog,
+    snapshot_file,
+    write_snapshot_file,
+)
+from app.config import get_settings
+from app.database.database import mask_db_uri
+
+settings = get_settings()
+
+# Tipi di colonna considerati categorici (se abbastanza corti)
+CATEGORICAL_TYPES = ("char", "varchar", "nchar", "nvarchar")
+
+# Versione del formato dei file: file di versioni diverse vengono ignorati
+VALUES_SNAPSHOT_VERSION = 1
+
+
+class ColumnValues(NamedTuple):
+    """Valori di una colonna con conteggio approssimato, il più frequente per primo."""
+    values: Tuple[Tuple[Optional[str], int], ...]
+    high_cardinality: bool  # Più di COLUMN_VALUES_MAX_DISTINCT valori distinti nel campione
+    sampled_rows: int
+    total_rows: Optional[int]  # Righe della tabella (None se non disponibile)
+
+
+def candidate_columns(tables: Iterable[TableInfo]) -> List[Tuple[TableInfo, str]]:
+    """Return the (table, column) pairs whose values are worth precomputing."""
+    max_length = settings.column_values_max_length
+    candidates = []
+    for table in tables:
+        if table.table_type != "BASE TABLE":
+            continue
+        for column in table.columns:
+            if column.data_type.lower() not in CATEGORICAL_TYPES:
+                continue
+            # CHARACTER_MAXIMUM_LENGTH = -1 per (n)varchar(max)
+            if column.max_length is None or not 0 < column.max_length <= max_length:
+                continue
+            candidates.append((table, column.name))
+    return candidates
+
+
+def _values_key(table_full_name: str, column: str) -> str:
+    return f"{table_full_name}.{column}".lower()
+
+
+def _count_table_rows(conn, table: TableInfo) -> Optional[int]:
+    """Row count from the SQL Server metadata (no scan); None on other dialects."""
+    if conn.dialect.name != "mssql":
+        return None
+    row = conn.execute(
+        text(
+            "SELECT SUM(p.rows) FROM sys.partitions p "
+            "WHERE p.object_id = OBJECT_ID(:name) AND p.index_id IN (0, 1)"
+        ),
+        {"name": f"[{table.schema}].[{table.name}]"},
+    ).scalar()
+    return int(row) if row is not None else None
+
+
+def _sample_column(conn, table: TableInfo, column: str, total_rows: Optional[int]) -> ColumnValues:
+    """Group a sample of ``column`` and scale the counts to the table size."""
+    sample_rows = settings.column_values_sample_rows
+    max_distinct = settings.column_values_max_distinct
+
+    base = sql_table(table.name, sql_column(column), schema=table.schema)
+    sample_query = select(base.c[column].label("value")).limit(sample_rows)
+    if conn.dialect.name == "mssql":
+        # Lettura "sporca": il campione non deve attendere né bloccare i lock dell'ERP
+        sample_query = sample_query.with_hint(base, "WITH (NOLOCK)", "mssql")
+    sample = sample_query.subquery()
+    occurrences = func.count().label("occurrences")
+    grouped = (
+        select(sample.c.value, occurrences)
+        .group_by(sample.c.value)
+        .order_by(occurrences.desc())
+        .limit(max_distinct + 1)
+    )
+    rows = conn.execute(grouped).fetchall()
+
+    high_cardinality = len(rows) > max_distinct
+    rows = rows[:max_distinct]
+    sampled = sum(count for _, count in rows)
+    if high_cardinality:
+        return ColumnValues((), True, sampled, total_rows)
+
+    scale = total_rows / sampled if total_rows and sampled and total_rows > sampled else 1.0
+    values = tuple(
+        (None if value is None else str(value), int(round(count * scale)))
+        for value, count in rows
+    )
+    return ColumnValues(values, False, sampled, total_rows)
+
+
+class ValueDictionary:
+    """
+    Valori delle colonne categoriche di un singolo (db_uri, schema_name).
+
+    Example:
+        >>> dictionary = get_value_dictionary(None, "vendite")
+        >>> dictionary.refresh()
+        >>> dictionary.lookup("vendite.Movimenti", "Famiglia")
+    """
+
+    def __init__(self, db_uri: Optional[str], schema_name: Optional[str]):
+        self.db_uri = db_uri
+        self.schema_name = schema_name
+        self._columns: Dict[str, ColumnValues] = {}
+        self._refresh_lock = threading.Lock()
+        self.refreshed_at: Optional[datetime] = None
+        self.refresh_ms: Optional[float] = None
+        self.failed_columns = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def catalog(self) -> SchemaCatalog:
+        return get_schema_catalog(self.db_uri, self.schema_name)
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        return snapshot_file("values", self.db_uri, self.schema_name)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    def lookup(self, table_full_name: str, column: str) -> Optional[ColumnValues]:
+        return self._columns.get(_values_key(table_full_name, column))
+
+    def is_stale(self) -> bool:
+        if self.refreshed_at is None:
+            return True
+        age = (datetime.now() - self.refreshed_at).total_seconds()
+        return age >= settings.column_values_refresh_minutes * 60
+
+    def refresh(self, force: bool = True) -> None:
+        """
+        Rebuild the dictionary with one sampled query per candidate column.
+
+        Args:
+            force: If False, skip the refresh while the current dictionary is not stale
+
+        A failing column is skipped (and counted); the new dictionary replaces
+        the old one in a single assignment once all columns are done.
+        """
+        with self._refresh_lock:
+            if not force and not self.is_stale():
+                return
+
+            catalog = self.catalog
+            catalog.ensure_loaded()
+            candidates = candidate_columns(catalog.list_tables())[:settings.column_values_max_columns]
+
+            started = time.perf_counter()
+            columns: Dict[str, ColumnValues] = {}
+            failed = 0
+            try:
+                with engine_registry.get(self.db_uri).connect() as conn:
+                    row_counts: Dict[str, Optional[int]] = {}
+                    for table, column in candidates:
+                        try:
+                            if table.full_name not in row_counts:
+                                row_counts[table.full_name] = _count_table_rows(conn, table)
+                            columns[_values_key(table.full_name, column)] = _sample_column(
+                                conn, table, column, row_counts[table.full_name]
+                            )
+                        except Exception as exc:
+                            failed += 1
+                            conn.rollback()
+                            print(f"[ColumnValues] {table.full_name}.{column} saltata: {exc}")
+            except Exception as exc:
+                self.last_error = str(exc)
+                raise
+
+            self._columns = columns
+            self.refreshed_at = datetime.now()
+            self.refresh_ms = (time.perf_counter() - started) * 1000
+            self.failed_columns = failed
+            self.last_error = None
+            self._save_snapshot()
+
+        print(
+            f"[ColumnValues] {mask_db_uri(self.db_uri)} schema={self.schema_name or '*'}: "
+            f"{len(columns)} colonne in {self.refresh_ms:.0f}ms ({failed} saltate)"
+        )
+
+    def _save_snapshot(self) -> None:
+        path = self.snapshot_path
+        if path is None:
+            return
+        document = {
+            "version": VALUES_SNAPSHOT_VERSION,
+            "db": mask_db_uri(self.db_uri),
+            "schema": self.schema_name,
+            "refreshed_at": self.refreshed_at.isoformat(),
+            "columns": {
+                key: [[list(v) for v in entry.values], entry.high_cardinality, entry.sampled_rows, entry.total_rows]
+                for key, entry in self._columns.items()
+            },
+        }
+        try:
+            write_snapshot_file(path, document)
+        except OSError as exc:
+            print(f"[ColumnValues] Snapshot non salvato ({path}): {exc}")
+
+    def load_snapshot(self) -> bool:
+        """Load the dictionary saved by the last refresh, if the dictionary is still empty."""
+        path = self.snapshot_path
+        if path is None or not os.path.exists(path):
+            return False
+        with self._refresh_lock:
+            if self.refreshed_at is not None:
+                return False
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    document = json.load(handle)
+                if document.get("version") != VALUES_SNAPSHOT_VERSION:
+                    return False
+                columns = {
+                    key: ColumnValues(tuple((v, c) for v, c in values), high, sampled, total)
+                    for key, (values, high, sampled, total) in document["columns"].items()
+                }
+                refreshed_at = datetime.fromisoformat(document["refreshed_at"])
+            except (OSError, ValueError, KeyError, TypeError) as exc:
+                print(f"[ColumnValues] Snapshot ignorato ({path}): {exc}")
+                return False
+            self._columns = columns
+            self.refreshed_at = refreshed_at
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        columns = self._columns
+        return {
+            "db": mask_db_uri(self.db_uri),
+            "schema": self.schema_name,
+            "columns": len(columns),
+            "high_cardinality": sum(1 for c in columns.values() if c.high_cardinality),
+            "failed_columns": self.failed_columns,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            "refresh_ms": round(self.refresh_ms, 1) if self.refresh_ms is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+# Registry globale dei dizionari, chiave (db_uri, schema_name) come i cataloghi
+_dictionaries: Dict[Tuple[str, str], ValueDictionary] = {}
+_dictionaries_lock = threading.Lock()
+
+
+def get_value_dictionary(db_uri: Optional[str], schema_name: Optional[str]) -> ValueDictionary:
+    """Return (creating it, from its snapshot file if any) the dictionary for (db_uri, schema_name)."""
+    key = (db_uri or "", schema_name or "")
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(key)
+        created = dictionary is None
+        if created:
+            dictionary = _dictionaries[key] = ValueDictionary(db_uri, schema_name)
+    if created:
+        dictionary.load_snapshot()
+    return dictionary
+
+
+def retain_value_dictionaries(keys: Iterable[Tuple[Optional[str], Optional[str]]]) -> None:
+    """Drop the dictionaries whose (db_uri, schema_name) is no longer used by any agent."""
+    keep = {(db_uri or "", schema_name or "") for db_uri, schema_name in keys}
+    with _dictionaries_lock:
+        for key in list(_dictionaries):
+            if key not in keep:
+                del _dictionaries[key]
+
+
+def refresh_stale_value_dictionaries() -> None:
+    """
+    Rebuild the dictionaries older than COLUMN_VALUES_REFRESH_MINUTES.
+
+    Called by the scheduler. A failing database does not stop the others.
+    """
+    with _dictionaries_lock:
+        dictionaries = list(_dictionaries.values())
+
+    for dictionary in dictionaries:
+        try:
+            dictionary.refresh(force=False)
+        except Exception as exc:
+            print(
+                f"[ColumnValues] Refresh fallito per {mask_db_uri(dictionary.db_uri)} "
+                f"schema={dictionary.schema_name or '*'}: {exc}"
+            )
+
+
+def value_dictionary_stats() -> List[Dict[str, Any]]:
+    """Return the status of every registered dictionary (for /api/admin/metrics)."""
+    with _dictionaries_lock:
+        dictionaries = list(_dictionaries.values())
+    return [dictionary.stats() for dictionary in dictionaries]
@@ -0,0 +1,241 @@
+"""
+Registry degli engine SQLAlchemy usati dai tool SQL degli agenti.
+
+Ogni db_uri configurato su un agente ha un proprio engine (e quindi un pool
+di connessioni). Il registry:
+- Crea gli engine con i parametri di pool da settings (SQL_POOL_*), oppure
+  da chat_ai.agents.pool_size / max_overflow se impostati sull'agente
+- Dopo ogni (re)inizializzazione dell'AgentManager riceve l'elenco dei db_uri
+  ancora referenziati e chiude (dispose) i pool di quelli rimossi o modificati
+- Chiude i pool inattivi da più di SQL_ENGINE_IDLE_SECONDS (job dello scheduler):
+  l'engine viene ricreato alla prima query successiva
+- Espone per ogni engine le connessioni in uso / libere / in overflow
+
+db_uri None indica il database dell'applicazione: il suo engine è quello di
+app.database.database e non viene mai chiuso dal registry.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import get_settings
+from app.database.database import engine as default_engine, mask_db_uri
+
+settings = get_settings()
+
+
+class PoolConfig(NamedTuple):
+    """Parametri del pool di connessioni di un engine."""
+    pool_size: int
+    max_overflow: int
+    pool_recycle: int
+    pool_timeout: int
+
+    @classmethod
+    def from_settings(cls) -> "PoolConfig":
+        return cls(
+            pool_size=settings.sql_pool_size,
+            max_overflow=settings.sql_max_overflow,
+            pool_recycle=settings.sql_pool_recycle_seconds,
+            pool_timeout=settings.sql_pool_timeout_seconds,
+        )
+
+
+def merge_pool_configs(configs: Iterable[Optional[PoolConfig]]) -> Optional[PoolConfig]:
+    """
+    Merge the pool configs of the agents sharing one db_uri, field by field with ``max``.
+
+    An agent without override (None) needs the settings default: once any
+    agent on the database has an override, the default takes part in the
+    merge, so a smaller override never shrinks the pool of the others.
+
+    Returns:
+        The merged config, or None when no agent has an override
+    """
+    configs = list(configs)
+    if all(config is None for config in configs):
+        return None
+    default = PoolConfig.from_settings()
+    return PoolConfig(*(max(values) for values in zip(*(config or default for config in configs))))
+
+
+def _pool_status(engine: Engine) -> Dict[str, Any]:
+    """Read the QueuePool counters (other pool classes report what they support)."""
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if counter is not None:
+            try:
+                status[name] = counter()
+            except Exception:  # pragma: no cover - dipende dal tipo di pool
+                status[name] = None
+    return status
+
+
+def set_driver_timeout(conn: Connection, seconds: int) -> Callable[[], None]:
+    """
+    Set the statement timeout on the raw DBAPI connection and return a restore function.
+
+    ``execution_options={"timeout": ...}`` is ignored by the mssql+pyodbc
+    dialect; pyodbc applies ``Connection.timeout`` (SQL_ATTR_QUERY_TIMEOUT)
+    to every statement. The previous value is restored because the
+    connection goes back to the pool. Drivers without the attribute (e.g.
+    sqlite in dev) are left untouched.
+    """
+    dbapi_connection = conn.connection.dbapi_connection
+    if not hasattr(dbapi_connection, "timeout"):
+        return lambda: None
+
+    previous = dbapi_connection.timeout
+    dbapi_connection.timeout = seconds
+
+    def restore() -> None:
+        try:
+            dbapi_connection.timeout = previous
+        except Exception:  # pragma: no cover - connessione già chiusa
+            pass
+
+    return restore
+
+
+class _EngineEntry:
+    def __init__(self, engine: Engine, config: PoolConfig):
+        self.engine = engine
+        self.config = config
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class EngineRegistry:
+    """
+    Engine per db_uri con dispose automatico.
+
+    Example:
+        >>> engine = engine_registry.get("mssql+pyodbc://...")
+        >>> engine_registry.retain({"mssql+pyodbc://...": None})
+        >>> engine_registry.dispose_idle()
+    """
+
+    def __init__(self, idle_seconds: int):
+        self.idle_seconds = idle_seconds
+        self._entries: Dict[str, _EngineEntry] = {}
+        # Override per db_uri impostati dagli agenti (None = default da settings)
+        self._configs: Dict[str, PoolConfig] = {}
+        self._referenced: Optional[set] = None
+        self._lock = threading.Lock()
+        self.disposed = 0
+
+    def _config_for(self, db_uri: str) -> PoolConfig:
+        return self._configs.get(db_uri) or PoolConfig.from_settings()
+
+    def get(self, db_uri: Optional[str]) -> Engine:
+        """Return the engine for ``db_uri``, creating it on first use."""
+        if not db_uri:
+            return default_engine
+
+        with self._lock:
+            entry = self._entries.get(db_uri)
+            if entry is None:
+                config = self._config_for(db_uri)
+                engine = create_engine(
+                    db_uri,
+                    pool_pre_ping=True,
+                    pool_size=config.pool_size,
+                    max_overflow=config.max_overflow,
+                    pool_recycle=config.pool_recycle,
+                    pool_timeout=config.pool_timeout,
+                    echo=False,
+                )
+                entry = self._entries[db_uri] = _EngineEntry(engine, config)
+                print(
+                    f"[EngineRegistry] Engine creato per {mask_db_uri(db_uri)} "
+                    f"(pool_size={config.pool_size}, max_overflow={config.max_overflow})"
+                )
+            entry.last_used = time.monotonic()
+            return entry.engine
+
+    def _dispose(self, db_uri: str, reason: str) -> None:
+        """Remove and dispose an engine. Caller holds ``_lock``."""
+        entry = self._entries.pop(db_uri)
+        # Le connessioni in uso non vengono interrotte: tornano al pool chiuso
+        # e vengono scartate al check-in
+        entry.engine.dispose()
+        self.disposed += 1
+        print(f"[EngineRegistry] Engine chiuso per {mask_db_uri(db_uri)}: {reason}")
+
+    def retain(self, pool_configs: Dict[str, Optional[PoolConfig]]) -> None:
+        """
+        Declare the db_uris still used by agents, with their pool overrides.
+
+        Engines of db_uris not in ``pool_configs`` are disposed; engines whose
+        pool configuration changed are disposed and recreated on next use.
+
+        Args:
+            pool_configs: db_uri -> PoolConfig override (None = settings defaults)
+        """
+        with self._lock:
+            self._configs = {uri: config for uri, config in pool_configs.items() if config}
+            self._referenced = set(pool_configs)
+            for db_uri in list(self._entries):
+                if db_uri not in self._referenced:
+                    self._dispose(db_uri, "non più usato da nessun agente")
+                elif self._entries[db_uri].config != self._config_for(db_uri):
+                    self._dispose(db_uri, "configurazione del pool modificata")
+
+    def dispose_idle(self) -> int:
+        """
+        Dispose engines unused for more than ``idle_seconds`` and with no checked-out connection.
+
+        Returns:
+            Number of disposed engines
+        """
+        if self.idle_seconds <= 0:
+            return 0
+
+        now = time.monotonic()
+        disposed = 0
+        with self._lock:
+            for db_uri, entry in list(self._entries.items()):
+                if now - entry.last_used < self.idle_seconds:
+                    continue
+                if _pool_status(entry.engine).get("checkedout"):
+                    continue
+                self._dispose(db_uri, f"inattivo da {now - entry.last_used:.0f}s")
+                disposed += 1
+        return disposed
+
+    def dispose_all(self) -> None:
+        """Dispose every managed engine (application shutdown)."""
+        with self._lock:
+            for db_uri in list(self._entries):
+                self._dispose(db_uri, "shutdown")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            engines: List[Dict[str, Any]] = [{
+                "db": mask_db_uri(None),
+                "managed": False,
+                **_pool_status(default_engine),
+            }]
+            for db_uri, entry in self._entries.items():
+                engines.append({
+                    "db": mask_db_uri(db_uri),
+                    "managed": True,
+                    "referenced": self._referenced is None or db_uri in self._referenced,
+                    "pool_size": entry.config.pool_size,
+                    "max_overflow": entry.config.max_overflow,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    **_pool_status(entry.engine),
+                })
+            return {
+                "engines": engines,
+                "disposed_total": self.disposed,
+            }
+
+
+engine_registry = EngineRegistry(idle_seconds=settings.sql_engine_idle_seconds)
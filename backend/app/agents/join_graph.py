@@ -0,0 +1,291 @@
+"""
+Grafo dei join tra tabelle per il tool get_join_path.
+
+Per le query su più tabelle (ordini.testata / ordini.righe / magazzino.prodotti)
+il modello tende a indovinare le chiavi, sbagliare e riprovare. Qui ogni
+db_uri ha un grafo in memoria costruito da:
+- sys.foreign_keys / sys.foreign_key_columns (SQL Server), tutti gli schemi
+- Suggerimenti di chiave da file (JOIN_HINTS_FILE), per viste e tabelle senza
+  foreign key dichiarate. Formato JSON:
+    [{"db": "<db_uri o vuoto = tutti>",
+      "from": "ordini.v_testata", "to": "ordini.righe",
+      "on": [["NumeroOrdine", "NumeroOrdine"], ["Anno", "Anno"]]}]
+
+get_join_path(a, b) cerca il percorso con meno join (BFS) e lo restituisce
+con le condizioni ON pronte. Il grafo viene ricostruito insieme ai cataloghi
+schema, solo se le foreign key o il file dei suggerimenti sono cambiati.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.agents.engine_registry import engine_registry
+from app.config import get_settings
+from app.database.database import mask_db_uri
+
+settings = get_settings()
+
+_FOREIGN_KEYS_QUERY = """
+SELECT
+    fk.name,
+    OBJECT_SCHEMA_NAME(fk.parent_object_id),
+    OBJECT_NAME(fk.parent_object_id),
+    pc.name,
+    OBJECT_SCHEMA_NAME(fk.referenced_object_id),
+    OBJECT_NAME(fk.referenced_object_id),
+    rc.name
+FROM sys.foreign_keys fk
+JOIN sys.foreign_key_columns fkc ON fkc.constraint_object_id = fk.object_id
+JOIN sys.columns pc ON pc.object_id = fkc.parent_object_id AND pc.column_id = fkc.parent_column_id
+JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+ORDER BY fk.object_id, fkc.constraint_column_id
+"""
+
+_FOREIGN_KEYS_FINGERPRINT_QUERY = (
+    "SELECT COUNT(*), CONVERT(varchar(33), MAX(modify_date), 126) FROM sys.foreign_keys"
+)
+
+
+class JoinEdge(NamedTuple):
+    """Relazione tra due tabelle: coppie (colonna di left, colonna di right)."""
+    left: str  # "schema.tabella"
+    right: str
+    columns: Tuple[Tuple[str, str], ...]
+    source: str  # nome della foreign key, oppure "suggerimento"
+
+    def reversed(self) -> "JoinEdge":
+        return JoinEdge(self.right, self.left, tuple((r, l) for l, r in self.columns), self.source)
+
+
+class JoinPath(NamedTuple):
+    tables: Tuple[str, ...]
+    edges: Tuple[JoinEdge, ...]  # edges[i] collega tables[i] a tables[i + 1]
+
+
+def _split(name: str) -> Tuple[Optional[str], str]:
+    cleaned = name.strip().replace("[", "").replace("]", "")
+    if "." in cleaned:
+        schema, table = cleaned.rsplit(".", 1)
+        return schema.strip() or None, table.strip()
+    return None, cleaned
+
+
+def _load_hints(db_uri: Optional[str]) -> List[JoinEdge]:
+    """Read the key hints of ``db_uri`` from JOIN_HINTS_FILE (missing file = no hints)."""
+    path = settings.join_hints_file
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as handle:
+        document = json.load(handle)
+
+    hints = []
+    for item in document:
+        if item.get("db") and item["db"] != (db_uri or ""):
+            continue
+        columns = tuple((str(left), str(right)) for left, right in item["on"])
+        hints.append(JoinEdge(item["from"], item["to"], columns, "suggerimento"))
+    return hints
+
+
+class JoinGraph:
+    """
+    Grafo non orientato delle relazioni tra tabelle di un db_uri.
+
+    Example:
+        >>> graph = get_join_graph(None)
+        >>> graph.refresh()
+        >>> graph.find_path("ordini.testata", "magazzino.prodotti")
+    """
+
+    def __init__(self, db_uri: Optional[str]):
+        self.db_uri = db_uri
+        # nome in minuscolo -> archi uscenti; sostituito per intero ad ogni refresh
+        self._adjacency: Dict[str, List[JoinEdge]] = {}
+        self._names: Dict[str, str] = {}  # minuscolo -> nome originale "schema.tabella"
+        self._refresh_lock = threading.Lock()
+        self.fingerprint: Optional[str] = None
+        self.loaded_at: Optional[datetime] = None
+        self.load_ms: Optional[float] = None
+        self.edge_count = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def _current_fingerprint(self, conn) -> str:
+        hints_path = settings.join_hints_file
+        hints_mtime = os.path.getmtime(hints_path) if hints_path and os.path.exists(hints_path) else None
+        foreign_keys = None
+        if conn.dialect.name == "mssql":
+            row = conn.execute(text(_FOREIGN_KEYS_FINGERPRINT_QUERY)).one()
+            foreign_keys = f"{row[0]}:{row[1]}"
+        return f"{foreign_keys}|{hints_mtime}"
+
+    def refresh(self, force: bool = True) -> bool:
+        """
+        Rebuild the graph if foreign keys or hints changed (always when ``force``).
+
+        Returns:
+            True if the graph was rebuilt
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                with engine_registry.get(self.db_uri).connect() as conn:
+                    fingerprint = self._current_fingerprint(conn)
+                    if not force and self.is_loaded and fingerprint == self.fingerprint:
+                        return False
+                    edges = self._read_foreign_keys(conn) if conn.dialect.name == "mssql" else []
+                edges += _load_hints(self.db_uri)
+            except Exception as exc:
+                self.last_error = str(exc)
+                raise
+
+            adjacency: Dict[str, List[JoinEdge]] = {}
+            names: Dict[str, str] = {}
+            for edge in edges:
+                for oriented in (edge, edge.reversed()):
+                    names[oriented.left.lower()] = oriented.left
+                    adjacency.setdefault(oriented.left.lower(), []).append(oriented)
+
+            self._adjacency, self._names = adjacency, names
+            self.fingerprint = fingerprint
+            self.edge_count = len(edges)
+            self.loaded_at = datetime.now()
+            self.load_ms = (time.perf_counter() - started) * 1000
+            self.last_error = None
+
+        print(
+            f"[JoinGraph] {mask_db_uri(self.db_uri)}: {len(edges)} relazioni tra "
+            f"{len(names)} tabelle in {self.load_ms:.0f}ms"
+        )
+        return True
+
+    @staticmethod
+    def _read_foreign_keys(conn) -> List[JoinEdge]:
+        edges: List[JoinEdge] = []
+        current: Optional[Tuple[str, str, str]] = None
+        columns: List[Tuple[str, str]] = []
+        for name, schema, table, column, ref_schema, ref_table, ref_column in conn.execute(text(_FOREIGN_KEYS_QUERY)):
+            key = (name, f"{schema}.{table}", f"{ref_schema}.{ref_table}")
+            if key != current:
+                if current is not None:
+                    edges.append(JoinEdge(current[1], current[2], tuple(columns), current[0]))
+                current, columns = key, []
+            columns.append((column, ref_column))
+        if current is not None:
+            edges.append(JoinEdge(current[1], current[2], tuple(columns), current[0]))
+        return edges
+
+    def resolve(self, table_name: str) -> List[str]:
+        """Return the graph nodes matching "tabella" or "schema.tabella" (case-insensitive)."""
+        schema, name = _split(table_name)
+        if schema:
+            key = f"{schema}.{name}".lower()
+            return [self._names[key]] if key in self._names else []
+        suffix = f".{name.lower()}"
+        return [original for key, original in self._names.items() if key.endswith(suffix)]
+
+    def find_path(self, start: str, goal: str, max_hops: Optional[int] = None) -> Optional[JoinPath]:
+        """Breadth-first search of the path with the fewest joins between two resolved nodes."""
+        max_hops = max_hops or settings.join_path_max_hops
+        adjacency = self._adjacency
+        start_key, goal_key = start.lower(), goal.lower()
+        if start_key == goal_key:
+            return JoinPath((start,), ())
+
+        previous: Dict[str, Optional[JoinEdge]] = {start_key: None}
+        frontier = deque([(start_key, 0)])
+        while frontier:
+            node, hops = frontier.popleft()
+            if hops >= max_hops:
+                continue
+            for edge in adjacency.get(node, ()):
+                neighbour = edge.right.lower()
+                if neighbour in previous:
+                    continue
+                previous[neighbour] = edge
+                if neighbour == goal_key:
+                    edges = []
+                    while previous[neighbour] is not None:
+                        edges.append(previous[neighbour])
+                        neighbour = previous[neighbour].left.lower()
+                    edges.reverse()
+                    return JoinPath(tuple([edges[0].left] + [e.right for e in edges]), tuple(edges))
+                frontier.append((neighbour, hops + 1))
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "db": mask_db_uri(self.db_uri),
+            "loaded": self.is_loaded,
+            "tables": len(self._names),
+            "relations": self.edge_count,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "load_ms": round(self.load_ms, 1) if self.load_ms is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+def format_join_path(path: JoinPath) -> str:
+    """Render a path as FROM/JOIN clauses with aliases t1, t2, ..."""
+    aliases = {table: f"t{position}" for position, table in enumerate(path.tables, 1)}
+    lines = [f"FROM {path.tables[0]} AS {aliases[path.tables[0]]}"]
+    for edge in path.edges:
+        left, right = aliases[edge.left], aliases[edge.right]
+        condition = " AND ".join(f"{right}.{r} = {left}.{l}" for l, r in edge.columns)
+        lines.append(f"JOIN {edge.right} AS {right} ON {condition}")
+    return "\n".join(lines)
+
+
+# Registry globale dei grafi, chiave db_uri ("" = database di default)
+_graphs: Dict[str, JoinGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_join_graph(db_uri: Optional[str]) -> JoinGraph:
+    """Return (creating it if needed) the join graph of ``db_uri``."""
+    key = db_uri or ""
+    with _graphs_lock:
+        if key not in _graphs:
+            _graphs[key] = JoinGraph(db_uri)
+        return _graphs[key]
+
+
+def retain_join_graphs(db_uris) -> None:
+    """Drop the graphs of databases no longer used by any agent."""
+    keep = {db_uri or "" for db_uri in db_uris}
+    with _graphs_lock:
+        for key in list(_graphs):
+            if key not in keep:
+                del _graphs[key]
+
+
+def refresh_join_graphs() -> None:
+    """
+    Rebuild the graphs whose foreign keys or hints changed.
+
+    Called with the schema catalog refresh. A failing database does not stop the others.
+    """
+    with _graphs_lock:
+        graphs = list(_graphs.values())
+
+    for graph in graphs:
+        try:
+            graph.refresh(force=False)
+        except Exception as exc:
+            print(f"[JoinGraph] Refresh fallito per {mask_db_uri(graph.db_uri)}: {exc}")
+
+
+def join_graph_stats() -> List[Dict[str, Any]]:
+    """Return the status of every registered graph (for /api/admin/metrics)."""
+    with _graphs_lock:
+        graphs = list(_graphs.values())
+    return [graph.stats() for graph in graphs]
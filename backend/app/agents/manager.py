@@ -8,16 +8,69 @@ Questo modulo è responsabile di:
 - Gestire il lifecycle degli agenti (init, reinit)
 - Fornire accesso thread-safe agli agenti tramite singleton pattern
 """
-from typing import Dict, List
+import copy
+import hashlib
+import json
+import threading
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
 from datapizza.agents import Agent
+from sqlalchemy import text
 from datapizza.tools.duckduckgo import DuckDuckGoSearchTool
 
-from app.agents.sql_tools import create_sql_select_tool, create_get_schema_tool
+from app.agents.column_values import retain_value_dictionaries
+from app.agents.engine_registry import PoolConfig, engine_registry, merge_pool_configs
+from app.agents.join_graph import retain_join_graphs
+from app.agents.schema_catalog import SchemaCatalog, get_schema_catalog, retain_catalogs
+from app.agents.schema_digest import get_schema_digest
+from app.agents.sql_tools import (
+    create_get_column_values_tool,
+    create_get_join_path_tool,
+    create_get_schema_tool,
+    create_sql_describe_tool,
+    create_sql_next_page_tool,
+    create_sql_select_batch_tool,
+    create_sql_select_tool,
+)
 from app.config import Settings
 from app.database.database import SessionLocal
 from app.database.models import AgentConfig
-from app.llm.factory import LLMConfigurationError, build_llm_client
+from app.llm.client_pool import llm_client_pool
+from app.llm.factory import LLMConfigurationError
+
+
+# Versione della configurazione agenti: ROWVERSION cambia ad ogni INSERT/UPDATE,
+# COUNT(*) intercetta le DELETE (vedi migrations/ADD_AGENTS_ROW_VERSION.sql)
+_CONFIG_VERSION_QUERY = text(
+    "SELECT COUNT(*), CONVERT(bigint, MAX(row_version)) FROM chat_ai.agents"
+)
+
+
+class _AgentSignature(NamedTuple):
+    """Campi di chat_ai.agents che determinano l'agente costruito (description esclusa)."""
+    system_prompt: Optional[str]
+    model: Optional[str]
+    db_uri: Optional[str]
+    schema_name: Optional[str]
+    tool_names: Optional[str]
+    max_query_cost: Optional[float]
+    pool_size: Optional[int]
+    max_overflow: Optional[int]
+
+    @classmethod
+    def of(cls, agent_config: AgentConfig) -> "_AgentSignature":
+        return cls(*(getattr(agent_config, field) for field in cls._fields))
+
+
+class _AgentEntry(NamedTuple):
+    """Agente costruito e risorse che usa."""
+    agent: Agent
+    signature: _AgentSignature
+    db_uri: Optional[str]
+    schema_name: Optional[str]
+    pool_config: Optional[PoolConfig]
+    digest_catalog: Optional[SchemaCatalog]  # Catalogo del riepilogo schema nel prompt (None = nessuno)
+    description: str  # Mostrata nell'elenco agenti: cambiarla non ricrea l'agente
 
 
 class AgentManager:
@@ -32,16 +85,24 @@ class AgentManager:
         Gli agenti vengono creati leggendo la configurazione da chat_ai.agents.
         """
         self.settings = settings
+        # Registry pubblicato: sostituito per intero (copy-on-write) ad ogni reload,
+        # le richieste in corso continuano a usare il dizionario che hanno letto
         self.agents: Dict[str, Agent] = {}
-        
+        self._entries: Dict[str, _AgentEntry] = {}
+        self._listing: Tuple[str, Dict[str, str]] = ('""', {})  # (ETag, nome -> descrizione)
+        self._reload_lock = threading.Lock()
+        # Versione di chat_ai.agents all'ultimo reload completo (None = non disponibile)
+        self.config_version: Optional[Tuple[int, Optional[int]]] = None
+        self._config_version_unavailable = False
+
         # Create default LLM client (shared by agents unless overridden)
         try:
-            self.default_client = build_llm_client(settings, use_case="agent")
+            self.default_client = llm_client_pool.get(settings, use_case="agent")
         except LLMConfigurationError as exc:  # pragma: no cover - startup failure
             raise RuntimeError(f"Configurazione LLM non valida: {exc}") from exc
-        
+
         # Initialize agents from DB configuration
-        self._init_agents_from_db()
+        self.reload_agents()
 
     def _resolve_tools(self, agent_config: AgentConfig) -> List:
         """
@@ -63,6 +124,12 @@ class AgentManager:
         tools: List = []
         db_uri = agent_config.db_uri  # Connessione DB specifica per questo agente
         schema_name = agent_config.schema_name  # Schema SQL da esplorare (es. 'dbo', 'magazzino')
+        # Soglia di costo stimato per sql_select: quella dell'agente, altrimenti il default globale
+        max_query_cost = (
+            agent_config.max_query_cost
+            if agent_config.max_query_cost is not None
+            else self.settings.query_cost_limit
+        )
 
         # Parse della lista di tool dalla configurazione DB
         if agent_config.tool_names:
@@ -70,17 +137,40 @@ class AgentManager:
         else:
             tool_ids = []
 
+        # Con sql_next_page, sql_select conserva le pagine successive sotto un handle
+        paging = "sql_next_page" in tool_ids
+
         # Registry: mappa tool_id → factory function
         for tool_id in tool_ids:
             if tool_id == "sql_select":
                 # Tool per eseguire query SELECT sul database
-                tools.append(create_sql_select_tool(agent_config.name, db_uri))
+                tools.append(create_sql_select_tool(agent_config.name, db_uri, max_query_cost, paging))
+
+            elif tool_id == "sql_next_page":
+                # Tool per leggere le pagine successive di sql_select senza rieseguire la query
+                tools.append(create_sql_next_page_tool(agent_config.name, db_uri))
+
+            elif tool_id == "sql_select_batch":
+                # Tool per eseguire più SELECT indipendenti in parallelo (un solo giro LLM)
+                tools.append(create_sql_select_batch_tool(agent_config.name, db_uri, max_query_cost))
+
+            elif tool_id == "sql_describe":
+                # Tool per riepiloghi statistici calcolati su tutte le righe della query
+                tools.append(create_sql_describe_tool(agent_config.name, db_uri, max_query_cost))
 
             elif tool_id == "get_schema":
                 # Tool per esplorare schema database (tabelle, colonne)
                 # NUOVO: permette agli agenti di scoprire autonomamente lo schema
                 tools.append(create_get_schema_tool(agent_config.name, db_uri, schema_name))
 
+            elif tool_id == "get_column_values":
+                # Tool per conoscere i valori delle colonne categoriche senza query di prova
+                tools.append(create_get_column_values_tool(agent_config.name, db_uri, schema_name))
+
+            elif tool_id == "get_join_path":
+                # Tool per trovare le condizioni di JOIN tra tabelle (foreign key + suggerimenti)
+                tools.append(create_get_join_path_tool(agent_config.name, db_uri))
+
             elif tool_id == "duckduckgo" or tool_id == "web_search":
                 # Tool per ricerca web (DuckDuckGo)
                 tools.append(DuckDuckGoSearchTool())
@@ -91,109 +181,354 @@ class AgentManager:
 
         return tools
 
-    def _init_agents_from_db(self) -> None:
+    def _pool_config(self, agent_config: AgentConfig) -> Optional[PoolConfig]:
+        """
+        Pool override dell'agente (colonne pool_size / max_overflow), None se non impostato.
+        """
+        if agent_config.pool_size is None and agent_config.max_overflow is None:
+            return None
+        default = PoolConfig.from_settings()
+        return default._replace(
+            pool_size=agent_config.pool_size if agent_config.pool_size is not None else default.pool_size,
+            max_overflow=(
+                agent_config.max_overflow if agent_config.max_overflow is not None else default.max_overflow
+            ),
+        )
+
+    def _release_unused_resources(self, entries: Dict[str, "_AgentEntry"]) -> None:
+        """
+        Comunica al registry engine e ai cataloghi schema quali database sono ancora in uso.
+
+        I pool dei db_uri rimossi (o con configurazione cambiata) vengono chiusi,
+        i cataloghi non più usati smettono di essere aggiornati.
+        """
+        # db_uri (con eventuali pool override) e cataloghi usati dagli agenti attivi
+        overrides: Dict[str, List[Optional[PoolConfig]]] = {}
+        catalog_keys: Set[Tuple[Optional[str], Optional[str]]] = set()
+        for entry in entries.values():
+            catalog_keys.add((entry.db_uri, entry.schema_name))
+            if entry.db_uri:
+                overrides.setdefault(entry.db_uri, []).append(entry.pool_config)
+
+        # Più agenti sullo stesso database: campo per campo vince il valore più grande
+        engine_registry.retain({db_uri: merge_pool_configs(configs) for db_uri, configs in overrides.items()})
+        retain_catalogs(catalog_keys)
+        retain_value_dictionaries(catalog_keys)
+        retain_join_graphs(db_uri for db_uri, _ in catalog_keys)
+
+    def _build_system_prompt(self, base_prompt: str, digest_catalog: Optional[SchemaCatalog]) -> str:
+        """
+        Compone il system prompt: prompt dell'agente + istruzioni generiche di workflow.
+
+        Se l'agente ha un riepilogo dello schema (vedi schema_digest) il riepilogo
+        viene aggiunto in coda e get_schema diventa necessario solo per le tabelle
+        non elencate.
+        """
+        digest = None
+        if digest_catalog is not None:
+            digest = get_schema_digest(digest_catalog, self.settings.schema_digest_max_chars)
+
+        if digest:
+            schema_step = "1. USA lo SCHEMA DEL DATABASE riportato sotto (get_schema solo per tabelle non elencate)\n"
+            schema_rules = (
+                "REGOLE SCHEMA:\n"
+                "- Usa SOLO i nomi di tabelle e colonne dello SCHEMA DEL DATABASE qui sotto\n"
+                "- Per tabelle non elencate usa get_schema prima della query\n"
+            )
+        else:
+            schema_step = "1. USA get_schema per verificare struttura tabelle\n"
+            schema_rules = (
+                "REGOLE SCHEMA:\n"
+                "- PRIMA di qualsiasi query, usa get_schema per verificare nomi colonne esatti\n"
+                "- Se tabella non trovata, prova formato 'schema.tabella'\n"
+            )
+
+        # Suffix generico per tutti gli agenti: impone uno stile di risposta finale
+        # orientato ai risultati, non al piano di azione.
+        response_suffix = (
+            "\n\n"
+            "WORKFLOW OBBLIGATORIO:\n"
+            f"{schema_step}"
+            "2. ESEGUI sql_select con la query appropriata\n"
+            "3. SOLO DOPO aver ricevuto i risultati, rispondi all'utente\n"
+            "\n"
+            "NON rispondere MAI senza aver prima eseguito sql_select.\n"
+            "NON annunciare cosa farai - FALLO e basta.\n"
+            "\n"
+            "Per query complesse (es. 'tra i top N, chi NON ha fatto X'):\n"
+            "- Usa CTE (WITH ... AS) o subquery\n"
+            "- Esempio: WITH TopN AS (SELECT TOP 50 ... GROUP BY ... ORDER BY ... DESC) "
+            "SELECT * FROM TopN WHERE CodiceCliente NOT IN (SELECT CodiceCliente FROM ... WHERE ...)\n"
+            "\n"
+            f"{schema_rules}"
+        )
+        if digest:
+            response_suffix += f"\nSCHEMA DEL DATABASE (tabella(colonna tipo, ...)):\n{digest}\n"
+
+        return f"{base_prompt}{response_suffix}" if base_prompt else response_suffix
+
+    def refresh_schema_digests(self) -> None:
         """
-        Inizializza tutti gli agenti attivi leggendo la configurazione dal database.
+        Aggiorna il system prompt degli agenti il cui riepilogo dello schema è cambiato.
+
+        Chiamato dopo il refresh dei cataloghi: il riepilogo viene ricalcolato
+        solo per i cataloghi ricaricati (impronta dello schema cambiata).
+        Come reload_agent, le voci cambiate sono nuove e il registry viene
+        ripubblicato: le richieste in corso completano con il prompt precedente.
+        """
+        updated: List[str] = []
+        with self._reload_lock:
+            current = self._entries
+            entries = dict(current)
+            for agent_name, entry in current.items():
+                if entry.digest_catalog is None:
+                    continue
+                system_prompt = self._build_system_prompt(entry.signature.system_prompt or "", entry.digest_catalog)
+                if system_prompt == entry.agent.system_prompt:
+                    continue
+                # Copia dell'agente (stessi client e tool): solo il prompt cambia, nessuna ricreazione
+                agent = copy.copy(entry.agent)
+                agent.system_prompt = system_prompt
+                entries[agent_name] = entry._replace(agent=agent)
+                updated.append(agent_name)
+            if updated:
+                self._publish(entries)
+
+        for agent_name in updated:
+            print(f"[AgentManager] Riepilogo schema aggiornato per l'agente '{agent_name}'")
+
+    def _build_agent(self, db_agent: AgentConfig) -> Optional["_AgentEntry"]:
+        """
+        Crea l'agente Datapizza di una riga di chat_ai.agents.
 
         Questo metodo:
-        1. Legge la tabella chat_ai.agents per trovare agenti attivi
-        2. Per ogni agente, risolve i tools configurati
-        3. Costruisce il system prompt completo
-        4. Crea l'istanza Agent Datapizza con memory integrata
-        5. Registra l'agente nel registry interno (self.agents)
+        1. Risolve i tools configurati
+        2. Costruisce il system prompt completo
+        3. Sceglie il client LLM (riusato tra i reload)
+        4. Crea l'istanza Agent Datapizza
 
-        Note:
-            - Gli agenti con is_active=False vengono ignorati
-            - Se un agente non ha tools validi, viene skippato
-            - Ogni agente può avere il proprio modello LLM e connessione DB
+        Returns:
+            La voce di registry dell'agente, None se l'agente va ignorato
+            (nessun tool valido o modello non configurabile)
         """
-        self.agents = {}
-        db = SessionLocal()
+        # 1. RISOLUZIONE TOOLS
+        tools = self._resolve_tools(db_agent)
+
+        # Se non sono configurati tools validi, saltiamo l'agente
+        # (un agente senza tools non può fare nulla di utile)
+        if not tools:
+            print(f"[AgentManager] Agente '{db_agent.name}' skippato: nessun tool valido configurato")
+            return None
+
+        # 2. COSTRUZIONE SYSTEM PROMPT
+        # Con get_schema e SCHEMA_DIGEST_MAX_CHARS > 0 il prompt include il riepilogo dello schema
+        digest_catalog = None
+        tool_ids = {t.strip().lower() for t in (db_agent.tool_names or "").split(",")}
+        if "get_schema" in tool_ids and self.settings.schema_digest_max_chars > 0:
+            digest_catalog = get_schema_catalog(db_agent.db_uri, db_agent.schema_name)
+        system_prompt = self._build_system_prompt(db_agent.system_prompt or "", digest_catalog)
+
+        # 3. CLIENT LLM
+        # Ogni agente può avere il proprio modello (override), altrimenti usa quello di default.
+        # I client sono condivisi a livello di processo (vedi client_pool)
         try:
-            # Query agenti attivi dal database
-            db_agents = (
-                db.query(AgentConfig)
-                .filter(AgentConfig.is_active == True)  # Solo agenti attivi
-                .order_by(AgentConfig.name.asc())
-                .all()
+            agent_client = (
+                llm_client_pool.get(self.settings, use_case="agent", model_override=db_agent.model)
+                if db_agent.model
+                else self.default_client
+            )
+        except LLMConfigurationError as exc:
+            print(
+                f"[AgentManager] Ignoro agente {db_agent.name}: {exc}"
             )
+            return None
+
+        # 4. CREAZIONE AGENT CON MEMORY
+        # NOTA: Datapizza Agent gestisce automaticamente la memoria conversazionale
+        # attraverso il parametro 'messages' passato in .run() o .a_run()
+        # Non serve una Memory esplicita qui, ma la gestiamo passando lo storico
+        # nel chat/routes.py quando chiamiamo agent.a_run()
+
+        # stateless=True: ogni chiamata è indipendente
+        # La memoria viene gestita esternamente in routes.py
+        # con sliding window + riassunto Ollama
+        agent = Agent(
+            name=db_agent.name,
+            client=agent_client,
+            system_prompt=system_prompt,
+            tools=tools,
+            stateless=True,
+        )
+
+        print(f"[AgentManager] Agente '{db_agent.name}' inizializzato con {len(tools)} tools")
+        return _AgentEntry(
+            agent=agent,
+            signature=_AgentSignature.of(db_agent),
+            db_uri=db_agent.db_uri,
+            schema_name=db_agent.schema_name,
+            pool_config=self._pool_config(db_agent),
+            digest_catalog=digest_catalog,
+            description=db_agent.description or db_agent.name,
+        )
+
+    def _refresh_entry(self, db_agent: AgentConfig, existing: Optional["_AgentEntry"]) -> Optional["_AgentEntry"]:
+        """
+        Riusa l'agente se la firma è invariata (aggiornando solo la descrizione), altrimenti lo ricrea.
 
-            for db_agent in db_agents:
-                # 1. RISOLUZIONE TOOLS
-                tools = self._resolve_tools(db_agent)
+        Returns:
+            ``existing`` se nulla è cambiato, la nuova voce, oppure None se l'agente va ignorato
+        """
+        if existing is not None and existing.signature == _AgentSignature.of(db_agent):
+            description = db_agent.description or db_agent.name
+            if existing.description == description:
+                return existing
+            return existing._replace(description=description)
+        return self._build_agent(db_agent)
+
+    def _publish(self, entries: Dict[str, "_AgentEntry"]) -> None:
+        """Pubblica il nuovo registry con un'unica assegnazione. Caller holds ``_reload_lock``."""
+        self._entries = entries
+        self.agents = {name: entry.agent for name, entry in entries.items()}
+        listing = {name: entries[name].description for name in sorted(entries)}
+        digest = hashlib.sha1(json.dumps(listing, sort_keys=True).encode("utf-8")).hexdigest()
+        # ETag ed elenco pubblicati insieme: chi legge _listing vede sempre una coppia coerente
+        self._listing = (f'"{digest[:16]}"', listing)
+        self._release_unused_resources(entries)
+
+    def reload_agents(self) -> Dict[str, str]:
+        """
+        Allinea il registry a tutte le righe attive di chat_ai.agents.
 
-                # Se non sono configurati tools validi, saltiamo l'agente
-                # (un agente senza tools non può fare nulla di utile)
-                if not tools:
-                    print(f"[AgentManager] Agente '{db_agent.name}' skippato: nessun tool valido configurato")
-                    continue
+        Gli agenti con configurazione invariata (stessa firma) vengono riusati,
+        quelli nuovi o modificati ricreati, quelli disattivati o eliminati rimossi.
 
-                # 2. COSTRUZIONE SYSTEM PROMPT
-                base_prompt = db_agent.system_prompt or ""
-
-                # Suffix generico per tutti gli agenti: impone uno stile di risposta finale
-                # orientato ai risultati, non al piano di azione.
-                response_suffix = (
-                    "\n\n"
-                    "WORKFLOW OBBLIGATORIO:\n"
-                    "1. USA get_schema per verificare struttura tabelle\n"
-                    "2. ESEGUI sql_select con la query appropriata\n"
-                    "3. SOLO DOPO aver ricevuto i risultati, rispondi all'utente\n"
-                    "\n"
-                    "NON rispondere MAI senza aver prima eseguito sql_select.\n"
-                    "NON annunciare cosa farai - FALLO e basta.\n"
-                    "\n"
-                    "Per query complesse (es. 'tra i top N, chi NON ha fatto X'):\n"
-                    "- Usa CTE (WITH ... AS) o subquery\n"
-                    "- Esempio: WITH TopN AS (SELECT TOP 50 ... GROUP BY ... ORDER BY ... DESC) "
-                    "SELECT * FROM TopN WHERE CodiceCliente NOT IN (SELECT CodiceCliente FROM ... WHERE ...)\n"
-                    "\n"
-                    "REGOLE SCHEMA:\n"
-                    "- PRIMA di qualsiasi query, usa get_schema per verificare nomi colonne esatti\n"
-                    "- Se tabella non trovata, prova formato 'schema.tabella'\n"
+        Note:
+            - Gli agenti con is_active=False vengono ignorati
+            - Se un agente non ha tools validi, viene skippato
+            - Ogni agente può avere il proprio modello LLM e connessione DB
+
+        Returns:
+            Esito per agente: "created", "updated", "removed" (gli invariati non compaiono)
+        """
+        with self._reload_lock:
+            db = SessionLocal()
+            try:
+                # Versione letta prima delle righe: una modifica concorrente verrà vista al poll successivo
+                config_version = self._read_config_version(db)
+
+                # Query agenti attivi dal database
+                db_agents = (
+                    db.query(AgentConfig)
+                    .filter(AgentConfig.is_active == True)  # Solo agenti attivi
+                    .order_by(AgentConfig.name.asc())
+                    .all()
                 )
 
-                system_prompt = f"{base_prompt}{response_suffix}" if base_prompt else response_suffix
-
-                # 3. CREAZIONE CLIENT LLM
-                # Ogni agente può avere il proprio modello (override), altrimenti usa quello di default
-                if db_agent.model:
-                    try:
-                        agent_client = build_llm_client(
-                            self.settings,
-                            use_case="agent",
-                            model_override=db_agent.model,
-                        )
-                    except LLMConfigurationError as exc:
-                        print(
-                            f"[AgentManager] Ignoro agente {db_agent.name}: {exc}"
-                        )
+                current = self._entries
+                entries: Dict[str, _AgentEntry] = {}
+                changes: Dict[str, str] = {}
+                for db_agent in db_agents:
+                    existing = current.get(db_agent.name)
+                    entry = self._refresh_entry(db_agent, existing)
+                    if entry is None:
                         continue
-                else:
-                    agent_client = self.default_client
-
-                # 4. CREAZIONE AGENT CON MEMORY
-                # NOTA: Datapizza Agent gestisce automaticamente la memoria conversazionale
-                # attraverso il parametro 'messages' passato in .run() o .a_run()
-                # Non serve una Memory esplicita qui, ma la gestiamo passando lo storico
-                # nel chat/routes.py quando chiamiamo agent.a_run()
-
-                # stateless=True: ogni chiamata è indipendente
-                # La memoria viene gestita esternamente in routes.py
-                # con sliding window + riassunto Ollama
-                self.agents[db_agent.name] = Agent(
-                    name=db_agent.name,
-                    client=agent_client,
-                    system_prompt=system_prompt,
-                    tools=tools,
-                    stateless=True,
+                    entries[db_agent.name] = entry
+                    if entry is not existing:
+                        changes[db_agent.name] = "updated" if existing is not None else "created"
+            finally:
+                db.close()
+
+            for name in current:
+                if name not in entries:
+                    changes[name] = "removed"
+            self._publish(entries)
+            self.config_version = config_version
+
+        return changes
+
+    def _read_config_version(self, db) -> Optional[Tuple[int, Optional[int]]]:
+        """
+        Versione corrente di chat_ai.agents, None se la colonna row_version non esiste.
+
+        È una sola lettura di COUNT/MAX su una tabella di poche righe.
+        """
+        try:
+            count, max_version = db.execute(_CONFIG_VERSION_QUERY).one()
+        except Exception as exc:
+            db.rollback()
+            if not self._config_version_unavailable:
+                self._config_version_unavailable = True
+                print(
+                    "[AgentManager] Versione configurazione agenti non disponibile "
+                    f"(eseguire migrations/ADD_AGENTS_ROW_VERSION.sql): {exc}"
                 )
+            return None
+        self._config_version_unavailable = False
+        return int(count), int(max_version) if max_version is not None else None
+
+    def sync_config(self) -> Dict[str, str]:
+        """
+        Ricarica gli agenti se chat_ai.agents è cambiata dall'ultimo reload.
 
-                print(f"[AgentManager] Agente '{db_agent.name}' inizializzato con {len(tools)} tools")
+        Chiamato periodicamente da ogni worker (AGENT_CONFIG_POLL_SECONDS): le
+        modifiche salvate dal pannello admin su un altro worker vengono applicate
+        con lo stesso reload incrementale di reload_agents.
 
+        Returns:
+            Esito per agente modificato (vuoto se la configurazione è invariata)
+        """
+        db = SessionLocal()
+        try:
+            config_version = self._read_config_version(db)
         finally:
             db.close()
-    
+        if config_version is None or config_version == self.config_version:
+            return {}
+
+        changes = self.reload_agents()
+        if changes:
+            print(f"[AgentManager] Configurazione agenti cambiata: {changes}")
+        return changes
+
+    def reload_agent(self, agent_name: str) -> str:
+        """
+        Ricarica un solo agente dopo una modifica della sua riga in chat_ai.agents.
+
+        Gli altri agenti (e i loro client LLM) restano quelli già in uso; il
+        registry viene ripubblicato per intero, così le richieste in corso
+        vedono sempre o la versione precedente o quella nuova.
+
+        Returns:
+            "created", "updated", "removed" oppure "unchanged"
+        """
+        with self._reload_lock:
+            db = SessionLocal()
+            try:
+                db_agent = db.query(AgentConfig).filter(AgentConfig.name == agent_name).first()
+                current = self._entries
+                existing = current.get(agent_name)
+
+                entry = None
+                if db_agent is not None and db_agent.is_active:
+                    entry = self._refresh_entry(db_agent, existing)
+            finally:
+                db.close()
+
+            if entry is existing:
+                return "unchanged"
+
+            entries = dict(current)
+            if entry is None:
+                del entries[agent_name]
+                outcome = "removed"
+            else:
+                entries[agent_name] = entry
+                outcome = "updated" if existing is not None else "created"
+            self._publish(entries)
+
+        print(f"[AgentManager] Agente '{agent_name}' ricaricato: {outcome}")
+        return outcome
+
     def get_agent(self, agent_name: str) -> Agent:
         """
         Get an agent by name.
@@ -207,51 +542,33 @@ class AgentManager:
         Raises:
             ValueError: If agent_name is not found
         """
-        if agent_name not in self.agents:
+        agents = self.agents  # Snapshot: un reload concorrente pubblica un nuovo dizionario
+        if agent_name not in agents:
             raise ValueError(
                 f"Agent '{agent_name}' non trovato. "
-                f"Agenti disponibili: {list(self.agents.keys())}"
+                f"Agenti disponibili: {list(agents.keys())}"
             )
-        return self.agents[agent_name]
+        return agents[agent_name]
     
     def list_agents(self) -> Dict[str, str]:
         """
         Get list of available agents with their descriptions.
-        
+
+        Served from the in-memory registry (descriptions are refreshed on reload):
+        no database access.
+
         Returns:
             Dictionary mapping agent names to descriptions
         """
-        if not self.agents:
-            return {}
+        return dict(self._listing[1])
 
-        db = SessionLocal()
-        try:
-            result: Dict[str, str] = {}
-            names = list(self.agents.keys())
-
-            db_agents = (
-                db.query(AgentConfig)
-                .filter(AgentConfig.name.in_(names))
-                .order_by(AgentConfig.name.asc())
-                .all()
-            )
-
-            for db_agent in db_agents:
-                result[db_agent.name] = db_agent.description or db_agent.name
-
-            # Per eventuali agenti senza riga in tabella, usiamo il nome come descrizione
-            for name in names:
-                if name not in result:
-                    result[name] = name
-
-            return result
+    def agent_listing(self) -> Tuple[str, Dict[str, str]]:
+        """
+        Return the agent listing together with its ETag (changes whenever a name or description changes).
+        """
+        etag, listing = self._listing
+        return etag, dict(listing)
 
-        except Exception:
-            # In caso di errore DB, esponiamo comunque gli agenti correnti con nome base
-            return {name: name for name in self.agents.keys()}
-        finally:
-            db.close()
-    
     def agent_exists(self, agent_name: str) -> bool:
         """
         Check if an agent exists.
@@ -0,0 +1,317 @@
+"""
+Registro delle query eseguite dai tool SQL ed esportazione completa dei risultati.
+
+sql_select restituisce al modello al massimo MAX_QUERY_RESULTS righe: per
+"dammi l'elenco completo" l'utente può invece scaricare il risultato intero.
+- Durante chat_stream le query valide eseguite dai tool vengono raccolte
+  (contextvar impostata per la richiesta) e salvate in chat_ai.executed_queries
+- L'endpoint di export riesegue la query registrata e la restituisce in CSV o
+  Parquet a blocchi: cursore lato server (stream_results) + fetchmany, quindi
+  memoria costante anche con milioni di righe, che non passano mai dall'LLM
+- Come sql_select, la query passa dal controllo di costo stimato e gira su una
+  connessione con timeout (EXPORT_TIMEOUT_SECONDS) e cancel; l'endpoint occupa
+  uno slot di export_slots (EXPORT_MAX_CONCURRENT_PER_DB, separato dal limite
+  dei tool SQL) per tutto il download
+
+Parquet richiede pyarrow (dipendenza opzionale): senza, l'export Parquet
+restituisce un errore esplicito e il CSV resta disponibile.
+"""
+import csv
+import io
+from contextvars import ContextVar
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from app.agents.engine_registry import engine_registry
+from app.agents.query_guard import check_query_cost
+from app.agents.sql_validator import validate_sql_query
+from app.agents.tool_executor import DatabaseSlots
+from app.config import get_settings
+
+settings = get_settings()
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Export contemporanei per database (slot tenuto fino alla fine del download)
+export_slots = DatabaseSlots(settings.export_max_concurrent_per_db)
+
+
+class RecordedQuery(NamedTuple):
+    """Query valida eseguita da un tool durante una richiesta di chat."""
+    tool_name: str
+    query: str
+
+
+# Lista delle query della richiesta corrente (None fuori da chat_stream, es. task schedulati)
+_recorded_queries: ContextVar[Optional[List[RecordedQuery]]] = ContextVar("recorded_queries", default=None)
+
+
+def start_recording() -> List[RecordedQuery]:
+    """
+    Start collecting the queries run by SQL tools in the current context.
+
+    The returned list is filled by ``record_query``; tasks spawned from this
+    context share the same list object.
+    """
+    queries: List[RecordedQuery] = []
+    _recorded_queries.set(queries)
+    return queries
+
+
+def record_query(tool_name: str, query: str) -> None:
+    """Record ``query`` for the current chat request, if it is valid and recording is active."""
+    queries = _recorded_queries.get()
+    if queries is None:
+        return
+    is_valid, _ = validate_sql_query(query)
+    if not is_valid:
+        return
+    query = query.strip()
+    if any(recorded.query == query for recorded in queries):
+        return
+    queries.append(RecordedQuery(tool_name, query))
+
+
+class ExportError(Exception):
+    """Export non eseguibile (query non valida o formato sconosciuto)."""
+
+
+class ExportUnavailableError(ExportError):
+    """Formato riconosciuto ma non disponibile su questo server (dipendenza opzionale mancante)."""
+
+
+def _stream_rows(
+    query: str,
+    db_uri: Optional[str],
+    max_cost: Optional[float] = None,
+    on_close: Optional[Callable[[], None]] = None,
+) -> Iterator[Any]:
+    """
+    Yield the column names and the cursor description, then chunks of rows.
+
+    The query is validated again: the recorded text is only trusted as far as
+    sql_select would trust it. Like sql_select it goes through the cost guard
+    and runs on a guarded connection (statement timeout, watchdog, cancel).
+    ``on_close`` is called once the stream ends, fails or is closed.
+    """
+    # Import locale: sql_tools importa record_query da questo modulo
+    from app.agents.sql_tools import QueryCancelHandle, _guarded_connection
+
+    handle = QueryCancelHandle()
+    try:
+        is_valid, error_msg = validate_sql_query(query)
+        if not is_valid:
+            raise ExportError(error_msg)
+
+        rejection = check_query_cost(engine_registry.get(db_uri), query, db_uri, max_cost)
+        if rejection:
+            raise ExportError(rejection)
+
+        chunk_rows = settings.export_chunk_rows
+        # Timeout dell'export: le righe vengono lette al ritmo del download del client
+        with _guarded_connection(db_uri, handle, chunk_rows, timeout=settings.export_timeout_seconds) as conn:
+            result = conn.execute(text(query))
+            yield list(result.keys()), result.cursor.description
+            while True:
+                rows = result.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield rows
+    except GeneratorExit:
+        # Client disconnesso a metà download: lo statement viene fermato sul server
+        handle.cancel("export interrotto")
+        raise
+    finally:
+        if on_close is not None:
+            on_close()
+
+
+def _open_export(
+    query: str,
+    db_uri: Optional[str],
+    max_cost: Optional[float],
+    on_close: Optional[Callable[[], None]],
+) -> Tuple[List[str], Sequence[Any], Iterator[Sequence[Any]]]:
+    """Start the export stream and read the columns, so errors surface before the response starts."""
+    stream = _stream_rows(query, db_uri, max_cost, on_close)
+    columns, description = next(stream)
+    return columns, description, stream
+
+
+def _csv_chunks(columns: List[str], stream: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM: Excel riconosce l'UTF-8 (accenti) aprendo il file con doppio clic
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    try:
+        for rows in stream:
+            writer.writerows(rows)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    finally:
+        # Client disconnesso a metà download: chiude subito cursore e connessione
+        stream.close()
+
+
+class _ByteSink:
+    """Destinazione file-like per ParquetWriter: accumula i byte scritti finché non vengono letti."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_type(pa, column_description: Sequence[Any]):
+    """
+    Arrow type for one ``cursor.description`` entry, or None if the driver does not report it.
+
+    pyodbc reports the Python type of the column (plus precision and scale);
+    sqlite reports nothing and the type is inferred from the first chunk.
+    """
+    type_code, precision, scale = column_description[1], column_description[4], column_description[5]
+    if not isinstance(type_code, type):
+        return None
+    if issubclass(type_code, bool):
+        return pa.bool_()
+    if issubclass(type_code, int):
+        return pa.int64()
+    if issubclass(type_code, float):
+        return pa.float64()
+    if issubclass(type_code, Decimal):
+        if precision and scale is not None and precision <= 38:
+            return pa.decimal128(precision, scale)
+        return None
+    # datetime prima di date: datetime è una sottoclasse di date
+    if issubclass(type_code, datetime):
+        return pa.timestamp("us")
+    if issubclass(type_code, date):
+        return pa.date32()
+    if issubclass(type_code, time):
+        return pa.time64("us")
+    if issubclass(type_code, (bytes, bytearray)):
+        return pa.binary()
+    return pa.string()
+
+
+def _arrow_array(pa, values: Sequence[Any], arrow_type):
+    if arrow_type is None:
+        return pa.array(values)
+    if pa.types.is_string(arrow_type):
+        values = [None if v is None else str(v) for v in values]
+    return pa.array(values, type=arrow_type)
+
+
+def _parquet_chunks(
+    columns: List[str], description: Sequence[Any], stream: Iterator[Sequence[Any]], pa, pq
+) -> Iterator[bytes]:
+    """
+    One Parquet row group per fetched chunk, all with the same schema.
+
+    Column types come from the cursor description, so a column that is all
+    NULL (or all integers) in the first chunk keeps its real type in the next
+    ones. Types the driver does not report are inferred from the first chunk,
+    and later chunks are converted to that type.
+    """
+    declared = [_arrow_type(pa, entry) for entry in description or ()] or [None] * len(columns)
+    sink = _ByteSink()
+    writer = None
+    schema = None
+    try:
+        for rows in stream:
+            values = list(zip(*rows))
+            if schema is None:
+                arrays = [_arrow_array(pa, column, arrow_type) for column, arrow_type in zip(values, declared)]
+                # Colonne tutte NULL nel primo blocco e tipo non dichiarato: si usa stringa
+                arrays = [array.cast(pa.string()) if pa.types.is_null(array.type) else array for array in arrays]
+                schema = pa.schema([pa.field(name, array.type) for name, array in zip(columns, arrays)])
+                writer = pq.ParquetWriter(sink, schema)
+            else:
+                arrays = [_arrow_array(pa, column, field.type) for column, field in zip(values, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+
+        if writer is None:
+            # Risultato vuoto: file valido con i tipi dichiarati (stringa dove mancano)
+            schema = pa.schema([
+                pa.field(name, arrow_type or pa.string()) for name, arrow_type in zip(columns, declared)
+            ])
+            writer = pq.ParquetWriter(sink, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+        stream.close()
+    yield sink.drain()
+
+
+def export_query(
+    query: str,
+    db_uri: Optional[str],
+    export_format: str,
+    max_cost: Optional[float] = None,
+    on_close: Optional[Callable[[], None]] = None,
+) -> Iterator[bytes]:
+    """
+    Run ``query`` and return an iterator of encoded chunks in ``export_format``.
+
+    The query is validated, checked against ``max_cost`` and executed before
+    returning, so validation and connection errors can be reported as HTTP
+    errors; rows are then read only as the response is consumed.
+
+    Args:
+        query: Recorded query to run again
+        db_uri: Database of the agent that ran the query
+        export_format: "csv" or "parquet"
+        max_cost: Estimated cost threshold, as for sql_select (None/0 = no check)
+        on_close: Called when the row stream ends, fails or is closed (e.g. to
+            release the database slot); not called for format errors, which
+            are raised before the stream starts
+
+    Raises:
+        ExportError: Invalid query, query too expensive or unknown format
+        ExportUnavailableError: Parquet requested but pyarrow is not installed
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Formato non supportato: {export_format}. Usa uno tra: {', '.join(EXPORT_FORMATS)}")
+
+    if export_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ExportUnavailableError(
+                "Export Parquet non disponibile: il pacchetto pyarrow non è installato sul server "
+                "(pip install pyarrow). Usa format=csv."
+            )
+        columns, description, stream = _open_export(query, db_uri, max_cost, on_close)
+        return _parquet_chunks(columns, description, stream, pa, pq)
+
+    columns, _, stream = _open_export(query, db_uri, max_cost, on_close)
+    return _csv_chunks(columns, stream)
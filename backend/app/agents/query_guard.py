@@ -0,0 +1,280 @@
+"""
+Controllo del costo stimato delle query prima dell'esecuzione (SQL Server).
+
+Un cross join o un filtro non sargable generato dal modello su tabelle grandi
+può saturare il server ERP per tutti gli utenti. Prima di eseguire una query,
+sql_select può chiedere a SQL Server il piano stimato (SET SHOWPLAN_XML ON:
+la query viene compilata ma NON eseguita) e leggerne:
+- StatementSubTreeCost: costo stimato dell'intera istruzione
+- StatementEstRows: righe stimate in uscita
+- Warnings NoJoinPredicate e scansioni complete di tabelle/indici (per i suggerimenti)
+
+Le query oltre la soglia dell'agente (chat_ai.agents.max_query_cost, oppure
+QUERY_COST_LIMIT) vengono rifiutate con un messaggio su come riscriverle.
+
+I piani sono in cache per "forma" della query (letterali sostituiti da ?):
+la stessa domanda con un cliente o una data diversa non ripaga la compilazione.
+"""
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from app.agents.engine_registry import set_driver_timeout
+from app.agents.sql_validator import tokenize
+from app.config import get_settings
+
+settings = get_settings()
+
+_SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+# Operatori che leggono un'intera tabella/indice
+_SCAN_OPERATORS = ("Table Scan", "Clustered Index Scan", "Index Scan")
+
+# Scansioni riportate nel suggerimento al modello
+_MAX_SCANS_IN_HINT = 3
+
+# Parole dopo le quali un numero è un conteggio di righe, mantenuto nella forma della query
+_ROW_COUNT_KEYWORDS = frozenset({"TOP", "OFFSET", "NEXT", "FIRST"})
+
+
+class PlanEstimate(NamedTuple):
+    """Stime lette dal piano XML di SQL Server."""
+    cost: float
+    rows: float
+    missing_join_predicate: bool
+    # (oggetto, righe stimate) delle scansioni complete, la più grande per prima
+    scans: Tuple[Tuple[str, float], ...]
+
+
+def query_shape(query: str) -> str:
+    """
+    Return the query with literals replaced by ``?`` and comments/whitespace removed.
+
+    Two queries with the same shape compile to the same plan up to the
+    selectivity of the literals, so the plan estimate can be reused. Row
+    counts (TOP n, TOP (n), OFFSET n, FETCH NEXT/FIRST n) are kept: they
+    change the cost itself, and TOP 10 must not vouch for TOP 1000000.
+    """
+    parts = []
+    for kind, value in tokenize(query):
+        if kind in ("ws", "comment"):
+            continue
+        if kind == "number" and _is_row_count(parts):
+            parts.append(value)
+        elif kind in ("string", "number"):
+            parts.append("?")
+        elif kind == "word":
+            parts.append(value.upper())
+        else:
+            parts.append(value)
+    return " ".join(parts)
+
+
+def _is_row_count(previous: List[str]) -> bool:
+    """True if a number following the ``previous`` shape tokens is a TOP/OFFSET/FETCH row count."""
+    if previous and previous[-1] == "(":
+        previous = previous[:-1]
+    return bool(previous) and previous[-1] in _ROW_COUNT_KEYWORDS
+
+
+def parse_showplan(plan_xml: str) -> PlanEstimate:
+    """
+    Extract cost, estimated rows, missing join predicates and full scans from a SHOWPLAN_XML document.
+
+    Raises:
+        ValueError: If the document contains no statement estimate
+    """
+    root = ET.fromstring(plan_xml)
+
+    cost = 0.0
+    rows = 0.0
+    found = False
+    for statement in root.iter(f"{_SHOWPLAN_NS}StmtSimple"):
+        if statement.get("StatementSubTreeCost") is None:
+            continue
+        found = True
+        cost += float(statement.get("StatementSubTreeCost"))
+        rows = max(rows, float(statement.get("StatementEstRows", 0)))
+    if not found:
+        raise ValueError("Piano stimato senza StatementSubTreeCost")
+
+    missing_join_predicate = any(True for _ in root.iter(f"{_SHOWPLAN_NS}NoJoinPredicate"))
+
+    scans: Dict[str, float] = {}
+    for relop in root.iter(f"{_SHOWPLAN_NS}RelOp"):
+        if relop.get("PhysicalOp") not in _SCAN_OPERATORS:
+            continue
+        # L'oggetto letto è nel primo figlio dell'operatore (TableScan/IndexScan)
+        obj = next(relop.iter(f"{_SHOWPLAN_NS}Object"), None)
+        if obj is None:
+            continue
+        name = ".".join(filter(None, (obj.get("Schema"), obj.get("Table"))))
+        estimated = float(relop.get("EstimatedRowsRead") or relop.get("EstimateRows") or 0)
+        scans[name] = max(scans.get(name, 0.0), estimated)
+
+    ordered = tuple(sorted(scans.items(), key=lambda item: -item[1]))
+    return PlanEstimate(cost, rows, missing_join_predicate, ordered)
+
+
+def fetch_plan(conn: Connection, query: str) -> PlanEstimate:
+    """
+    Compile ``query`` on ``conn`` with SHOWPLAN_XML and return its estimate.
+
+    The query is not executed. SHOWPLAN is switched off again before returning.
+    If anything fails on the way the session may still be in SHOWPLAN mode:
+    the connection is invalidated, so it is closed instead of going back to
+    the pool, where a later checkout would receive plans instead of rows.
+    """
+    try:
+        # SET SHOWPLAN_XML deve essere l'unica istruzione del batch
+        conn.exec_driver_sql("SET SHOWPLAN_XML ON")
+        try:
+            plan_xml = conn.exec_driver_sql(query).scalar()
+        finally:
+            conn.exec_driver_sql("SET SHOWPLAN_XML OFF")
+    except Exception:
+        conn.invalidate()
+        raise
+    return parse_showplan(plan_xml)
+
+
+class QueryPlanCache:
+    """
+    LRU cache of plan estimates, keyed by (db_uri, query shape).
+
+    Entries expire after ``ttl_seconds`` so that statistics updates and
+    schema changes are eventually reflected in the estimates.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, PlanEstimate]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejections = 0
+
+    def get(self, db_uri: Optional[str], shape: str) -> Optional[PlanEstimate]:
+        key = (db_uri or "", shape)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, db_uri: Optional[str], shape: str, estimate: PlanEstimate) -> None:
+        key = (db_uri or "", shape)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, estimate)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_rejection(self) -> None:
+        with self._lock:
+            self.rejections += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "rejections": self.rejections,
+            }
+
+
+plan_cache = QueryPlanCache(
+    ttl_seconds=settings.query_plan_cache_ttl_seconds,
+    max_entries=settings.query_plan_cache_max_entries,
+)
+
+
+def _rejection_message(estimate: PlanEstimate, max_cost: float) -> str:
+    """Explain why the query was rejected and how the model can rewrite it."""
+    lines = [
+        f"ERRORE: Query rifiutata perché troppo costosa per il server "
+        f"(costo stimato {estimate.cost:.1f}, limite {max_cost:g}, "
+        f"righe stimate {estimate.rows:,.0f}). La query NON è stata eseguita.",
+        "Riscrivi la query in modo più selettivo:",
+    ]
+    if estimate.missing_join_predicate:
+        lines.append(
+            "- Il piano contiene un JOIN senza condizione (prodotto cartesiano): "
+            "aggiungi le condizioni ON tra tutte le tabelle."
+        )
+    if estimate.scans:
+        scans = ", ".join(
+            f"{name} (~{rows:,.0f} righe)" for name, rows in estimate.scans[:_MAX_SCANS_IN_HINT]
+        )
+        lines.append(
+            f"- Lettura completa di: {scans}. Filtra con WHERE su colonne chiave o date, "
+            "senza funzioni applicate alla colonna (es. Data >= '2024-01-01' invece di YEAR(Data) = 2024)."
+        )
+    lines.append("- Aggrega lato database (GROUP BY, SUM, COUNT) o limita con TOP invece di leggere righe di dettaglio.")
+    return "\n".join(lines)
+
+
+def check_query_cost(
+    engine: Engine,
+    query: str,
+    db_uri: Optional[str],
+    max_cost: Optional[float],
+) -> Optional[str]:
+    """
+    Reject ``query`` if its estimated cost exceeds ``max_cost``.
+
+    Only SQL Server exposes SHOWPLAN_XML: on other dialects, or without a
+    threshold, the check is skipped. A failure to obtain the plan does not
+    block the query (the real execution still has its timeout).
+
+    The plan is fetched on a connection of its own, never on the one that
+    will run the query: a failed SHOWPLAN round trip cannot leave the real
+    execution (or the pool) with a session still in SHOWPLAN mode.
+
+    Args:
+        engine: Engine of the target database
+        query: Already validated SELECT
+        db_uri: Target database, part of the plan cache key
+        max_cost: Threshold in SQL Server cost units (None/0 = no check)
+
+    Returns:
+        Error message for the model, or None if the query can run
+    """
+    if not max_cost or max_cost <= 0 or engine.dialect.name != "mssql":
+        return None
+
+    shape = query_shape(query)
+    estimate = plan_cache.get(db_uri, shape)
+    if estimate is None:
+        try:
+            with engine.connect() as conn:
+                restore_timeout = set_driver_timeout(conn, settings.query_timeout_seconds)
+                try:
+                    estimate = fetch_plan(conn, query)
+                finally:
+                    restore_timeout()
+        except Exception as exc:
+            print(f"[QueryGuard] Piano stimato non disponibile, query eseguita senza controllo: {exc}")
+            return None
+        plan_cache.put(db_uri, shape, estimate)
+
+    if estimate.cost <= max_cost:
+        return None
+
+    plan_cache.record_rejection()
+    print(f"[QueryGuard] Query rifiutata: costo stimato {estimate.cost:.1f} > {max_cost:g}")
+    return _rejection_message(estimate, max_cost)
@@ -0,0 +1,246 @@
+"""
+Rendering dei risultati SQL per l'output dei tool, entro un budget di caratteri.
+
+Ogni carattere restituito da sql_select finisce nel prompt del turno successivo:
+la vecchia tabella con colonne allineate (ljust) spreca token in spazi, e una
+sola colonna di testo lungo fa esplodere l'intera risposta.
+
+Il renderer:
+1. Converte ogni cella in stringa una sola volta (NULL esplicito, niente a capo/tab)
+2. Tronca le celle oltre ``max_cell_chars``
+3. Sceglie il formato: quello configurato, oppure ("auto") il più corto tra
+   tabella, markdown, TSV e CSV
+4. Se l'output supera ``budget_chars``: rimuove le colonne con lo stesso valore
+   su tutte le righe (riportato in nota), poi omette le ultime righe
+5. Riporta in coda cosa è stato omesso, così il modello sa cosa manca
+
+Stima token: ~4 caratteri per token (vedi benchmarks/bench_result_renderer.py).
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+OUTPUT_FORMATS = ("table", "markdown", "tsv", "csv")
+
+NULL_TEXT = "NULL"
+ELLIPSIS = "…"
+
+_CONTROL_RE = re.compile(r"[\t\r\n]+")
+
+# (righe di intestazione, righe dati)
+Lines = Tuple[List[str], List[str]]
+
+
+def _stringify(values: Sequence[Any]) -> List[str]:
+    """Convert one column to strings: one str() per cell, no tabs or newlines."""
+    cells = [NULL_TEXT if value is None else str(value) for value in values]
+    if _CONTROL_RE.search("".join(cells)):
+        cells = [_CONTROL_RE.sub(" ", cell) for cell in cells]
+    return cells
+
+
+def _truncate(cells: List[str], max_chars: int) -> Tuple[List[str], int]:
+    """Cut cells longer than ``max_chars``; return (cells, number of cut cells)."""
+    if max(map(len, cells)) <= max_chars:
+        return cells, 0
+    keep = max(max_chars - len(ELLIPSIS), 1)
+    cut = 0
+    result = []
+    for cell in cells:
+        if len(cell) > max_chars:
+            cell = cell[:keep] + ELLIPSIS
+            cut += 1
+        result.append(cell)
+    return result, cut
+
+
+def _table_lines(headers: List[str], columns: List[List[str]]) -> Lines:
+    widths = [max(len(header), max(map(len, cells))) for header, cells in zip(headers, columns)]
+    row_format = " | ".join(f"{{:<{width}}}" for width in widths)
+    header = row_format.format(*headers)
+    return [header, "-" * len(header)], [row_format.format(*cells) for cells in zip(*columns)]
+
+
+def _markdown_lines(headers: List[str], columns: List[List[str]]) -> Lines:
+    columns = [[cell.replace("|", "\\|") for cell in cells] for cells in columns]
+    head = [
+        "| " + " | ".join(headers) + " |",
+        "|" + "|".join("---" for _ in headers) + "|",
+    ]
+    return head, ["| " + " | ".join(cells) + " |" for cells in zip(*columns)]
+
+
+def _tsv_lines(headers: List[str], columns: List[List[str]]) -> Lines:
+    return ["\t".join(headers)], ["\t".join(cells) for cells in zip(*columns)]
+
+
+def _csv_field(value: str) -> str:
+    if "," in value or '"' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _csv_lines(headers: List[str], columns: List[List[str]]) -> Lines:
+    columns = [[_csv_field(cell) for cell in cells] for cells in columns]
+    return [",".join(map(_csv_field, headers))], [",".join(cells) for cells in zip(*columns)]
+
+
+_RENDERERS: Dict[str, Callable[[List[str], List[List[str]]], Lines]] = {
+    "table": _table_lines,
+    "markdown": _markdown_lines,
+    "tsv": _tsv_lines,
+    "csv": _csv_lines,
+}
+
+
+def _size(lines: Lines) -> int:
+    head, body = lines
+    # +1 per ogni "\n" del join
+    return sum(map(len, head)) + sum(map(len, body)) + len(head) + len(body)
+
+
+def _render(headers: List[str], columns: List[List[str]], output_format: str) -> Tuple[str, Lines]:
+    if output_format != "auto":
+        return output_format, _RENDERERS[output_format](headers, columns)
+    candidates = [(name, renderer(headers, columns)) for name, renderer in _RENDERERS.items()]
+    return min(candidates, key=lambda item: _size(item[1]))
+
+
+def _layout(
+    headers: List[str],
+    rows: Sequence[Sequence[Any]],
+    budget_chars: Optional[int],
+    max_cell_chars: Optional[int],
+    output_format: str,
+) -> Tuple[List[str], List[str], List[str]]:
+    """Render ``rows`` within the budget; return (header lines, row lines kept, notes)."""
+    cells_by_column = [_stringify(values) for values in zip(*rows)]
+
+    notes: List[str] = []
+
+    if max_cell_chars:
+        cut_cells = 0
+        for position, cells in enumerate(cells_by_column):
+            cells_by_column[position], cut = _truncate(cells, max_cell_chars)
+            cut_cells += cut
+        if cut_cells:
+            notes.append(f"{cut_cells} celle troncate a {max_cell_chars} caratteri ({ELLIPSIS}).")
+
+    output_format, lines = _render(headers, cells_by_column, output_format)
+
+    if budget_chars and _size(lines) > budget_chars and len(rows) > 1:
+        # 1) Colonne con lo stesso valore su tutte le righe: spostate in nota
+        constant = [
+            position for position, cells in enumerate(cells_by_column)
+            if len(headers) > 1 and cells.count(cells[0]) == len(cells)
+        ]
+        if constant and len(constant) < len(headers):
+            notes.append(
+                "Colonne con lo stesso valore su tutte le righe (omesse): "
+                + ", ".join(f"{headers[p]}={cells_by_column[p][0]}" for p in constant)
+            )
+            headers = [h for p, h in enumerate(headers) if p not in constant]
+            cells_by_column = [c for p, c in enumerate(cells_by_column) if p not in constant]
+            output_format, lines = _render(headers, cells_by_column, output_format)
+
+    head, body = lines
+    if budget_chars and _size(lines) > budget_chars:
+        # 2) Omette le ultime righe (almeno una resta sempre)
+        used = sum(map(len, head)) + len(head)
+        kept = 0
+        for line in body:
+            used += len(line) + 1
+            if used > budget_chars and kept:
+                break
+            kept += 1
+        if kept < len(body):
+            notes.append(
+                f"{len(body) - kept} righe omesse per limite di output "
+                f"({budget_chars} caratteri): mostrate {kept} di {len(body)}."
+            )
+            body = body[:kept]
+
+    return head, body, notes
+
+
+def fit_rows(
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    budget_chars: Optional[int] = None,
+    max_cell_chars: Optional[int] = None,
+    output_format: str = "auto",
+) -> int:
+    """
+    Return how many leading rows of ``rows`` ``render_results`` shows with the same options.
+
+    The other rows would be elided for the budget: paged results use this to
+    start the next page at the first row that was not shown.
+    """
+    if not rows:
+        return 0
+    return len(_layout([str(col) for col in columns], rows, budget_chars, max_cell_chars, output_format)[1])
+
+
+def render_results(
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    max_rows: Optional[int] = None,
+    has_more: bool = False,
+    budget_chars: Optional[int] = None,
+    max_cell_chars: Optional[int] = None,
+    output_format: str = "auto",
+    footer: Union[str, Callable[[int], str], None] = None,
+) -> str:
+    """
+    Render a query result for a tool response, within a character budget.
+
+    Args:
+        columns: Column names, in result order
+        rows: Row tuples (or Row objects) aligned with ``columns``
+        max_rows: Maximum number of rows to display
+        has_more: True if the database reported more rows than the ones in ``rows``
+        budget_chars: Maximum size of the rendered rows (None/0 = no limit)
+        max_cell_chars: Longer cells are cut with "…" (None/0 = no limit)
+        output_format: "table", "markdown", "tsv", "csv" or "auto" (shortest)
+        footer: Replaces the default totals note (e.g. paging instructions);
+            a callable receives the number of rows actually shown
+
+    Returns:
+        Rendered result followed by notes on totals and elisions
+
+    Raises:
+        ValueError: If ``output_format`` is unknown
+    """
+    if output_format != "auto" and output_format not in _RENDERERS:
+        raise ValueError(f"Formato di output non supportato: {output_format}")
+
+    if not rows:
+        return "Nessun risultato trovato."
+
+    total_rows = len(rows)
+    if max_rows:
+        rows = rows[:max_rows]
+        truncated = has_more or len(rows) < total_rows
+    else:
+        truncated = has_more
+
+    headers = [str(col) for col in columns]
+    head, body, notes = _layout(headers, rows, budget_chars, max_cell_chars, output_format)
+
+    result = "\n".join(head + body)
+
+    if notes:
+        result += "\n\n" + "\n".join(f"({note})" for note in notes)
+
+    # Righe effettivamente mostrate, dopo l'eventuale omissione per budget
+    shown = len(body)
+    if footer is not None:
+        result += f"\n\n{footer(shown) if callable(footer) else footer}"
+    elif truncated:
+        result += (
+            f"\n\n(Mostrati i primi {shown} risultati: la query restituisce altre righe. "
+            "Aggiungi filtri, TOP o aggregazioni per restringere il risultato.)"
+        )
+    else:
+        result += f"\n\n(Totale: {total_rows} righe)"
+
+    return result
@@ -0,0 +1,290 @@
+"""
+Risultati di sql_select conservati per la paginazione (tool sql_next_page).
+
+Quando una query restituisce più di MAX_QUERY_RESULTS righe il modello tende
+a rieseguirla con OFFSET per leggere il seguito, e SQL Server ricalcola tutto
+ogni volta. Con la paginazione attiva sql_select, dopo la prima pagina,
+continua a leggere dal cursore già aperto (fino a RESULT_STORE_MAX_ROWS righe)
+e conserva le righe sotto un handle di breve durata: sql_next_page serve le
+pagine successive da qui, senza tornare sul database.
+
+Limiti:
+- TTL (RESULT_STORE_TTL_SECONDS) dall'ultimo accesso e numero massimo di handle (LRU)
+- Memoria: le pagine sono serializzate in un file temporaneo "spooled"; finché
+  il totale in RAM resta sotto RESULT_STORE_MEMORY_BYTES restano in memoria,
+  oltre vengono spostate su disco
+
+Ogni pagina contiene al massimo MAX_QUERY_RESULTS righe, ridotte a quelle che
+entrano nel budget di output del tool: le righe che il renderer ometterebbe
+passano alla pagina successiva, così ogni riga conservata viene mostrata.
+"""
+import pickle
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+class StoredPage(NamedTuple):
+    """Una pagina letta da un handle."""
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+    page: int
+    page_count: int
+    first_row: int  # Numero (1-based) della prima riga della pagina nel risultato
+    total_rows: int  # Righe conservate, inclusa la prima pagina già mostrata
+    complete: bool  # False se la lettura si è fermata al limite di righe
+
+
+class _StoredResult:
+    """Pagine di un risultato serializzate in un file temporaneo (RAM finché non viene spostato su disco)."""
+
+    def __init__(self, db_uri: Optional[str], columns: List[str], page_size: int, first_page_rows: int):
+        self.db_uri = db_uri or ""
+        self.columns = columns
+        self.page_size = page_size
+        self.first_page_rows = first_page_rows
+        self.file = tempfile.SpooledTemporaryFile(max_size=0)  # max_size=0: rollover solo esplicito
+        # (offset, lunghezza, prima riga 1-based) di ogni pagina dalla 2 in poi
+        self.offsets: List[Tuple[int, int, int]] = []
+        self.stored_rows = 0
+        self.complete = False
+        self.size = 0
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def on_disk(self) -> bool:
+        return bool(getattr(self.file, "_rolled", False))
+
+    @property
+    def page_count(self) -> int:
+        return 1 + len(self.offsets)
+
+    def append_page(self, rows: Sequence[Sequence[Any]]) -> int:
+        data = pickle.dumps([tuple(row) for row in rows], protocol=pickle.HIGHEST_PROTOCOL)
+        first_row = self.first_page_rows + self.stored_rows + 1
+        with self.lock:
+            self.file.seek(0, 2)
+            self.offsets.append((self.size, len(data), first_row))
+            self.file.write(data)
+        self.size += len(data)
+        self.stored_rows += len(rows)
+        return len(data)
+
+    def read_page(self, index: int) -> Tuple[int, List[Tuple[Any, ...]]]:
+        """Return (first row number, rows) of the ``index``-th stored page."""
+        offset, length, first_row = self.offsets[index]
+        with self.lock:
+            self.file.seek(offset)
+            data = self.file.read(length)
+        return first_row, pickle.loads(data)
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+def fit_page(rows: List[Any], fit: Callable[[List[Any]], int]) -> Tuple[List[Any], List[Any]]:
+    """
+    Split ``rows`` into the leading rows that ``fit`` shows in full and the rest.
+
+    ``fit`` returns how many leading rows of a page fit in the tool output
+    (at least one). The page is shrunk until all of its rows are shown.
+    """
+    kept = len(rows)
+    while kept:
+        shown = fit(rows[:kept])
+        if shown >= kept:
+            break
+        kept = max(shown, 1)
+    return rows[:kept], rows[kept:]
+
+
+class ResultStore:
+    """
+    Handle -> pagine successive alla prima di un risultato di sql_select.
+
+    Example:
+        >>> handle = result_store.capture(db_uri, columns, extra_rows, result.fetchmany, page_size=100)
+        >>> page = result_store.get_page(handle.handle, 2, db_uri)
+    """
+
+    def __init__(self, ttl_seconds: int, max_rows: int, memory_bytes: int, max_handles: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.memory_bytes = memory_bytes
+        self.max_handles = max_handles
+        self._entries: "OrderedDict[str, _StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_used = 0
+        self.captured = 0
+        self.pages_served = 0
+        self.expired = 0
+        self.evicted = 0
+        self.spilled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rows > 0
+
+    def _reserve_memory(self, entry: _StoredResult, size: int) -> None:
+        """Account ``size`` new bytes of ``entry``, spilling it to disk when the memory budget is exceeded."""
+        with self._lock:
+            if entry.on_disk:
+                return
+            if self._memory_used + size <= self.memory_bytes:
+                self._memory_used += size
+                return
+            self._memory_used -= entry.size - size  # I byte già contati passano su disco
+            self.spilled += 1
+        with entry.lock:
+            entry.file.rollover()
+
+    def _release(self, handle: str) -> None:
+        """Remove and close an entry. Caller holds ``_lock``."""
+        entry = self._entries.pop(handle)
+        if not entry.on_disk:
+            self._memory_used -= entry.size
+        entry.close()
+
+    def _sweep(self) -> None:
+        """Drop expired entries, then the least recently used beyond ``max_handles``. Caller holds ``_lock``."""
+        now = time.monotonic()
+        for handle in [h for h, e in self._entries.items() if e.expires_at <= now]:
+            self._release(handle)
+            self.expired += 1
+        while len(self._entries) > self.max_handles:
+            self._release(next(iter(self._entries)))
+            self.evicted += 1
+
+    def capture(
+        self,
+        db_uri: Optional[str],
+        columns: Sequence[str],
+        pending_rows: Sequence[Sequence[Any]],
+        fetch: Callable[[int], Sequence[Sequence[Any]]],
+        page_size: int,
+        first_page_rows: int,
+        fit: Optional[Callable[[List[Any]], int]] = None,
+    ) -> Tuple[str, _StoredResult]:
+        """
+        Read the rest of a result into a new handle.
+
+        Args:
+            db_uri: Database of the query: pages are only served to tools of the same database
+            columns: Column names
+            pending_rows: Rows already fetched after the first page
+            fetch: ``fetchmany`` of the open result, called until it returns no rows
+                or ``max_rows`` rows are stored
+            page_size: Maximum rows per page (MAX_QUERY_RESULTS)
+            first_page_rows: Rows shown in the first page (sql_select response)
+            fit: Leading rows of a page shown within the output budget (see
+                ``fit_page``); rows that do not fit move to the next page
+
+        Returns:
+            Tuple of (handle, stored result); ``complete`` is False when reading
+            stopped at the row limit and the caller must cancel the cursor
+        """
+        entry = _StoredResult(db_uri, [str(c) for c in columns], page_size, first_page_rows)
+        buffered = list(pending_rows)[:self.max_rows]
+        try:
+            while True:
+                remaining = self.max_rows - entry.stored_rows - len(buffered)
+                if len(buffered) < page_size and remaining > 0 and not entry.complete:
+                    rows = fetch(min(page_size - len(buffered), remaining))
+                    if not rows:
+                        entry.complete = True
+                    buffered.extend(rows)
+                    continue
+                if not buffered:
+                    break
+                page, buffered = buffered[:page_size], buffered[page_size:]
+                if fit is not None:
+                    page, left_over = fit_page(page, fit)
+                    buffered = left_over + buffered
+                self._reserve_memory(entry, entry.append_page(page))
+        except BaseException:
+            with self._lock:
+                if not entry.on_disk:
+                    self._memory_used -= entry.size
+            entry.close()
+            raise
+
+        with self._lock:
+            self._sweep()
+            # Un handle già in uso verrebbe sovrascritto senza chiuderne il file
+            handle = secrets.token_hex(4)
+            while handle in self._entries:
+                handle = secrets.token_hex(4)
+            entry.expires_at = time.monotonic() + self.ttl_seconds
+            self._entries[handle] = entry
+            self.captured += 1
+            self._sweep()
+        return handle, entry
+
+    def get_page(self, handle: str, page: int, db_uri: Optional[str]) -> Optional[StoredPage]:
+        """
+        Return page ``page`` (2..page_count) of ``handle``, or None if the handle is unknown or expired.
+
+        Raises:
+            IndexError: If ``page`` is outside the stored pages
+        """
+        with self._lock:
+            self._sweep()
+            entry = self._entries.get(handle.strip())
+            if entry is None or entry.db_uri != (db_uri or ""):
+                return None
+            # Ogni accesso rinnova la scadenza
+            entry.expires_at = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(handle.strip())
+
+        if page < 2 or page > entry.page_count:
+            raise IndexError(page)
+        first_row, rows = entry.read_page(page - 2)
+        with self._lock:
+            self.pages_served += 1
+        return StoredPage(
+            columns=entry.columns,
+            rows=rows,
+            page=page,
+            page_count=entry.page_count,
+            first_row=first_row,
+            total_rows=entry.first_page_rows + entry.stored_rows,
+            complete=entry.complete,
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            for handle in list(self._entries):
+                self._release(handle)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "handles": len(self._entries),
+                "on_disk": sum(1 for e in self._entries.values() if e.on_disk),
+                "memory_bytes": self._memory_used,
+                "memory_limit_bytes": self.memory_bytes,
+                "disk_bytes": sum(e.size for e in self._entries.values() if e.on_disk),
+                "captured": self.captured,
+                "pages_served": self.pages_served,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "spilled": self.spilled,
+            }
+
+
+result_store = ResultStore(
+    ttl_seconds=settings.result_store_ttl_seconds,
+    max_rows=settings.result_store_max_rows,
+    memory_bytes=settings.result_store_memory_bytes,
+    max_handles=settings.result_store_max_handles,
+)
@@ -0,0 +1,253 @@
+"""
+Riepilogo statistico di un risultato SQL calcolato lato server (tool sql_describe).
+
+Per le domande di "andamento" sql_select restituisce al massimo
+MAX_QUERY_RESULTS righe grezze e lascia i conti al modello. Il riepilogo
+invece legge TUTTE le righe della query (fino a SQL_DESCRIBE_MAX_ROWS) a
+blocchi, le accumula in buffer colonnari NumPy e restituisce solo:
+- Colonne numeriche: conteggio, NULL, somma, media, min, percentili, max
+- Colonne testuali: valori distinti e top-k con frequenza
+- Colonne data: intervallo coperto
+- Andamento per periodo (mese) sulla prima colonna data: righe e somme
+  delle colonne numeriche, con variazione % rispetto al periodo precedente
+
+Il testo prodotto ha dimensione indipendente dal numero di righe lette.
+"""
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+PERCENTILES = (25, 50, 75, 95)
+
+# Oltre questo numero di valori distinti il Counter di una colonna testuale smette di crescere
+_MAX_TRACKED_CATEGORIES = 50_000
+
+
+def _format_number(value: float) -> str:
+    if value is None or np.isnan(value):
+        return "-"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+
+class _ColumnBuffer:
+    """Accumula una colonna a blocchi: numeri in array NumPy, il resto in contatori."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.kind: Optional[str] = None  # "number", "date" o "text", dal primo valore non NULL
+        self.rows_seen = 0
+        self.nulls = 0
+        self._chunks: List[np.ndarray] = []
+        self._months: List[np.ndarray] = []
+        self.categories: Counter = Counter()
+        self.min_date: Optional[date] = None
+        self.max_date: Optional[date] = None
+
+    @staticmethod
+    def _kind_of(value: Any) -> str:
+        if isinstance(value, bool):
+            return "text"
+        if isinstance(value, (int, float, Decimal)):
+            return "number"
+        if isinstance(value, (date, datetime)):
+            return "date"
+        return "text"
+
+    def add(self, values: Sequence[Any]) -> None:
+        """Add one chunk of values (NULLs included) to the buffer."""
+        present = [v for v in values if v is not None]
+        self.nulls += len(values) - len(present)
+        if self.kind is None and present:
+            self.kind = self._kind_of(present[0])
+            # Blocchi precedenti tutti NULL: riempimento per restare allineati alle righe
+            if self.rows_seen and self.kind == "number":
+                self._chunks.append(np.full(self.rows_seen, np.nan))
+            elif self.rows_seen and self.kind == "date":
+                self._months.append(np.full(self.rows_seen, -1, dtype=np.int64))
+        self.rows_seen += len(values)
+
+        if self.kind == "number":
+            try:
+                # NaN per i NULL: gli array restano allineati alle righe (serve per i periodi)
+                numbers = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+            except (TypeError, ValueError):
+                # Tipi misti (es. sql_variant, o testo dopo un primo valore numerico): riepilogo testuale
+                self._downgrade_to_text()
+            else:
+                self._chunks.append(numbers)
+        elif self.kind == "date":
+            months = np.array(
+                [-1 if v is None else v.year * 12 + v.month - 1 for v in values], dtype=np.int64
+            )
+            self._months.append(months)
+            if present:
+                low, high = min(present), max(present)
+                self.min_date = low if self.min_date is None else min(self.min_date, low)
+                self.max_date = high if self.max_date is None else max(self.max_date, high)
+        if self.kind == "text":
+            if len(self.categories) < _MAX_TRACKED_CATEGORIES:
+                self.categories.update(str(v) for v in present)
+
+    def _downgrade_to_text(self) -> None:
+        """Turn a number column into a text column, counting the values already read as categories."""
+        seen = self.numbers()
+        seen = seen[~np.isnan(seen)]
+        self.categories.update(str(int(v)) if v.is_integer() else str(v) for v in seen)
+        self._chunks = []
+        self.kind = "text"
+
+    def numbers(self) -> np.ndarray:
+        return np.concatenate(self._chunks) if self._chunks else np.empty(0)
+
+    def months(self) -> np.ndarray:
+        return np.concatenate(self._months) if self._months else np.empty(0, dtype=np.int64)
+
+
+class ResultSummary:
+    """
+    Riepilogo incrementale: ``add_rows`` per ogni blocco letto dal cursore, poi ``render``.
+
+    Example:
+        >>> summary = ResultSummary(["Data", "Importo"])
+        >>> summary.add_rows(result.fetchmany(10_000))
+        >>> print(summary.render(top_k=5, periods=12))
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = [str(c) for c in columns]
+        self.buffers = [_ColumnBuffer(c) for c in self.columns]
+        self.row_count = 0
+
+    def add_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        if not rows:
+            return
+        self.row_count += len(rows)
+        for buffer, values in zip(self.buffers, zip(*rows)):
+            buffer.add(values)
+
+    def _numeric_section(self, numeric: List[_ColumnBuffer]) -> List[str]:
+        header = ["colonna", "valori", "NULL", "somma", "media", "min"]
+        header += [f"p{p}" for p in PERCENTILES] + ["max"]
+        lines = ["Colonne numeriche:", " | ".join(header)]
+        for buffer in numeric:
+            values = buffer.numbers()
+            values = values[~np.isnan(values)]
+            if values.size == 0:
+                lines.append(f"{buffer.name} | 0 | {buffer.nulls}")
+                continue
+            percentiles = np.percentile(values, PERCENTILES)
+            cells = [
+                buffer.name,
+                _format_number(values.size),
+                _format_number(buffer.nulls),
+                _format_number(values.sum()),
+                _format_number(values.mean()),
+                _format_number(values.min()),
+                *(_format_number(p) for p in percentiles),
+                _format_number(values.max()),
+            ]
+            lines.append(" | ".join(cells))
+        return lines
+
+    def _text_section(self, text_columns: List[_ColumnBuffer], top_k: int) -> List[str]:
+        lines = [f"Colonne testuali (primi {top_k} valori):"]
+        for buffer in text_columns:
+            counted = sum(buffer.categories.values())
+            distinct = len(buffer.categories)
+            distinct_text = f"{distinct:,}" + ("+" if distinct >= _MAX_TRACKED_CATEGORIES else "")
+            top = ", ".join(
+                f"{value} {count:,} ({count / counted:.1%})"
+                for value, count in buffer.categories.most_common(top_k)
+            )
+            lines.append(f"{buffer.name}: {distinct_text} distinti, {buffer.nulls:,} NULL; {top}")
+        return lines
+
+    def _period_section(self, date_column: _ColumnBuffer, numeric: List[_ColumnBuffer], periods: int) -> List[str]:
+        months = date_column.months()
+        valid = months >= 0
+        if not valid.any():
+            return []
+
+        keys, inverse = np.unique(months[valid], return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = []
+        for buffer in numeric:
+            values = buffer.numbers()[valid]
+            sums.append(np.bincount(inverse, weights=np.nan_to_num(values), minlength=len(keys)))
+
+        shown = slice(max(len(keys) - periods, 0), len(keys))
+        header = ["periodo", "righe"]
+        for buffer in numeric:
+            header += [buffer.name, f"Δ% {buffer.name}"]
+        lines = [
+            f"Andamento mensile per {date_column.name} (ultimi {min(periods, len(keys))} di {len(keys)} periodi):",
+            " | ".join(header),
+        ]
+        for position in range(len(keys))[shown]:
+            key = int(keys[position])
+            cells = [f"{key // 12}-{key % 12 + 1:02d}", f"{counts[position]:,}"]
+            for column_sums in sums:
+                current = column_sums[position]
+                previous = column_sums[position - 1] if position > 0 else None
+                if previous:
+                    delta = f"{(current - previous) / abs(previous):+.1%}"
+                else:
+                    delta = "-"
+                cells += [_format_number(current), delta]
+            lines.append(" | ".join(cells))
+        return lines
+
+    def render(self, top_k: int = 5, periods: int = 12, truncated: bool = False) -> str:
+        """
+        Return the textual summary.
+
+        Args:
+            top_k: Most frequent values shown for each text column
+            periods: Most recent monthly periods shown in the trend section
+            truncated: True if reading stopped at the row limit
+        """
+        if self.row_count == 0:
+            return "Nessun risultato trovato."
+
+        coverage = "statistiche PARZIALI: raggiunto il limite di righe lette" if truncated else "tutte le righe"
+        sections = [[f"Righe analizzate: {self.row_count:,} ({coverage})"]]
+
+        numeric = [b for b in self.buffers if b.kind == "number"]
+        text_columns = [b for b in self.buffers if b.kind == "text"]
+        dates = [b for b in self.buffers if b.kind == "date"]
+        empty = [b.name for b in self.buffers if b.kind is None]
+
+        if numeric:
+            sections.append(self._numeric_section(numeric))
+        if text_columns:
+            sections.append(self._text_section(text_columns, top_k))
+        if dates:
+            sections.append(["Colonne data:"] + [
+                f"{b.name}: da {b.min_date} a {b.max_date}, {b.nulls:,} NULL" for b in dates
+            ])
+            period_lines = self._period_section(dates[0], numeric, periods)
+            if period_lines:
+                sections.append(period_lines)
+        if empty:
+            sections.append([f"Colonne sempre NULL: {', '.join(empty)}"])
+
+        return "\n\n".join("\n".join(lines) for lines in sections)
+
+
+def summarize_rows(
+    columns: Sequence[str],
+    chunks: Iterable[Sequence[Sequence[Any]]],
+    top_k: int = 5,
+    periods: int = 12,
+    truncated: bool = False,
+) -> str:
+    """Build a summary from an iterable of row chunks (convenience wrapper for ``ResultSummary``)."""
+    summary = ResultSummary(columns)
+    for chunk in chunks:
+        summary.add_rows(chunk)
+    return summary.render(top_k=top_k, periods=periods, truncated=truncated)
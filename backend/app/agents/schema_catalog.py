@@ -0,0 +1,460 @@
+"""
+Catalogo in memoria dello schema del database per il tool get_schema.
+
+Invece di interrogare INFORMATION_SCHEMA.TABLES/COLUMNS ad ogni chiamata di
+get_schema (2-4 round trip per domanda), ogni coppia (db_uri, schema_name)
+ha un catalogo caricato con UNA query bulk e servito dalla memoria.
+
+Il catalogo viene:
+- Letto dal file di snapshot locale (SCHEMA_SNAPSHOT_DIR) appena registrato:
+  dopo un riavvio get_schema risponde subito, senza attendere il database
+- Rivalidato in background all'avvio e periodicamente dallo scheduler
+  (SCHEMA_CATALOG_REFRESH_MINUTES): la query bulk viene rieseguita solo se
+  l'impronta dello schema (numero di tabelle/viste e MAX(modify_date) da
+  sys.objects) è cambiata
+- Aggiornato su richiesta dall'admin (POST /api/admin/agents/{id}/schema/refresh)
+
+Ogni refresh costruisce un nuovo snapshot e lo sostituisce in un solo
+assegnamento: le letture concorrenti vedono sempre uno snapshot completo.
+Dopo ogni caricamento dal database lo snapshot viene salvato su file.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.agents.engine_registry import engine_registry, set_driver_timeout
+from app.agents.schema_index import FuzzyNameIndex, NameEntry
+from app.config import get_settings
+from app.database.database import mask_db_uri
+
+settings = get_settings()
+
+# Schemi di sistema esclusi quando l'agente non ha uno schema configurato
+SYSTEM_SCHEMAS = ("sys", "INFORMATION_SCHEMA", "guest", "chat_ai")
+
+# Versione del formato dei file di snapshot: file di versioni diverse vengono ignorati
+SNAPSHOT_VERSION = 1
+
+
+class ColumnInfo(NamedTuple):
+    """Colonna di una tabella/vista, come riportata da INFORMATION_SCHEMA.COLUMNS."""
+    name: str
+    data_type: str
+    nullable: str
+    max_length: Optional[int]
+
+
+class TableInfo(NamedTuple):
+    """Tabella o vista con le sue colonne in ordine di ORDINAL_POSITION."""
+    schema: str
+    name: str
+    table_type: str
+    columns: Tuple[ColumnInfo, ...]
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.schema}.{self.name}"
+
+
+class _CatalogSnapshot:
+    """Stato immutabile di un catalogo: sostituito per intero ad ogni refresh."""
+
+    def __init__(self, tables: List[TableInfo]):
+        self.tables = tables
+        # SQL Server usa di default collation case-insensitive: indicizziamo in minuscolo
+        self.by_full_name: Dict[str, TableInfo] = {t.full_name.lower(): t for t in tables}
+        self.by_name: Dict[str, List[TableInfo]] = {}
+        for table in tables:
+            self.by_name.setdefault(table.name.lower(), []).append(table)
+        self.column_count = sum(len(t.columns) for t in tables)
+        # Indice fuzzy per suggerire nomi simili quando get_schema non trova una tabella
+        self.name_index = FuzzyNameIndex(
+            [NameEntry("table", t.full_name, t.name) for t in tables]
+            + [
+                NameEntry("column", f"{t.full_name}.{c.name} ({c.data_type})", c.name)
+                for t in tables
+                for c in t.columns
+            ]
+        )
+
+
+def snapshot_file(prefix: str, db_uri: Optional[str], schema_name: Optional[str]) -> Optional[str]:
+    """
+    Path of a snapshot file for (db_uri, schema_name) in SCHEMA_SNAPSHOT_DIR (None = disabled).
+
+    The key is hashed: the db_uri (with credentials) never ends up in the file name.
+    """
+    if not settings.schema_snapshot_dir:
+        return None
+    digest = hashlib.sha256(f"{db_uri or ''}|{schema_name or ''}".encode("utf-8")).hexdigest()
+    return os.path.join(settings.schema_snapshot_dir, f"{prefix}_{digest[:20]}.json")
+
+
+def write_snapshot_file(path: str, document: Dict[str, Any]) -> None:
+    """Write ``document`` as JSON to ``path`` atomically (temp file + replace)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(document, handle, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def _split_table_name(table_name: str) -> Tuple[Optional[str], str]:
+    """Split "schema.tabella" / "[schema].[tabella]" into (schema, tabella)."""
+    cleaned = table_name.strip().replace("[", "").replace("]", "")
+    if "." in cleaned:
+        schema, name = cleaned.split(".", 1)
+        return schema.strip() or None, name.strip()
+    return None, cleaned
+
+
+class SchemaCatalog:
+    """
+    Catalogo tabelle/colonne di un singolo (db_uri, schema_name).
+
+    Example:
+        >>> catalog = get_schema_catalog(None, "vendite")
+        >>> catalog.ensure_loaded()
+        >>> catalog.find_tables("Movimenti")
+        [TableInfo(schema='vendite', name='Movimenti', ...)]
+    """
+
+    def __init__(self, db_uri: Optional[str], schema_name: Optional[str]):
+        self.db_uri = db_uri
+        self.schema_name = schema_name
+        self._snapshot: Optional[_CatalogSnapshot] = None
+        self._load_lock = threading.Lock()
+        self.loaded_at: Optional[datetime] = None
+        self.load_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        # Impronta dello schema al momento del caricamento (None = non disponibile)
+        self.fingerprint: Optional[str] = None
+        self.source: Optional[str] = None  # "database" o "snapshot"
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        """Snapshot file of this catalog (None when SCHEMA_SNAPSHOT_DIR is empty)."""
+        return snapshot_file("schema", self.db_uri, self.schema_name)
+
+    def _schema_filter(self, column: str) -> Tuple[str, Dict[str, Any]]:
+        """SQL condition restricting ``column`` to the configured schema (or to non-system schemas)."""
+        if self.schema_name:
+            return f" AND {column} = :schema_name", {"schema_name": self.schema_name}
+        excluded = ", ".join(f"'{s}'" for s in SYSTEM_SCHEMAS)
+        return f" AND {column} NOT IN ({excluded})", {}
+
+    def _fetch_fingerprint(self, conn) -> Optional[str]:
+        """
+        Return "<objects>:<max modify_date>" of the tables and views in scope.
+
+        Adding, dropping or altering a table/view changes it. Only SQL Server
+        exposes sys.objects: on other dialects the fingerprint is None and
+        every revalidation reloads the catalog.
+        """
+        if conn.dialect.name != "mssql":
+            return None
+        condition, params = self._schema_filter("SCHEMA_NAME(o.schema_id)")
+        row = conn.execute(
+            text(
+                "SELECT COUNT(*), CONVERT(varchar(33), MAX(o.modify_date), 126) "
+                "FROM sys.objects o WHERE o.type IN ('U', 'V')" + condition
+            ),
+            params,
+        ).one()
+        return f"{row[0]}:{row[1]}"
+
+    def _bulk_query(self) -> Tuple[str, Dict[str, Any]]:
+        query = """
+        SELECT
+            t.TABLE_SCHEMA,
+            t.TABLE_NAME,
+            t.TABLE_TYPE,
+            c.COLUMN_NAME,
+            c.DATA_TYPE,
+            c.IS_NULLABLE,
+            c.CHARACTER_MAXIMUM_LENGTH
+        FROM INFORMATION_SCHEMA.TABLES t
+        LEFT JOIN INFORMATION_SCHEMA.COLUMNS c
+            ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+        WHERE t.TABLE_TYPE IN ('BASE TABLE', 'VIEW')
+        """
+        condition, params = self._schema_filter("t.TABLE_SCHEMA")
+        query += condition
+        query += " ORDER BY t.TABLE_SCHEMA, t.TABLE_NAME, c.ORDINAL_POSITION"
+        return query, params
+
+    def load(self, force: bool = True) -> None:
+        """
+        (Re)load all tables and columns with a single bulk query.
+
+        Args:
+            force: If False, skip the query when another caller already loaded it
+
+        Raises:
+            Exception: Database errors are recorded in ``last_error`` and re-raised;
+                the previous snapshot (if any) stays in service.
+        """
+        with self._load_lock:
+            if not force and self._snapshot is not None:
+                return
+
+            started = time.perf_counter()
+            query, params = self._bulk_query()
+            try:
+                with engine_registry.get(self.db_uri).connect() as conn:
+                    # execution_options(timeout=...) è ignorato da pyodbc: timeout sulla connessione DBAPI
+                    restore_timeout = set_driver_timeout(conn, settings.query_timeout_seconds)
+                    try:
+                        # Impronta letta prima dei dati: una modifica concorrente verrà vista al giro dopo
+                        fingerprint = self._fetch_fingerprint(conn)
+                        rows = conn.execute(text(query), params).fetchall()
+                    finally:
+                        restore_timeout()
+            except Exception as exc:
+                self.last_error = str(exc)
+                raise
+
+            tables: List[TableInfo] = []
+            current_key = None
+            columns: List[ColumnInfo] = []
+            for schema, name, table_type, column, data_type, nullable, max_length in rows:
+                if (schema, name) != current_key:
+                    if current_key is not None:
+                        tables.append(TableInfo(*current_key, current_type, tuple(columns)))
+                    current_key, current_type, columns = (schema, name), table_type, []
+                if column is not None:
+                    columns.append(ColumnInfo(column, data_type, nullable, max_length))
+            if current_key is not None:
+                tables.append(TableInfo(*current_key, current_type, tuple(columns)))
+
+            self._snapshot = _CatalogSnapshot(tables)
+            self.loaded_at = datetime.now()
+            self.load_ms = (time.perf_counter() - started) * 1000
+            self.last_error = None
+            self.fingerprint = fingerprint
+            self.source = "database"
+            self._save_snapshot(tables)
+
+        print(
+            f"[SchemaCatalog] {mask_db_uri(self.db_uri)} schema={self.schema_name or '*'}: "
+            f"{len(tables)} tabelle caricate in {self.load_ms:.0f}ms"
+        )
+
+    def _save_snapshot(self, tables: List[TableInfo]) -> None:
+        """Write the catalog to its snapshot file (atomic replace). Caller holds ``_load_lock``."""
+        path = self.snapshot_path
+        if path is None:
+            return
+        document = {
+            "version": SNAPSHOT_VERSION,
+            "db": mask_db_uri(self.db_uri),
+            "schema": self.schema_name,
+            "fingerprint": self.fingerprint,
+            "saved_at": self.loaded_at.isoformat(),
+            "tables": [
+                [t.schema, t.name, t.table_type, [list(c) for c in t.columns]]
+                for t in tables
+            ],
+        }
+        try:
+            write_snapshot_file(path, document)
+        except OSError as exc:
+            print(f"[SchemaCatalog] Snapshot non salvato ({path}): {exc}")
+
+    def load_snapshot(self) -> bool:
+        """
+        Load the catalog from its snapshot file, if the catalog is still empty.
+
+        Returns:
+            True if the snapshot was loaded. A missing, unreadable or outdated
+            file is ignored: the catalog is then loaded from the database.
+        """
+        path = self.snapshot_path
+        if path is None or not os.path.exists(path):
+            return False
+
+        with self._load_lock:
+            if self._snapshot is not None:
+                return False
+            started = time.perf_counter()
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    document = json.load(handle)
+                if document.get("version") != SNAPSHOT_VERSION:
+                    return False
+                tables = [
+                    TableInfo(schema, name, table_type, tuple(ColumnInfo(*column) for column in columns))
+                    for schema, name, table_type, columns in document["tables"]
+                ]
+                saved_at = datetime.fromisoformat(document["saved_at"])
+            except (OSError, ValueError, KeyError, TypeError) as exc:
+                print(f"[SchemaCatalog] Snapshot ignorato ({path}): {exc}")
+                return False
+
+            self._snapshot = _CatalogSnapshot(tables)
+            self.loaded_at = saved_at
+            self.load_ms = (time.perf_counter() - started) * 1000
+            self.fingerprint = document.get("fingerprint")
+            self.source = "snapshot"
+
+        print(
+            f"[SchemaCatalog] {mask_db_uri(self.db_uri)} schema={self.schema_name or '*'}: "
+            f"{len(tables)} tabelle lette dallo snapshot in {self.load_ms:.0f}ms"
+        )
+        return True
+
+    def revalidate(self) -> bool:
+        """
+        Reload the catalog only if the schema fingerprint changed (or is not available).
+
+        Returns:
+            True if the catalog was reloaded from the database
+        """
+        if self._snapshot is not None and self.fingerprint is not None:
+            with engine_registry.get(self.db_uri).connect() as conn:
+                restore_timeout = set_driver_timeout(conn, settings.query_timeout_seconds)
+                try:
+                    current = self._fetch_fingerprint(conn)
+                finally:
+                    restore_timeout()
+            if current == self.fingerprint:
+                return False
+        self.load()
+        return True
+
+    def ensure_loaded(self) -> None:
+        """Load the catalog on first use (no-op when already loaded)."""
+        if self._snapshot is None:
+            self.load(force=False)
+
+    def list_tables(self) -> List[TableInfo]:
+        """Return all tables and views, ordered by schema and name."""
+        return list(self._snapshot.tables) if self._snapshot else []
+
+    def find_tables(self, table_name: str) -> List[TableInfo]:
+        """
+        Look up a table by "tabella" or "schema.tabella" (case-insensitive).
+
+        Without an explicit schema, every schema containing that table name matches.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return []
+
+        schema, name = _split_table_name(table_name)
+        if schema:
+            table = snapshot.by_full_name.get(f"{schema}.{name}".lower())
+            return [table] if table else []
+        return list(snapshot.by_name.get(name.lower(), []))
+
+    def suggest(self, table_name: str, top_k: int = 5) -> Tuple[List[str], List[str]]:
+        """
+        Return the tables and columns whose names are closest to ``table_name``.
+
+        Used when a lookup misses, so the model can retry with a real name
+        without listing the whole schema first.
+
+        Returns:
+            Tuple of (table labels, column labels), best match first
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return [], []
+
+        _, name = _split_table_name(table_name)
+        tables = snapshot.name_index.search(name, kind="table", top_k=top_k)
+        columns = snapshot.name_index.search(name, kind="column", top_k=top_k)
+        return [entry.label for entry, _ in tables], [entry.label for entry, _ in columns]
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "db": mask_db_uri(self.db_uri),
+            "schema": self.schema_name,
+            "loaded": snapshot is not None,
+            "tables": len(snapshot.tables) if snapshot else 0,
+            "columns": snapshot.column_count if snapshot else 0,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "load_ms": round(self.load_ms, 1) if self.load_ms is not None else None,
+            "source": self.source,
+            "fingerprint": self.fingerprint,
+            "last_error": self.last_error,
+        }
+
+
+# Registry globale dei cataloghi, chiave (db_uri, schema_name)
+_catalogs: Dict[Tuple[str, str], SchemaCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_schema_catalog(db_uri: Optional[str], schema_name: Optional[str]) -> SchemaCatalog:
+    """
+    Return (creating it if needed) the catalog for (db_uri, schema_name).
+
+    A new catalog is filled from its snapshot file when one exists.
+    """
+    key = (db_uri or "", schema_name or "")
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        created = catalog is None
+        if created:
+            catalog = _catalogs[key] = SchemaCatalog(db_uri, schema_name)
+    if created:
+        catalog.load_snapshot()
+    return catalog
+
+
+def retain_catalogs(keys: Iterable[Tuple[Optional[str], Optional[str]]]) -> None:
+    """
+    Drop the catalogs whose (db_uri, schema_name) is no longer used by any agent.
+
+    Otherwise the periodic refresh would keep reloading them (and reopening
+    the pool of a database nobody queries any more).
+    """
+    keep = {(db_uri or "", schema_name or "") for db_uri, schema_name in keys}
+    with _catalogs_lock:
+        for key in list(_catalogs):
+            if key not in keep:
+                del _catalogs[key]
+
+
+def refresh_all_catalogs() -> None:
+    """
+    Revalidate every registered catalog.
+
+    Called at startup and by the scheduler. Catalogs whose schema fingerprint
+    did not change are kept (one cheap sys.objects query each); the others
+    are reloaded. A failing database does not stop the refresh of the others.
+    """
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+
+    for catalog in catalogs:
+        try:
+            if not catalog.revalidate():
+                print(
+                    f"[SchemaCatalog] {mask_db_uri(catalog.db_uri)} schema={catalog.schema_name or '*'}: "
+                    "schema invariato, catalogo mantenuto"
+                )
+        except Exception as exc:
+            print(
+                f"[SchemaCatalog] Refresh fallito per {mask_db_uri(catalog.db_uri)} "
+                f"schema={catalog.schema_name or '*'}: {exc}"
+            )
+
+
+def catalog_stats() -> List[Dict[str, Any]]:
+    """Return the status of every registered catalog (for /api/admin/metrics)."""
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+    return [catalog.stats() for catalog in catalogs]
@@ -0,0 +1,86 @@
+"""
+Riepilogo compatto dello schema da aggiungere al system prompt degli agenti.
+
+Il WORKFLOW del system prompt impone get_schema prima di ogni query: per schemi
+piccoli (es. magazzino) sono 1-2 giri di tool per domanda solo per rileggere
+sempre le stesse colonne. Con SCHEMA_DIGEST_MAX_CHARS > 0 il catalogo
+dell'agente viene riassunto una riga per tabella:
+
+    magazzino.Articoli(Codice varchar, Descrizione nvarchar, Prezzo decimal)
+
+entro il budget di caratteri (le tabelle oltre il budget sono solo contate e
+restano raggiungibili con get_schema). Il riepilogo è calcolato dal catalogo
+in memoria e ricalcolato solo quando il catalogo viene ricaricato, cioè quando
+l'impronta dello schema cambia.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.agents.schema_catalog import SchemaCatalog, TableInfo
+
+# Tipi abbreviati nel riepilogo (gli altri restano come in INFORMATION_SCHEMA)
+_SHORT_TYPES = {
+    "datetime2": "datetime",
+    "smalldatetime": "datetime",
+    "datetimeoffset": "datetime",
+    "uniqueidentifier": "guid",
+    "numeric": "decimal",
+    "smallmoney": "money",
+}
+
+
+def _table_line(table: TableInfo) -> str:
+    columns = ", ".join(
+        f"{column.name} {_SHORT_TYPES.get(column.data_type.lower(), column.data_type.lower())}"
+        for column in table.columns
+    )
+    kind = " [vista]" if table.table_type == "VIEW" else ""
+    return f"{table.full_name}{kind}({columns})"
+
+
+def build_schema_digest(tables: List[TableInfo], max_chars: int) -> str:
+    """
+    Render one line per table until ``max_chars`` is reached.
+
+    Tables that do not fit are counted in a closing line instead of being
+    truncated mid-way, so every listed table has all its columns.
+    """
+    lines: List[str] = []
+    used = 0
+    for position, table in enumerate(tables):
+        line = _table_line(table)
+        if used + len(line) + 1 > max_chars:
+            lines.append(f"... altre {len(tables) - position} tabelle/viste non elencate: usa get_schema")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return "\n".join(lines)
+
+
+# Cache (db_uri, schema_name) -> (versione del catalogo, riepilogo)
+_digests: Dict[Tuple[str, str], Tuple[Tuple, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def get_schema_digest(catalog: SchemaCatalog, max_chars: int) -> Optional[str]:
+    """
+    Return the digest of ``catalog``, rebuilding it only if the catalog was reloaded.
+
+    Returns:
+        The digest, or None when the catalog is not loaded yet or has no tables
+    """
+    if max_chars <= 0 or not catalog.is_loaded:
+        return None
+
+    key = (catalog.db_uri or "", catalog.schema_name or "")
+    # Il catalogo viene ricaricato solo quando l'impronta cambia: loaded_at identifica la versione
+    version = (catalog.fingerprint, catalog.loaded_at, max_chars)
+    with _digests_lock:
+        cached = _digests.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1] or None
+
+    digest = build_schema_digest(catalog.list_tables(), max_chars)
+    with _digests_lock:
+        _digests[key] = (version, digest)
+    return digest or None
@@ -0,0 +1,134 @@
+"""
+Indice fuzzy (trigrammi + edit distance) dei nomi di tabelle e colonne.
+
+Quando il modello indovina un nome sbagliato (es. "Clienti" invece della vista
+"vendite.Movimenti"), get_schema restituisce nella stessa risposta i nomi più
+simili presenti nel catalogo, evitando un intero giro LLM per elencare le tabelle.
+
+L'indice viene costruito una volta per ogni refresh del catalogo schema:
+- I trigrammi restringono i candidati (posting list trigramma -> voci)
+- I candidati vengono riordinati con Dice sui trigrammi + Levenshtein normalizzata
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+# Numero massimo di candidati (per trigrammi condivisi) da riordinare con l'edit distance
+_MAX_CANDIDATES = 200
+# Sotto questa soglia un suggerimento è solo rumore
+_MIN_SCORE = 0.3
+
+
+class NameEntry(NamedTuple):
+    """Voce dell'indice: ``label`` è il testo mostrato al modello, ``name`` quello confrontato."""
+    kind: str  # "table" o "column"
+    label: str
+    name: str
+
+
+def _trigrams(value: str) -> Set[str]:
+    padded = f"  {value.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Classic edit distance (insert/delete/substitute), O(len(a) * len(b))."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def similarity(query: str, name: str) -> float:
+    """
+    Score in [0, 1] between a guessed name and a catalog name.
+
+    Mix of trigram Dice coefficient and normalized edit distance, plus a bonus
+    when one name contains the other (es. "Cliente" in "CodiceCliente").
+    """
+    q, n = query.lower(), name.lower()
+    if q == n:
+        return 1.0
+
+    q_grams, n_grams = _trigrams(q), _trigrams(n)
+    dice = 2 * len(q_grams & n_grams) / (len(q_grams) + len(n_grams))
+    edit = 1 - levenshtein(q, n) / max(len(q), len(n))
+    score = 0.6 * dice + 0.4 * edit
+
+    shorter, longer = (q, n) if len(q) <= len(n) else (n, q)
+    # Confronto sulla radice: "clienti" e "cliente" condividono "client"
+    stem = shorter[:-1] if len(shorter) > 4 else shorter
+    if len(stem) >= 3 and stem in longer:
+        score += 0.25
+
+    return min(score, 1.0)
+
+
+class FuzzyNameIndex:
+    """
+    Indice trigrammi sui nomi del catalogo.
+
+    Example:
+        >>> index = FuzzyNameIndex([NameEntry("table", "vendite.Movimenti", "Movimenti")])
+        >>> index.search("Movimento", kind="table")
+        [(NameEntry(kind='table', label='vendite.Movimenti', name='Movimenti'), 0.83)]
+    """
+
+    def __init__(self, entries: Iterable[NameEntry]):
+        self.entries: List[NameEntry] = list(entries)
+        self._postings: Dict[str, List[int]] = {}
+        for position, entry in enumerate(self.entries):
+            for gram in _trigrams(entry.name):
+                self._postings.setdefault(gram, []).append(position)
+
+    def search(self, query: str, kind: str, top_k: int = 5) -> List[Tuple[NameEntry, float]]:
+        """
+        Return up to ``top_k`` entries of the given kind most similar to ``query``.
+
+        Args:
+            query: Name guessed by the model (without schema prefix)
+            kind: "table" or "column"
+            top_k: Number of suggestions to return
+
+        Returns:
+            List of (entry, score) ordered by decreasing score
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        shared: Counter = Counter()
+        for gram in _trigrams(query):
+            for position in self._postings.get(gram, ()):
+                if self.entries[position].kind == kind:
+                    shared[position] += 1
+
+        scored = []
+        for position, _ in shared.most_common(_MAX_CANDIDATES):
+            entry = self.entries[position]
+            score = similarity(query, entry.name)
+            if score >= _MIN_SCORE:
+                scored.append((entry, round(score, 2)))
+
+        scored.sort(key=lambda item: (-item[1], item[0].label))
+
+        # Una colonna presente in più tabelle va suggerita una volta per tabella,
+        # ma la stessa etichetta non deve comparire due volte
+        results: List[Tuple[NameEntry, float]] = []
+        seen: Set[str] = set()
+        for entry, score in scored:
+            if entry.label in seen:
+                continue
+            seen.add(entry.label)
+            results.append((entry, score))
+            if len(results) >= top_k:
+                break
+        return results
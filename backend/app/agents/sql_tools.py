@@ -2,153 +2,878 @@
 SQL query tools for Datapizza agents.
 Tools are created dynamically per agent configuration.
 """
+import asyncio
 import re
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from datapizza.tools import tool
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, CursorResult, Engine, Row
 
-from app.database.database import engine as default_engine
+from app.agents.column_values import get_value_dictionary
+from app.agents.engine_registry import engine_registry, set_driver_timeout
+from app.agents.join_graph import JoinGraph, format_join_path, get_join_graph
+from app.agents.query_export import record_query
+from app.agents.query_guard import check_query_cost
+from app.agents.result_renderer import fit_rows, render_results
+from app.agents.result_store import fit_page, result_store
+from app.agents.result_summary import ResultSummary
+from app.agents.schema_catalog import SchemaCatalog, get_schema_catalog
+from app.agents.sql_validator import validate_sql_query
+from app.agents.tool_executor import single_flight, tool_executor
 from app.config import get_settings
 
 settings = get_settings()
 
-_engine_cache: Dict[str, Engine] = {}
+# Stringhe, identificatori quotati, commenti e sequenze di spazi: usato per
+# normalizzare una query senza toccare il contenuto dei letterali.
+_NORMALIZE_RE = re.compile(
+    r"(N?'(?:[^']|'')*'|\[[^\]]*\]|\"[^\"]*\")|(?:\s|--[^\n]*|/\*.*?\*/)+",
+    re.DOTALL,
+)
 
 
-def validate_sql_query(query: str) -> tuple[bool, str]:
+def normalize_sql(query: str) -> str:
     """
-    Validate SQL query to ensure it's safe.
-    Only SELECT statements are allowed, no data modification.
-    
-    Args:
-        query: SQL query string to validate
-        
-    Returns:
-        Tuple of (is_valid, error_message)
-    """
-    # Remove comments and normalize whitespace
-    query_clean = re.sub(r'--.*$', '', query, flags=re.MULTILINE)
-    query_clean = re.sub(r'/\*.*?\*/', '', query_clean, flags=re.DOTALL)
-    query_clean = query_clean.strip().upper()
-    
-
-    # Check for dangerous keywords
-    dangerous_keywords = [
-        'DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE',
-        'TRUNCATE', 'REPLACE', 'MERGE', 'EXEC', 'EXECUTE',
-        'SP_', 'XP_', 'OPENROWSET', 'OPENDATASOURCE'
-    ]
-    
-    for keyword in dangerous_keywords:
-        if keyword in query_clean:
-            return False, f"Keyword '{keyword}' non è permessa. Solo query di lettura (SELECT) sono consentite."
-    
-    return True, ""
+    Normalize a SQL query for use as a cache key.
+
+    Comments are removed, whitespace runs outside literals collapse to a single
+    space and trailing semicolons are dropped. Literals and quoted identifiers
+    are kept verbatim, so queries differing only in a filter value never share
+    a key.
+    """
+    normalized = _NORMALIZE_RE.sub(lambda m: m.group(1) or " ", query)
+    return normalized.strip().rstrip(";").strip()
+
+
+def cost_key(max_cost: Optional[float]) -> Optional[float]:
+    """
+    Cost threshold as part of the cache and single-flight keys.
+
+    The plan-cost check runs inside the cached/shared work: agents on the
+    same database with different thresholds must not share results (one
+    agent's rejection, or a query another agent's threshold blocks).
+    None and 0 both mean "no check".
+    """
+    return max_cost if max_cost and max_cost > 0 else None
+
+
+# (db_uri, SQL normalizzata, soglia di costo)
+CacheKey = Tuple[str, str, Optional[float]]
+
+
+class QueryResultCache:
+    """
+    Cache TTL + LRU dei risultati di sql_select, già formattati per l'agente.
+
+    La chiave è (db_uri, SQL normalizzata, soglia di costo): un hit evita sia il round trip verso
+    SQL Server sia la formattazione. La cache è limitata per numero di voci e
+    per byte totali; le voci meno usate di recente vengono eliminate per prime.
+    Thread-safe: i tool SQL possono essere eseguiti in parallelo.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, Tuple[float, str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(db_uri: Optional[str], query: str, max_cost: Optional[float]) -> CacheKey:
+        return (db_uri or "", normalize_sql(query), cost_key(max_cost))
+
+    def get(self, db_uri: Optional[str], query: str, max_cost: Optional[float] = None) -> Optional[str]:
+        """Return the cached formatted result, or None on miss/expiry."""
+        key = self._key(db_uri, query, max_cost)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
 
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
 
-def format_results(results: List[Dict[str, Any]], max_rows: int = None) -> str:
+    def put(self, db_uri: Optional[str], query: str, value: str, max_cost: Optional[float] = None) -> None:
+        """Store a formatted result, evicting least recently used entries."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return  # Un singolo risultato più grande dell'intera cache non viene salvato
+
+        key = self._key(db_uri, query, max_cost)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, size)
+            self._bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, db_uri: Optional[str] = None) -> int:
+        """
+        Remove cached results.
+
+        Args:
+            db_uri: Only drop entries of this database. If None, flush everything.
+
+        Returns:
+            Number of removed entries
+        """
+        with self._lock:
+            if db_uri is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                return removed
+
+            keys = [key for key in self._entries if key[0] == db_uri]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.query_cache_enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _remove(self, key: CacheKey) -> None:
+        # Chiamare solo con self._lock acquisito
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+query_cache = QueryResultCache(
+    ttl_seconds=settings.query_cache_ttl_seconds,
+    max_entries=settings.query_cache_max_entries,
+    max_bytes=settings.query_cache_max_bytes,
+)
+
+
+def format_results(
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    max_rows: int = None,
+    has_more: bool = False,
+) -> str:
     """
-    Format query results as a readable string.
-    
+    Format query results as an aligned text table (no output budget).
+
+    Used for get_schema; sql_select goes through ``render_results`` with the
+    tool output budget from settings. Every cell is converted with ``str()``
+    exactly once; the text is the same as before the columnar rewrite.
+
     Args:
-        results: List of row dictionaries
+        columns: Column names, in result order
+        rows: Row tuples (or Row objects) aligned with ``columns``
         max_rows: Maximum number of rows to display
-        
+        has_more: True if the database reported more rows than the ones in
+            ``rows`` (bounded fetch, see ``_fetch_bounded``)
+
     Returns:
         Formatted string representation of results
     """
-    if not results:
+    if not rows:
         return "Nessun risultato trovato."
-    
+
     # Limit results if specified
-    total_rows = len(results)
+    total_rows = len(rows)
     if max_rows:
-        results = results[:max_rows]
-        truncated = len(results) < total_rows
+        rows = rows[:max_rows]
+        truncated = has_more or len(rows) < total_rows
     else:
-        truncated = False
-    
-    # Get column names
-    columns = list(results[0].keys())
-    
-    # Calculate column widths
-    widths = {col: len(str(col)) for col in columns}
-    for row in results:
-        for col in columns:
-            widths[col] = max(widths[col], len(str(row[col])))
-    
+        truncated = has_more
+
+    headers = [str(col) for col in columns]
+
+    # Una lista di stringhe per colonna: str() una volta sola per cella
+    cells_by_column = [list(map(str, values)) for values in zip(*rows)]
+    widths = [
+        max(len(header), max(map(len, cells)))
+        for header, cells in zip(headers, cells_by_column)
+    ]
+
+    # Formato riga precompilato: una sola chiamata format() per riga
+    row_format = " | ".join(f"{{:<{width}}}" for width in widths)
+
     # Build formatted string
-    lines = []
-    
-    # Header
-    header = " | ".join(str(col).ljust(widths[col]) for col in columns)
-    lines.append(header)
-    lines.append("-" * len(header))
-    
-    # Rows
-    for row in results:
-        line = " | ".join(str(row[col]).ljust(widths[col]) for col in columns)
-        lines.append(line)
-    
+    header = row_format.format(*headers)
+    lines = [header, "-" * len(header)]
+    lines.extend(row_format.format(*cells) for cells in zip(*cells_by_column))
+    # Le celle non servono più: liberarle prima del join abbassa il picco di memoria
+    del cells_by_column
+
     result = "\n".join(lines)
-    
+
     if truncated:
-        result += f"\n\n(Mostrati {len(results)} risultati. Risultati totali potrebbero essere di più su {total_rows} righe totali.)"
+        result += (
+            f"\n\n(Mostrati i primi {len(rows)} risultati: la query restituisce altre righe. "
+            "Aggiungi filtri, TOP o aggregazioni per restringere il risultato.)"
+        )
     else:
         result += f"\n\n(Totale: {total_rows} righe)"
-    
+
     return result
 
 
 def _get_engine(db_uri: Optional[str]) -> Engine:
     """Return a SQLAlchemy Engine for the given db_uri.
 
-    If db_uri is None, use the default application engine.
+    If db_uri is None, use the default application engine. Engines and their
+    pools are owned by ``engine_registry``.
+    """
+    return engine_registry.get(db_uri)
+
+
+def _cancel_cursor(result: CursorResult) -> None:
+    """Cancel the statement still running behind ``result`` on the driver.
+
+    pyodbc exposes ``Cursor.cancel()`` (SQLCancel): SQL Server stops producing
+    the remaining rows instead of streaming them to a cursor nobody reads.
+    Drivers without cancel support (e.g. sqlite in dev) are simply closed.
+    """
+    cursor = getattr(result, "cursor", None)
+    cancel = getattr(cursor, "cancel", None)
+    if cancel is not None:
+        try:
+            cancel()
+        except Exception as exc:  # pragma: no cover - dipende dal driver
+            print(f"[sql_tools] Cancel del cursore fallito: {exc}")
+    result.close()
+
+
+# Chiave in Connection.info con l'handle di cancel della query in corso
+_CANCEL_HANDLE_KEY = "sql_tools.cancel_handle"
+
+
+class QueryCancelHandle:
+    """
+    Cancel handle for the statement executed by one ``execute_query`` call.
+
+    The DBAPI cursor is attached when SQLAlchemy is about to execute on it
+    (``before_cursor_execute``); ``cancel()`` can be called from any thread
+    (watchdog timer, event loop when the SSE client disconnects) and stops
+    the statement on the server. A cancel requested before the cursor exists
+    is applied as soon as it is attached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cursor: Any = None
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def attach(self, cursor: Any) -> None:
+        with self._lock:
+            self._cursor = cursor
+            cancelled = self.reason is not None
+        if cancelled:
+            _cancel_dbapi_cursor(cursor)
+
+    def detach(self) -> None:
+        with self._lock:
+            self._cursor = None
+
+    def cancel(self, reason: str = "annullata") -> None:
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            cursor = self._cursor
+        if cursor is not None:
+            print(f"[sql_tools] Cancel della query in corso ({reason})")
+            _cancel_dbapi_cursor(cursor)
+
+
+def _cancel_dbapi_cursor(cursor: Any) -> None:
+    """Stop the statement running on a DBAPI cursor (pyodbc: SQLCancel, sqlite: interrupt)."""
+    try:
+        cancel = getattr(cursor, "cancel", None)
+        if cancel is not None:
+            cancel()
+            return
+        interrupt = getattr(getattr(cursor, "connection", None), "interrupt", None)
+        if interrupt is not None:
+            interrupt()
+    except Exception as exc:  # pragma: no cover - dipende dal driver
+        print(f"[sql_tools] Cancel del cursore fallito: {exc}")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _attach_cancel_handle(conn, cursor, statement, parameters, context, executemany):
+    handle = conn.info.get(_CANCEL_HANDLE_KEY)
+    if handle is not None:
+        handle.attach(cursor)
+
+
+def _fetch_bounded(result: CursorResult, limit: int) -> Tuple[List[Row], bool]:
+    """
+    Read at most ``limit`` rows from ``result`` without materializing the rest.
+
+    Fetches ``limit + 1`` rows: the extra row only tells us that more rows
+    exist. When it does, the rest of the result set is cancelled on the driver.
+
+    Returns:
+        Tuple of (rows, has_more)
+    """
+    rows = result.fetchmany(limit + 1)
+    has_more = len(rows) > limit
+    if has_more:
+        _cancel_cursor(result)
+        rows = rows[:limit]
+    return rows, has_more
+
+
+@contextmanager
+def _guarded_connection(
+    db_uri: Optional[str],
+    handle: QueryCancelHandle,
+    max_row_buffer: int,
+    timeout: Optional[int] = None,
+) -> Iterator[Connection]:
+    """
+    Open a streaming connection with the statement timeout and cancel handle in place.
+
+    The timeout (default ``query_timeout_seconds``) is enforced twice: as the
+    driver statement timeout, and by a watchdog that cancels the cursor (it
+    also covers the time spent fetching rows).
     """
+    timeout = timeout or settings.query_timeout_seconds
+    watchdog = threading.Timer(timeout, handle.cancel, args=("timeout",))
+    watchdog.daemon = True
 
-    if not db_uri:
-        return default_engine
+    # stream_results: cursor lato server dove il dialect lo supporta,
+    # altrimenti pyodbc legge comunque le righe dal TDS stream a richiesta
+    with _get_engine(db_uri).connect().execution_options(
+        stream_results=True,
+        max_row_buffer=max_row_buffer,
+    ) as conn:
+        restore_timeout = set_driver_timeout(conn, timeout)
+        conn.info[_CANCEL_HANDLE_KEY] = handle
+        watchdog.start()
+        try:
+            yield conn
+        finally:
+            watchdog.cancel()
+            conn.info.pop(_CANCEL_HANDLE_KEY, None)
+            handle.detach()
+            restore_timeout()
 
-    if db_uri not in _engine_cache:
-        _engine_cache[db_uri] = create_engine(
-            db_uri,
-            pool_pre_ping=True,
-            pool_size=5,
-            max_overflow=10,
-            echo=False,
+
+def _paging_footer(handle: str, page_count: int, total_rows: int, complete: bool, shown: int) -> str:
+    """Tell the model how to read the stored pages of a sql_select result."""
+    total = f"{total_rows}" if complete else f"oltre {total_rows}"
+    footer = (
+        f"(Mostrati i primi {shown} risultati su {total}. Le righe successive sono già pronte: "
+        f'usa sql_next_page(handle="{handle}", page=2) invece di rieseguire la query con OFFSET '
+        f"(pagine disponibili: 2-{page_count}, valide per {max(settings.result_store_ttl_seconds // 60, 1)} minuti).)"
+    )
+    if not complete:
+        footer += (
+            f"\n(Conservate solo le prime {total_rows} righe: per il resto aggiungi filtri, "
+            "TOP o aggregazioni.)"
+        )
+    return footer
+
+
+def _execution_error_message(exc: Exception, handle: QueryCancelHandle) -> str:
+    """Turn an execution error into the tool response, telling timeouts and cancels apart."""
+    # HYT00: timeout del driver (pyodbc "Query timeout expired")
+    if handle.reason == "timeout" or "HYT00" in str(exc):
+        return (
+            f"ERRORE: La query ha superato il tempo massimo di {settings.query_timeout_seconds} secondi "
+            "ed è stata annullata. Restringi la query con filtri più selettivi, TOP o aggregazioni."
+        )
+    if handle.cancelled:
+        return "ERRORE: Query annullata (richiesta interrotta)."
+    return f"ERRORE durante l'esecuzione della query: {str(exc)}"
+
+
+def execute_query(
+    query: str,
+    db_uri: Optional[str] = None,
+    check_cache: bool = True,
+    max_cost: Optional[float] = None,
+    cancel_handle: Optional[QueryCancelHandle] = None,
+    paging: bool = False,
+) -> str:
+    """Execute a read-only SQL query on the configured database.
+
+    The fetch is bounded to ``max_query_results`` rows: memory and latency do
+    not depend on how many rows the query would return. With ``paging``, the
+    rows after the first page (up to ``result_store_max_rows``) are read from
+    the same cursor into ``result_store`` and served by sql_next_page.
+
+    Args:
+        query: SQL SELECT to execute
+        db_uri: Target database (None = database di default)
+        check_cache: Set to False when the caller already looked up the cache
+        max_cost: Reject the query when its estimated plan cost is higher
+            (SQL Server only, see ``query_guard``; None = no check)
+        cancel_handle: Lets the caller cancel the running statement
+        paging: Keep the following pages under a handle (agents with sql_next_page)
+    """
+
+    is_valid, error_msg = validate_sql_query(query)
+    if not is_valid:
+        return f"ERRORE: {error_msg}"
+
+    if settings.query_cache_enabled and check_cache:
+        cached = query_cache.get(db_uri, query, max_cost)
+        if cached is not None:
+            return cached
+
+    handle = cancel_handle or QueryCancelHandle()
+    if handle.cancelled:
+        return "ERRORE: Query annullata prima dell'esecuzione (richiesta interrotta)."
+
+    max_rows = settings.max_query_results
+    try:
+        rejection = check_query_cost(_get_engine(db_uri), query, db_uri, max_cost)
+        if rejection:
+            return rejection
+
+        with _guarded_connection(db_uri, handle, max_row_buffer=max_rows + 1) as conn:
+            result = conn.execute(text(query))
+            columns = list(result.keys())
+            footer = None
+            if paging and result_store.enabled:
+                rows = result.fetchmany(max_rows + 1)
+                has_more = len(rows) > max_rows
+                if has_more:
+                    def fit(page):
+                        return fit_rows(
+                            columns,
+                            page,
+                            budget_chars=settings.tool_output_budget_chars,
+                            max_cell_chars=settings.tool_output_max_cell_chars,
+                            output_format=settings.tool_output_format,
+                        )
+
+                    # Le righe della prima pagina che non entrano nel budget aprono la pagina 2
+                    first_page, left_over = fit_page(list(rows[:max_rows]), fit)
+                    # Il cursore è già aperto: il seguito si legge ora, non con una nuova query
+                    page_handle, stored = result_store.capture(
+                        db_uri, columns, left_over + list(rows[max_rows:]), result.fetchmany,
+                        page_size=max_rows, first_page_rows=len(first_page), fit=fit,
+                    )
+                    if not stored.complete:
+                        _cancel_cursor(result)
+                    rows = first_page
+                    total_rows = len(first_page) + stored.stored_rows
+                    footer = _paging_footer(
+                        page_handle, stored.page_count, total_rows, stored.complete, len(first_page)
+                    )
+            else:
+                rows, has_more = _fetch_bounded(result, max_rows)
+
+        formatted = render_results(
+            columns,
+            rows,
+            max_rows=max_rows,
+            has_more=has_more,
+            budget_chars=settings.tool_output_budget_chars,
+            max_cell_chars=settings.tool_output_max_cell_chars,
+            output_format=settings.tool_output_format,
+            footer=footer,
+        )
+    except Exception as e:
+        return _execution_error_message(e, handle)
+
+    if footer is not None:
+        return formatted  # L'handle scade: un risultato paginato non va in cache
+
+    # Solo i risultati validi finiscono in cache, mai gli errori
+    if settings.query_cache_enabled:
+        query_cache.put(db_uri, query, formatted, max_cost)
+    return formatted
+
+
+async def _run_tool_query(
+    func: Callable[..., str],
+    query: str,
+    db_uri: Optional[str],
+    flight_key: Tuple[Any, ...],
+    **kwargs: Any,
+) -> str:
+    """
+    Run ``func(query, db_uri=..., cancel_handle=..., **kwargs)`` in the SQL tool pool.
+
+    Identical calls already running (same ``flight_key``) share the in-flight
+    result. When the awaiting coroutine is cancelled (the SSE client of
+    chat_stream disconnected) and nobody else waits for the same call, the
+    statement is cancelled on the database.
+    """
+    handle = QueryCancelHandle()
+
+    def start():
+        return tool_executor.run(db_uri, func, query, db_uri=db_uri, cancel_handle=handle, **kwargs)
+
+    def abandon():
+        handle.cancel("richiesta interrotta")
+
+    if not settings.sql_single_flight_enabled:
+        try:
+            return await start()
+        except asyncio.CancelledError:
+            # Il thread non si interrompe da solo: si ferma lo statement sul database
+            abandon()
+            raise
+
+    # Lo statement viene cancellato solo quando nessun chiamante lo attende più
+    return await single_flight.run(flight_key, start, on_abandon=abandon)
+
+
+async def execute_query_async(
+    query: str,
+    db_uri: Optional[str] = None,
+    max_cost: Optional[float] = None,
+    paging: bool = False,
+) -> str:
+    """
+    Async entry point used by the agent tools.
+
+    A cache hit is answered directly on the event loop; everything else runs
+    in the SQL tool thread pool under the per-database concurrency limit.
+    Identical queries already running on the same database with the same
+    cost threshold are not started again: callers share the in-flight
+    result (``single_flight``).
+    """
+    if settings.query_cache_enabled:
+        cached = query_cache.get(db_uri, query, max_cost)
+        if cached is not None:
+            return cached
+
+    flight_key = (db_uri or "", normalize_sql(query), cost_key(max_cost))
+    if paging:
+        flight_key += ("paging",)
+    return await _run_tool_query(
+        execute_query,
+        query,
+        db_uri,
+        flight_key,
+        check_cache=False,
+        max_cost=max_cost,
+        paging=paging,
+    )
+
+
+def read_result_page(handle: str, page: int, db_uri: Optional[str]) -> str:
+    """
+    Render a page stored by a paged sql_select (see ``result_store``).
+
+    Args:
+        handle: Handle shown in the sql_select response
+        page: Page number (page 1 is the sql_select response itself)
+        db_uri: Database of the calling agent: handles of other databases are not visible
+    """
+    try:
+        stored = result_store.get_page(handle, page, db_uri)
+    except IndexError:
+        return f"ERRORE: Pagina {page} non disponibile per questo handle."
+    if stored is None:
+        return (
+            f"ERRORE: Handle '{handle}' scaduto o inesistente. "
+            "Riesegui la query con sql_select per ottenere un nuovo handle."
         )
 
-    return _engine_cache[db_uri]
+    last_row = stored.first_row + len(stored.rows) - 1
+    total = f"{stored.total_rows}" if stored.complete else f"oltre {stored.total_rows}"
+    if stored.page < stored.page_count:
+        footer = f'(Pagina successiva: sql_next_page(handle="{handle}", page={stored.page + 1}).)'
+    elif stored.complete:
+        footer = "(Ultima pagina: non ci sono altre righe.)"
+    else:
+        footer = (
+            f"(Ultima pagina conservata: il risultato ha più di {stored.total_rows} righe. "
+            "Per il resto aggiungi filtri, TOP o aggregazioni.)"
+        )
 
+    body = render_results(
+        stored.columns,
+        stored.rows,
+        budget_chars=settings.tool_output_budget_chars,
+        max_cell_chars=settings.tool_output_max_cell_chars,
+        output_format=settings.tool_output_format,
+        footer=footer,
+    )
+    return f"Pagina {stored.page} di {stored.page_count} (righe {stored.first_row}-{last_row} su {total})\n\n{body}"
 
-def execute_query(query: str, db_uri: Optional[str] = None) -> str:
-    """Execute a read-only SQL query on the configured database."""
 
+def describe_query(
+    query: str,
+    db_uri: Optional[str] = None,
+    max_cost: Optional[float] = None,
+    cancel_handle: Optional[QueryCancelHandle] = None,
+) -> str:
+    """
+    Run a read-only query and return a statistical summary of its result.
+
+    Rows are streamed in chunks of ``sql_describe_chunk_rows`` into columnar
+    buffers (see ``result_summary``), up to ``sql_describe_max_rows``: the
+    summary covers the whole result, not the first ``max_query_results`` rows.
+
+    Args:
+        query: SQL SELECT to summarize
+        db_uri: Target database (None = database di default)
+        max_cost: Reject the query when its estimated plan cost is higher
+        cancel_handle: Lets the caller cancel the running statement
+    """
     is_valid, error_msg = validate_sql_query(query)
     if not is_valid:
         return f"ERRORE: {error_msg}"
 
-    engine = _get_engine(db_uri)
-    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db = Session()
+    handle = cancel_handle or QueryCancelHandle()
+    if handle.cancelled:
+        return "ERRORE: Query annullata prima dell'esecuzione (richiesta interrotta)."
+
+    chunk_rows = settings.sql_describe_chunk_rows
+    max_rows = settings.sql_describe_max_rows
     try:
-        result = db.execute(
-            text(query),
-            execution_options={"timeout": settings.query_timeout_seconds},
+        rejection = check_query_cost(_get_engine(db_uri), query, db_uri, max_cost)
+        if rejection:
+            return rejection
+
+        with _guarded_connection(db_uri, handle, max_row_buffer=chunk_rows) as conn:
+            result = conn.execute(text(query))
+            summary = ResultSummary(list(result.keys()))
+            truncated = False
+            while True:
+                rows = result.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                remaining = max_rows - summary.row_count
+                if len(rows) > remaining:
+                    summary.add_rows(rows[:remaining])
+                    truncated = True
+                    _cancel_cursor(result)
+                    break
+                summary.add_rows(rows)
+
+        return summary.render(
+            top_k=settings.sql_describe_top_k,
+            periods=settings.sql_describe_periods,
+            truncated=truncated,
         )
-        rows = result.fetchall()
-        results: List[Dict[str, Any]] = [dict(row._mapping) for row in rows]
-        return format_results(results, max_rows=settings.max_query_results)
     except Exception as e:
-        return f"ERRORE durante l'esecuzione della query: {str(e)}"
-    finally:
-        db.close()
+        return _execution_error_message(e, handle)
+
+
+async def describe_query_async(
+    query: str,
+    db_uri: Optional[str] = None,
+    max_cost: Optional[float] = None,
+) -> str:
+    """Async entry point of sql_describe (thread pool, single-flight, cancel on disconnect)."""
+    return await _run_tool_query(
+        describe_query,
+        query,
+        db_uri,
+        (db_uri or "", "sql_describe", normalize_sql(query), cost_key(max_cost)),
+        max_cost=max_cost,
+    )
+
+
+def _table_not_found_message(catalog: SchemaCatalog, table_name: str) -> str:
+    """Build the get_schema miss response, including the closest catalog names."""
+    similar_tables, similar_columns = catalog.suggest(
+        table_name, top_k=settings.schema_suggestions_top_k
+    )
+
+    lines = [f"TABELLA NON TROVATA: '{table_name}'."]
+    if similar_tables:
+        lines.append("Tabelle/viste con nome simile: " + ", ".join(similar_tables))
+    if similar_columns:
+        lines.append("Colonne con nome simile: " + ", ".join(similar_columns))
+    if similar_tables or similar_columns:
+        lines.append("Usa uno di questi nomi, oppure get_schema() senza parametri per vedere tutte le tabelle.")
+    else:
+        lines.append("Usa get_schema() senza parametri per vedere tutte le tabelle.")
+    return "\n".join(lines)
+
+
+def describe_schema(table_name: str, db_uri: Optional[str], schema_name: Optional[str]) -> str:
+    """
+    Describe a table (columns, types, nullable) or list the available tables.
+
+    Served from the in-memory schema catalog (see ``schema_catalog``): the
+    only database access is the first bulk load of the catalog.
+
+    Args:
+        table_name: Table to inspect ("tabella" or "schema.tabella"); empty lists all tables
+        db_uri: Target database (None = database di default)
+        schema_name: Schema configured for the agent (None = all user schemas)
+    """
+    catalog = get_schema_catalog(db_uri, schema_name)
+
+    if table_name.strip():
+        # Caso 1: Dettagli di una tabella specifica ("tabella" o "schema.tabella")
+        try:
+            catalog.ensure_loaded()
+        except Exception as e:
+            return f"ERRORE durante il recupero dello schema: {str(e)}"
+
+        tables = catalog.find_tables(table_name)
+        if not tables:
+            return _table_not_found_message(catalog, table_name)
+
+        rows = [
+            (column.name, column.data_type, column.nullable)
+            for table in tables
+            for column in table.columns
+        ]
+        return format_results(("Colonna", "Tipo", "Nullable"), rows, max_rows=100)
+
+    # Caso 2: Lista di tutte le tabelle disponibili
+    # (solo lo schema configurato, oppure tutti gli schemi non di sistema)
+    try:
+        catalog.ensure_loaded()
+    except Exception as e:
+        return f"ERRORE durante il recupero della lista tabelle: {str(e)}"
+
+    rows = [(table.schema, table.name, table.table_type) for table in catalog.list_tables()]
+    if not rows:
+        return "Nessuna tabella trovata nello schema specificato."
+
+    # Limita a 50 tabelle per evitare risposte troppo lunghe
+    return format_results(("TABLE_SCHEMA", "TABLE_NAME", "TABLE_TYPE"), rows, max_rows=50)
+
+
+def describe_column_values(table_name: str, column_name: str, db_uri: Optional[str], schema_name: Optional[str]) -> str:
+    """
+    Return the precomputed values of a categorical column (see ``column_values``).
 
+    Served from memory only: when the dictionary has no entry for the column
+    the model is told why, and no query is run on the table.
+    """
+    catalog = get_schema_catalog(db_uri, schema_name)
+    tables = catalog.find_tables(table_name)
+    if not tables:
+        if not catalog.is_loaded:
+            return "ERRORE: Schema del database non ancora disponibile. Riprova tra poco."
+        return _table_not_found_message(catalog, table_name)
+
+    dictionary = get_value_dictionary(db_uri, schema_name)
+    sections = []
+    for table in tables:
+        column = next((c for c in table.columns if c.name.lower() == column_name.strip().lower()), None)
+        if column is None:
+            continue
+        label = f"{table.full_name}.{column.name}"
+        entry = dictionary.lookup(table.full_name, column.name)
+
+        if entry is None:
+            if not dictionary.is_loaded:
+                sections.append(
+                    f"Dizionario dei valori di {label} non ancora disponibile (in costruzione). "
+                    f"Usa sql_select con SELECT DISTINCT TOP 50 {column.name} FROM {table.full_name}."
+                )
+            else:
+                sections.append(
+                    f"{label} ({column.data_type}) non è una colonna categorica: il dizionario copre solo "
+                    f"colonne di testo fino a {settings.column_values_max_length} caratteri delle tabelle."
+                )
+            continue
 
-def create_sql_select_tool(agent_name: str, db_uri: Optional[str]) -> Any:
+        if entry.high_cardinality:
+            sections.append(
+                f"{label} ha più di {settings.column_values_max_distinct} valori distinti: non è una colonna "
+                f"categorica. Filtra con LIKE (es. WHERE {column.name} LIKE '%testo%')."
+            )
+            continue
+
+        coverage = f"campione di {entry.sampled_rows:,} righe"
+        if entry.total_rows and entry.total_rows > entry.sampled_rows:
+            coverage += f" su ~{entry.total_rows:,}: valori rari potrebbero mancare"
+        refreshed = dictionary.refreshed_at.strftime("%Y-%m-%d %H:%M") if dictionary.refreshed_at else "-"
+        lines = [
+            f"Valori di {label}: {len(entry.values)} distinti, conteggi approssimati "
+            f"({coverage}; aggiornato {refreshed})"
+        ]
+        for value, count in entry.values:
+            literal = "NULL" if value is None else "'" + value.replace("'", "''") + "'"
+            lines.append(f"{literal} ~{count:,}")
+        sections.append("\n".join(lines))
+
+    if not sections:
+        columns = ", ".join(c.name for c in tables[0].columns)
+        return f"COLONNA NON TROVATA: '{column_name}' in {tables[0].full_name}. Colonne disponibili: {columns}"
+    return "\n\n".join(sections)
+
+
+def describe_join_path(table_a: str, table_b: str, graph: JoinGraph) -> str:
+    """
+    Return the shortest join path between two tables as FROM/JOIN ... ON clauses.
+
+    Unqualified names may match tables in several schemas: every combination
+    is tried and the path with the fewest joins wins.
+    """
+    starts, goals = graph.resolve(table_a), graph.resolve(table_b)
+    missing = [name for name, found in ((table_a, starts), (table_b, goals)) if not found]
+    if missing:
+        return (
+            f"Nessuna relazione nota per: {', '.join(missing)} (nessuna foreign key o suggerimento di join). "
+            "Verifica i nomi con get_schema e cerca colonne con lo stesso significato (es. codici, ID)."
+        )
+
+    paths = [graph.find_path(start, goal) for start in starts for goal in goals]
+    paths = [path for path in paths if path is not None]
+    if not paths:
+        return (
+            f"Nessun percorso di join tra {table_a} e {table_b} entro {settings.join_path_max_hops} join. "
+            "Le tabelle non sono collegate da foreign key note."
+        )
+
+    best = min(paths, key=lambda path: len(path.edges))
+    sources = ", ".join(dict.fromkeys(edge.source for edge in best.edges))
+    return (
+        f"Percorso di join da {best.tables[0]} a {best.tables[-1]} ({len(best.edges)} join, chiavi da: {sources}):\n"
+        f"{format_join_path(best)}"
+    )
+
+
+def create_sql_select_tool(
+    agent_name: str,
+    db_uri: Optional[str],
+    max_cost: Optional[float] = None,
+    paging: bool = False,
+) -> Any:
     """
     Factory che crea un tool SQL SELECT personalizzato per uno specifico agente.
 
@@ -158,13 +883,17 @@ def create_sql_select_tool(agent_name: str, db_uri: Optional[str]) -> Any:
     Args:
         agent_name: Nome dell'agente (usato per naming del tool)
         db_uri: URI connessione database. Se None, usa il database di default
+        max_cost: Costo stimato massimo (piano SQL Server) oltre il quale la query
+                  viene rifiutata senza eseguirla. None o 0 = nessun controllo
+        paging: True se l'agente ha anche sql_next_page: le righe oltre la prima
+                pagina vengono conservate sotto un handle
 
     Returns:
         Tool function decorato con @tool di Datapizza, pronto per essere usato dall'Agent
     """
 
     @tool
-    def sql_select(query: str) -> str:
+    async def sql_select(query: str) -> str:
         """Esegui una query SQL SELECT di sola lettura sul database configurato per questo agente.
 
         Usa questo strumento per leggere i dati (mai per modificarli) e POI, nella risposta
@@ -181,13 +910,272 @@ def create_sql_select_tool(agent_name: str, db_uri: Optional[str]) -> Any:
             di errore se la query non è valida o non può essere eseguita.
         """
 
-        return execute_query(query, db_uri=db_uri)
+        record_query("sql_select", query)
+        return await execute_query_async(query, db_uri=db_uri, max_cost=max_cost, paging=paging)
 
     # Renaming dinamico del tool per facilitare il debug e il logging
     sql_select.__name__ = f"{agent_name}_sql_select"
     return sql_select
 
 
+def create_sql_next_page_tool(agent_name: str, db_uri: Optional[str]) -> Any:
+    """
+    Factory che crea il tool sql_next_page: pagine successive di un risultato di sql_select.
+
+    Le pagine sono lette da result_store (memoria o file temporaneo), senza
+    rieseguire la query sul database.
+
+    Args:
+        agent_name: Nome dell'agente (usato per naming del tool)
+        db_uri: URI connessione database. Se None, usa il database di default
+
+    Returns:
+        Tool function decorato con @tool di Datapizza, pronto per essere usato dall'Agent
+    """
+
+    @tool
+    def sql_next_page(handle: str, page: int = 2) -> str:
+        """Leggi le righe successive di un risultato di sql_select troppo lungo per una sola risposta.
+
+        Quando sql_select indica un handle (es. handle="a1b2c3d4"), usa questo strumento per
+        leggere le pagine seguenti invece di rieseguire la query con OFFSET: è immediato e
+        non carica il database.
+
+        Args:
+            handle: Handle indicato in fondo al risultato di sql_select.
+            page: Numero di pagina da leggere (la pagina 1 è il risultato di sql_select, si parte da 2).
+
+        Returns:
+            Le righe della pagina richiesta, oppure un errore se l'handle è scaduto
+            (in tal caso riesegui sql_select).
+        """
+
+        return read_result_page(handle, page, db_uri)
+
+    # Renaming dinamico del tool per facilitare il debug e il logging
+    sql_next_page.__name__ = f"{agent_name}_sql_next_page"
+    return sql_next_page
+
+
+async def execute_query_batch(
+    queries: List[str],
+    db_uri: Optional[str] = None,
+    max_cost: Optional[float] = None,
+) -> str:
+    """
+    Run several independent SELECTs concurrently and return all results in one text.
+
+    Each query is validated on its own: an invalid query gets its error in
+    place without blocking the others. Execution goes through
+    ``execute_query_async``, so cache, single-flight and the per-database
+    concurrency limit apply to every query of the batch.
+    """
+    queries = [q for q in queries if q and q.strip()]
+    if not queries:
+        return "ERRORE: Nessuna query fornita."
+
+    max_queries = settings.sql_batch_max_queries
+    if len(queries) > max_queries:
+        return (
+            f"ERRORE: Troppe query nel batch ({len(queries)}): il massimo è {max_queries}. "
+            "Dividi le query in più chiamate."
+        )
+
+    async def run_one(query: str) -> str:
+        is_valid, error_msg = validate_sql_query(query)
+        if not is_valid:
+            return f"ERRORE: {error_msg}"
+        record_query("sql_select_batch", query)
+        return await execute_query_async(query, db_uri=db_uri, max_cost=max_cost)
+
+    results = await asyncio.gather(*(run_one(q) for q in queries))
+
+    sections = [
+        f"### Query {position} di {len(queries)}\n{query.strip()}\n\n{result}"
+        for position, (query, result) in enumerate(zip(queries, results), 1)
+    ]
+    return "\n\n".join(sections)
+
+
+def create_sql_select_batch_tool(agent_name: str, db_uri: Optional[str], max_cost: Optional[float] = None) -> Any:
+    """
+    Factory che crea il tool sql_select_batch: più SELECT indipendenti in una sola chiamata.
+
+    Le analisi spesso richiedono 3-5 aggregati indipendenti (anno corrente vs
+    precedente, per agente, per famiglia): con sql_select servirebbe un giro
+    LLM per ognuno, con il batch le query girano in parallelo e i risultati
+    tornano al modello in un'unica risposta.
+
+    Args:
+        agent_name: Nome dell'agente (usato per naming del tool)
+        db_uri: URI connessione database. Se None, usa il database di default
+        max_cost: Costo stimato massimo per ogni query (vedi create_sql_select_tool)
+
+    Returns:
+        Tool function decorato con @tool di Datapizza, pronto per essere usato dall'Agent
+    """
+
+    @tool
+    async def sql_select_batch(queries: list[str]) -> str:
+        """Esegui in parallelo più query SQL SELECT indipendenti e ricevi tutti i risultati insieme.
+
+        Usa questo strumento quando ti servono più dati che NON dipendono l'uno dall'altro
+        (es. fatturato anno corrente e anno precedente, totali per agente e per famiglia):
+        è molto più veloce di chiamare sql_select più volte. Se una query dipende dal
+        risultato di un'altra, usa sql_select in sequenza.
+
+        Args:
+            queries: Lista di istruzioni SQL, ognuna DEVE iniziare con SELECT (o WITH).
+                     Stesse regole di sql_select: solo lettura, nessun comando di modifica.
+
+        Returns:
+            I risultati di ogni query nell'ordine ricevuto, ciascuno preceduto da
+            "### Query N". Una query non valida riporta il proprio errore senza
+            bloccare le altre.
+        """
+
+        return await execute_query_batch(queries, db_uri=db_uri, max_cost=max_cost)
+
+    # Renaming dinamico del tool per facilitare il debug e il logging
+    sql_select_batch.__name__ = f"{agent_name}_sql_select_batch"
+    return sql_select_batch
+
+
+def create_sql_describe_tool(agent_name: str, db_uri: Optional[str], max_cost: Optional[float] = None) -> Any:
+    """
+    Factory che crea il tool sql_describe: riepilogo statistico calcolato lato server.
+
+    Per domande di andamento/distribuzione il modello riceve un riepilogo denso
+    (somme, medie, percentili, valori più frequenti, andamento mensile) calcolato
+    su tutte le righe della query, invece di 100 righe grezze da sommare a mano.
+
+    Args:
+        agent_name: Nome dell'agente (usato per naming del tool)
+        db_uri: URI connessione database. Se None, usa il database di default
+        max_cost: Costo stimato massimo della query (vedi create_sql_select_tool)
+
+    Returns:
+        Tool function decorato con @tool di Datapizza, pronto per essere usato dall'Agent
+    """
+
+    @tool
+    async def sql_describe(query: str) -> str:
+        """Esegui una query SQL SELECT e ricevi un riepilogo statistico di TUTTE le righe risultanti.
+
+        Usa questo strumento per domande su andamenti, distribuzioni e totali quando il
+        risultato ha molte righe (es. movimenti di dettaglio di un anno): invece delle
+        righe grezze ricevi per ogni colonna numerica conteggio, somma, media, minimo,
+        percentili (p25, mediana, p75, p95) e massimo; per le colonne testuali i valori
+        più frequenti; se c'è una colonna data, l'andamento mese per mese con la
+        variazione percentuale rispetto al mese precedente.
+
+        Args:
+            query: Istruzione SQL che DEVE iniziare con SELECT (o WITH). Seleziona solo le
+                   colonne utili all'analisi (es. data, importo, cliente), senza TOP.
+
+        Returns:
+            Un riepilogo testuale compatto oppure un messaggio di errore se la query
+            non è valida o non può essere eseguita.
+        """
+
+        record_query("sql_describe", query)
+        return await describe_query_async(query, db_uri=db_uri, max_cost=max_cost)
+
+    # Renaming dinamico del tool per facilitare il debug e il logging
+    sql_describe.__name__ = f"{agent_name}_sql_describe"
+    return sql_describe
+
+
+def create_get_column_values_tool(agent_name: str, db_uri: Optional[str], schema_name: Optional[str] = None) -> Any:
+    """
+    Factory che crea il tool get_column_values: valori ammessi di una colonna categorica.
+
+    Risponde dal dizionario precalcolato in background (vedi column_values),
+    senza interrogare le tabelle durante la conversazione.
+
+    Args:
+        agent_name: Nome dell'agente (usato per naming del tool)
+        db_uri: URI connessione database. Se None, usa il database di default
+        schema_name: Schema SQL dell'agente (None = tutti gli schemi utente)
+
+    Returns:
+        Tool function decorato con @tool di Datapizza, pronto per essere usato dall'Agent
+    """
+
+    # Registra catalogo e dizionario: verranno costruiti dai refresh in background
+    get_schema_catalog(db_uri, schema_name)
+    get_value_dictionary(db_uri, schema_name)
+
+    @tool
+    def get_column_values(table: str, column: str) -> str:
+        """Elenca i valori presenti in una colonna categorica (famiglia, stato, categoria, zona...).
+
+        Usa questo strumento PRIMA di filtrare su una colonna di testo, invece di scrivere
+        query di prova come SELECT DISTINCT: la risposta è immediata e riporta i valori
+        esatti da usare nella WHERE, con un conteggio approssimato delle righe.
+
+        Args:
+            table: Nome della tabella ("Tabella" o "schema.Tabella").
+            column: Nome della colonna.
+
+        Returns:
+            I valori come letterali SQL pronti per la WHERE (dal più frequente), oppure
+            l'indicazione che la colonna ha troppi valori distinti (usa LIKE).
+        """
+
+        return describe_column_values(table, column, db_uri, schema_name)
+
+    # Renaming dinamico del tool per facilitare il debug e il logging
+    get_column_values.__name__ = f"{agent_name}_get_column_values"
+    return get_column_values
+
+
+def create_get_join_path_tool(agent_name: str, db_uri: Optional[str]) -> Any:
+    """
+    Factory che crea il tool get_join_path: percorso di join tra due tabelle.
+
+    Il grafo delle relazioni (foreign key + suggerimenti da file) è costruito
+    una volta per refresh dello schema (vedi join_graph).
+
+    Args:
+        agent_name: Nome dell'agente (usato per naming del tool)
+        db_uri: URI connessione database. Se None, usa il database di default
+
+    Returns:
+        Tool function decorato con @tool di Datapizza, pronto per essere usato dall'Agent
+    """
+
+    graph = get_join_graph(db_uri)
+
+    @tool
+    async def get_join_path(table_a: str, table_b: str) -> str:
+        """Trova come collegare due tabelle con JOIN: restituisce le clausole JOIN ... ON pronte.
+
+        Usa questo strumento PRIMA di scrivere una query che unisce tabelle diverse (es. testata
+        ordini, righe ordini e anagrafica prodotti), invece di indovinare le chiavi di join. Il
+        percorso usa le foreign key del database e passa per le tabelle intermedie necessarie.
+
+        Args:
+            table_a: Prima tabella ("Tabella" o "schema.Tabella").
+            table_b: Seconda tabella ("Tabella" o "schema.Tabella").
+
+        Returns:
+            Le clausole FROM/JOIN con alias t1, t2, ... e condizioni ON, oppure l'indicazione
+            che non esiste una relazione nota tra le due tabelle.
+        """
+
+        if not graph.is_loaded:
+            try:
+                await tool_executor.run(db_uri, graph.refresh, False)
+            except Exception as e:
+                return f"ERRORE durante il caricamento delle relazioni tra tabelle: {str(e)}"
+        return describe_join_path(table_a, table_b, graph)
+
+    # Renaming dinamico del tool per facilitare il debug e il logging
+    get_join_path.__name__ = f"{agent_name}_get_join_path"
+    return get_join_path
+
+
 def create_get_schema_tool(agent_name: str, db_uri: Optional[str], schema_name: Optional[str] = None) -> Any:
     """
     Factory che crea un tool per esplorare lo schema del database.
@@ -211,8 +1199,11 @@ def create_get_schema_tool(agent_name: str, db_uri: Optional[str], schema_name:
         # Restituisce: struttura della tabella Clienti con nomi colonne e tipi
     """
 
+    # Registra il catalogo: verrà caricato dal refresh in background
+    get_schema_catalog(db_uri, schema_name)
+
     @tool
-    def get_schema(table_name: str = "") -> str:
+    async def get_schema(table_name: str = "") -> str:
         """Ottieni informazioni sullo schema del database (tabelle, colonne, tipi di dati).
 
         Questo strumento è fondamentale per capire quali dati sono disponibili prima
@@ -234,110 +1225,10 @@ def create_get_schema_tool(agent_name: str, db_uri: Optional[str], schema_name:
             get_schema("Clienti")  # Mostra struttura tabella Clienti
         """
 
-        # Query per ottenere informazioni sullo schema da INFORMATION_SCHEMA
-        # (standard SQL supportato da SQL Server)
-        if table_name.strip():
-            # Caso 1: Dettagli di una tabella specifica
-            # Gestisce sia "tabella" che "schema.tabella"
-            table_name_clean = table_name.strip()
-            search_schema = schema_name
-            search_table = table_name_clean
-            
-            # Se il nome contiene un punto, separa schema e tabella
-            if "." in table_name_clean:
-                parts = table_name_clean.split(".", 1)
-                search_schema = parts[0]
-                search_table = parts[1]
-            
-            query = """
-            SELECT
-                COLUMN_NAME as Colonna,
-                DATA_TYPE as Tipo,
-                IS_NULLABLE as Nullable
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = :table_name
-            """
-
-            # Filtra per schema se specificato (da parametro o estratto dal nome)
-            if search_schema:
-                query += " AND TABLE_SCHEMA = :schema_name"
-
-            query += " ORDER BY ORDINAL_POSITION"
-
-            # Esegui query parametrizzata (protezione SQL injection)
-            engine = _get_engine(db_uri)
-            Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-            db = Session()
-
-            try:
-                params = {"table_name": search_table}
-                if search_schema:
-                    params["schema_name"] = search_schema
-
-                result = db.execute(
-                    text(query),
-                    params,
-                    execution_options={"timeout": settings.query_timeout_seconds}
-                )
-                rows = result.fetchall()
-
-                if not rows:
-                    return f"TABELLA NON TROVATA: '{table_name}'. Usa get_schema() senza parametri per vedere tutte le tabelle."
-
-                results: List[Dict[str, Any]] = [dict(row._mapping) for row in rows]
-                return format_results(results, max_rows=100)
-
-            except Exception as e:
-                return f"ERRORE durante il recupero dello schema: {str(e)}"
-            finally:
-                db.close()
-
-        else:
-            # Caso 2: Lista di tutte le tabelle disponibili
-            # Se schema_name è configurato, mostra SOLO quello schema
-            # Altrimenti limita a 30 risultati per evitare risposte enormi
-            query = """
-            SELECT DISTINCT
-                TABLE_SCHEMA,
-                TABLE_NAME,
-                TABLE_TYPE
-            FROM INFORMATION_SCHEMA.TABLES
-            WHERE (TABLE_TYPE = 'BASE TABLE' OR TABLE_TYPE = 'VIEW')
-            """
-
-            # Filtra per schema se specificato
-            if schema_name:
-                query += " AND TABLE_SCHEMA = :schema_name"
-            else:
-                # Senza schema configurato, escludi schemi di sistema
-                query += " AND TABLE_SCHEMA NOT IN ('sys', 'INFORMATION_SCHEMA', 'guest', 'chat_ai')"
-
-            query += " ORDER BY TABLE_SCHEMA, TABLE_NAME"
-
-            engine = _get_engine(db_uri)
-            Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-            db = Session()
-
-            try:
-                params = {"schema_name": schema_name} if schema_name else {}
-                result = db.execute(
-                    text(query),
-                    params,
-                    execution_options={"timeout": settings.query_timeout_seconds}
-                )
-                rows = result.fetchall()
-                results: List[Dict[str, Any]] = [dict(row._mapping) for row in rows]
-
-                if not results:
-                    return "Nessuna tabella trovata nello schema specificato."
-
-                # Limita a 50 tabelle per evitare risposte troppo lunghe
-                return format_results(results, max_rows=50)
-
-            except Exception as e:
-                return f"ERRORE durante il recupero della lista tabelle: {str(e)}"
-            finally:
-                db.close()
+        # Catalogo già in memoria: risposta immediata senza passare dal thread pool
+        if get_schema_catalog(db_uri, schema_name).is_loaded:
+            return describe_schema(table_name, db_uri, schema_name)
+        return await tool_executor.run(db_uri, describe_schema, table_name, db_uri, schema_name)
 
     # Renaming dinamico per debug
     get_schema.__name__ = f"{agent_name}_get_schema"
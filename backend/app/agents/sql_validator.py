@@ -0,0 +1,132 @@
+"""
+Validazione delle query SQL generate dagli agenti (solo lettura).
+
+Il validatore è un tokenizer a passata singola con una regex precompilata
+(_TOKEN_RE, la stessa usata da query_guard per la forma delle query):
+riconosce stringhe ('...' e N'...'), commenti (-- e /* */), identificatori
+quotati ([...] e "...") e separatori di istruzione (;). Le parole chiave
+vietate vengono cercate solo tra i token parola, quindi:
+- CREATED_AT, UPDATED, CodiceSP_Filiale non vengono più scambiati per DDL/DML
+- REPLACE() è una normale funzione stringa
+- 'DELETE' dentro un letterale o un commento non blocca la query
+
+Regole:
+1. La prima parola deve essere SELECT o WITH (ammesse parentesi iniziali:
+   "(SELECT ...) UNION (SELECT ...)")
+2. Una sola istruzione (ammessi solo ; finali)
+3. Nessuna parola chiave di modifica/amministrazione fuori da stringhe e commenti
+4. Nessuna stringa, commento o identificatore quotato non terminato
+
+Le parole chiave vietate sono ammesse solo in posizione di identificatore,
+cioè subito dopo "." o AS (t.[Set] scritto t.Set, alias AS Into): lì non
+possono iniziare un'istruzione, e se non sono valide SQL Server rifiuta
+l'intero batch in compilazione. Altrove vengono rifiutate anche come nomi di
+colonna (SELECT Set FROM t): in T-SQL una nuova istruzione può iniziare senza
+";" ("SELECT 1 DROP TABLE x" sono due istruzioni) e SQL Server richiede
+comunque le parentesi quadre per le parole riservate ([Set], [Use], [Into]).
+"""
+import re
+from typing import Iterator, Tuple
+
+# Ordine delle alternative importante: stringhe prima delle parole (N'...').
+# Come in SQL Server le cifre non possono iniziare una parola ma non la
+# interrompono: "1EXEC(...)" produce il numero 1 e la parola EXEC.
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>N?'(?:[^']|'')*')
+    |(?P<quoted>\[(?:[^\]]|\]\])*\]|"(?:[^"]|"")*")
+    |(?P<word>[A-Za-z_@#][A-Za-z0-9_@#$]*)
+    |(?P<number>0[xX][0-9A-Fa-f]*|\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+    |(?P<semicolon>;)
+    |(?P<unterminated>'|/\*|\[|")
+    |(?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Parole chiave che modificano dati/schema o eseguono codice lato server
+FORBIDDEN_KEYWORDS = frozenset({
+    "DROP", "DELETE", "INSERT", "UPDATE", "ALTER", "CREATE", "TRUNCATE",
+    "MERGE", "EXEC", "EXECUTE", "INTO", "GRANT", "REVOKE", "DENY",
+    "OPENROWSET", "OPENDATASOURCE", "OPENQUERY", "BULK", "BACKUP", "RESTORE",
+    "DBCC", "KILL", "SHUTDOWN", "RECONFIGURE", "WAITFOR", "USE", "DECLARE", "SET",
+})
+
+# Stored procedure di sistema / estese: vietate come token intero, non come sottostringa
+FORBIDDEN_PREFIXES = ("SP_", "XP_")
+
+# Token che non contano per la validazione (commenti, spazi)
+_SKIPPED_KINDS = frozenset({"ws", "comment"})
+
+# Token dopo i quali una parola è un identificatore (t.Set, AS Into).
+# Vale solo per il token immediatamente successivo: letterali e identificatori
+# quotati aggiornano il token precedente come le parole ("AS [x] DROP ..." è rifiutata)
+_IDENTIFIER_CONTEXT = frozenset({".", "AS"})
+
+_FIRST_KEYWORDS = frozenset({"SELECT", "WITH"})
+
+
+def tokenize(query: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (kind, text) tokens of a T-SQL query, comments and whitespace included.
+
+    Kinds: ws, comment, string, quoted, word, number, semicolon, unterminated, other.
+    """
+    for match in _TOKEN_RE.finditer(query):
+        yield match.lastgroup, match.group()
+
+
+def validate_sql_query(query: str) -> Tuple[bool, str]:
+    """
+    Validate SQL query to ensure it's safe.
+    Only a single top-level SELECT (or WITH ... SELECT) statement is allowed.
+
+    Args:
+        query: SQL query string to validate
+
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if not query.strip():
+        return False, "La query è vuota."
+
+    # Una sola passata sui token significativi (spazi e commenti esclusi)
+    first = None  # Prima parola dopo eventuali parentesi aperte
+    previous = ""
+    unterminated = after_semicolon = text_after_semicolon = False
+    forbidden = None
+    for match in _TOKEN_RE.finditer(query.upper()):
+        kind = match.lastgroup
+        if kind in _SKIPPED_KINDS:
+            continue
+        value = match.group()
+        if first is None and value != "(":
+            first = value
+        if kind == "unterminated":
+            unterminated = True
+        elif kind == "semicolon":
+            after_semicolon = True
+        elif after_semicolon:
+            text_after_semicolon = True
+        elif kind == "word" and forbidden is None:
+            if value.startswith(FORBIDDEN_PREFIXES):
+                forbidden = value[:3]
+            elif value in FORBIDDEN_KEYWORDS and previous not in _IDENTIFIER_CONTEXT:
+                forbidden = value
+        previous = value
+
+    if first not in _FIRST_KEYWORDS:
+        return False, "La query deve iniziare con SELECT o WITH."
+
+    if unterminated:
+        return False, "Query non valida: stringa, commento o identificatore non terminato."
+
+    if text_after_semicolon:
+        return False, "È consentita una sola istruzione SQL per query (trovato testo dopo ';')."
+
+    if forbidden is not None:
+        return False, f"Keyword '{forbidden}' non è permessa. Solo query di lettura (SELECT) sono consentite."
+
+    return True, ""
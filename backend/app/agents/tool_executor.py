@@ -0,0 +1,381 @@
+"""
+Esecuzione dei tool SQL fuori dall'event loop.
+
+I tool sql_select/get_schema usano pyodbc, che è sincrono: eseguiti dentro
+agent.a_run() bloccherebbero tutti gli stream SSE del worker uvicorn.
+Questo modulo fornisce:
+- Un thread pool dedicato e dimensionato (SQL_TOOL_WORKERS)
+- Un limite di concorrenza per ogni db_uri, così un database ERP lento
+  non occupa tutti i thread a scapito degli altri
+- Metriche per database: tempo di attesa in coda e tempo di esecuzione
+- Single-flight: chiamate identiche concorrenti condividono una sola esecuzione
+- DatabaseSlots: limite per database per lavoro fuori dal pool (export)
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from app.config import get_settings
+from app.database.database import mask_db_uri
+
+settings = get_settings()
+
+
+class DatabaseGate:
+    """
+    Semaforo FIFO per un singolo database, utilizzabile da event loop diversi.
+
+    Un asyncio.Semaphore è legato al loop che lo usa per primo, mentre i task
+    schedulati girano con asyncio.run() in thread separati: qui lo stato è
+    protetto da un lock e ogni waiter viene risvegliato sul proprio loop.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    # Il release ha già passato lo slot a questo waiter
+                    granted = True
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    # Lo slot passa direttamente al waiter: active non cambia
+                    loop.call_soon_threadsafe(_resolve_waiter, future)
+                    return
+                except RuntimeError:
+                    continue  # Loop già chiuso, prova il prossimo waiter
+            self.active -= 1
+
+
+def _resolve_waiter(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class DatabaseSlots:
+    """
+    Limite di concorrenza per database per lavoro che gira fuori dal thread pool.
+
+    Usato dall'export completo delle query: le righe vengono lette al ritmo
+    del download del client, quindi uno slot può restare occupato per minuti.
+    Il limite è separato da quello dei tool SQL, così gli export lenti non
+    bloccano sql_select e get_schema sullo stesso database.
+
+    Example:
+        >>> release = await export_slots.acquire(db_uri)
+        >>> try: ... finally: release()
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._gates: Dict[str, DatabaseGate] = {}
+        self._lock = threading.Lock()
+
+    async def acquire(self, db_uri: Optional[str]) -> Callable[[], None]:
+        """
+        Wait for a slot of the db_uri limit.
+
+        Returns:
+            Function that releases the slot (calling it more than once is harmless)
+        """
+        key = db_uri or ""
+        with self._lock:
+            if key not in self._gates:
+                self._gates[key] = DatabaseGate(self.limit)
+            gate = self._gates[key]
+        await gate.acquire()
+        released = threading.Event()
+
+        def release() -> None:
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+            gate.release()
+
+        return release
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrent_per_db": self.limit,
+                "databases": {
+                    mask_db_uri(key or None): {"active": gate.active, "queued": gate.queued}
+                    for key, gate in self._gates.items()
+                },
+            }
+
+
+class _DatabaseStats:
+    """Contatori di esecuzione per un singolo database."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.exec_ms_total = 0.0
+        self.exec_ms_max = 0.0
+
+    def to_dict(self, gate: DatabaseGate) -> Dict[str, Any]:
+        completed = self.calls - self.in_flight
+        return {
+            "limit": gate.limit,
+            "active": gate.active,
+            "queued": gate.queued,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "wait_ms_avg": round(self.wait_ms_total / self.calls, 2) if self.calls else 0.0,
+            "wait_ms_max": round(self.wait_ms_max, 2),
+            "exec_ms_avg": round(self.exec_ms_total / completed, 2) if completed else 0.0,
+            "exec_ms_max": round(self.exec_ms_max, 2),
+        }
+
+
+class SqlToolExecutor:
+    """
+    Esegue funzioni bloccanti dei tool SQL in un thread pool dedicato.
+
+    Ogni chiamata attende prima uno slot del database (DatabaseGate), poi un
+    thread libero del pool. Il tempo fino all'avvio effettivo è il "wait",
+    la durata della funzione è l'"exec".
+
+    Example:
+        >>> result = await tool_executor.run(db_uri, execute_query, "SELECT 1", db_uri=db_uri)
+    """
+
+    def __init__(self, max_workers: int, max_concurrent_per_db: int):
+        self.max_workers = max_workers
+        self.max_concurrent_per_db = max_concurrent_per_db
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sql-tool")
+        self._gates: Dict[str, DatabaseGate] = {}
+        self._stats: Dict[str, _DatabaseStats] = {}
+        self._lock = threading.Lock()
+
+    def _get_gate(self, db_uri: Optional[str]) -> Tuple[DatabaseGate, _DatabaseStats]:
+        key = db_uri or ""
+        with self._lock:
+            if key not in self._gates:
+                self._gates[key] = DatabaseGate(self.max_concurrent_per_db)
+                self._stats[key] = _DatabaseStats()
+            return self._gates[key], self._stats[key]
+
+    async def run(self, db_uri: Optional[str], func: Callable[..., Any], /, *args, **kwargs) -> Any:
+        """
+        Run ``func(*args, **kwargs)`` in the pool under the db_uri limit.
+
+        Args:
+            db_uri: Database targeted by the call (None = database di default)
+            func: Blocking function to execute
+
+        Returns:
+            Whatever ``func`` returns
+        """
+        gate, stats = self._get_gate(db_uri)
+        queued_at = time.perf_counter()
+
+        await gate.acquire()
+        try:
+            with self._lock:
+                stats.calls += 1
+                stats.in_flight += 1
+
+            def _timed_call():
+                started_at = time.perf_counter()
+                wait_ms = (started_at - queued_at) * 1000
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    with self._lock:
+                        stats.errors += 1
+                    raise
+                finally:
+                    exec_ms = (time.perf_counter() - started_at) * 1000
+                    with self._lock:
+                        stats.in_flight -= 1
+                        stats.wait_ms_total += wait_ms
+                        stats.wait_ms_max = max(stats.wait_ms_max, wait_ms)
+                        stats.exec_ms_total += exec_ms
+                        stats.exec_ms_max = max(stats.exec_ms_max, exec_ms)
+
+            future = self._pool.submit(_timed_call)
+            # Lo slot si libera quando il thread termina davvero, anche se il
+            # chiamante viene cancellato (es. client SSE disconnesso)
+            future.add_done_callback(lambda _: gate.release())
+        except BaseException:
+            gate.release()
+            raise
+
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and per-database queue/execution metrics."""
+        with self._lock:
+            databases = {
+                mask_db_uri(key or None): self._stats[key].to_dict(gate)
+                for key, gate in self._gates.items()
+            }
+        return {
+            "workers": self.max_workers,
+            "max_concurrent_per_db": self.max_concurrent_per_db,
+            "databases": databases,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+tool_executor = SqlToolExecutor(
+    max_workers=settings.sql_tool_workers,
+    max_concurrent_per_db=settings.sql_max_concurrent_queries_per_db,
+)
+
+
+class _Flight:
+    """Una chiamata in corso: risultato condiviso e numero di chiamanti in attesa."""
+
+    def __init__(self, on_abandon: Optional[Callable[[], None]]):
+        self.future: Future = Future()
+        self.waiters = 0
+        self.on_abandon = on_abandon
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """
+    Deduplica le chiamate identiche in corso (pattern "single-flight").
+
+    Il primo chiamante per una chiave avvia il lavoro; chi arriva con la
+    stessa chiave mentre è ancora in corso attende lo stesso risultato invece
+    di aprire un nuovo cursore. Terminato il lavoro la chiave viene liberata:
+    non è una cache (per quella vedi QueryResultCache).
+
+    Il risultato passa per un concurrent.futures.Future, quindi anche i task
+    schedulati (asyncio.run in altri thread) possono unirsi a una query
+    avviata dall'event loop principale e viceversa.
+
+    Quando tutti i chiamanti vengono cancellati (es. client SSE disconnessi)
+    il lavoro viene abbandonato: il task viene cancellato e ``on_abandon``
+    (es. cancel dello statement sul database) viene invocato.
+
+    Example:
+        >>> await single_flight.run(key, lambda: tool_executor.run(db_uri, execute_query, sql))
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.joined = 0
+        self.abandoned = 0
+
+    async def run(
+        self,
+        key: Hashable,
+        start: Callable[[], Awaitable[Any]],
+        on_abandon: Optional[Callable[[], None]] = None,
+    ) -> Any:
+        """
+        Await the in-flight call for ``key``, or start it with ``start()``.
+
+        The work runs in its own task: cancelling one caller does not cancel
+        the result awaited by the others. When the last caller is cancelled
+        the task is cancelled and ``on_abandon`` (given by the caller that
+        started the work) is called.
+        """
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight(on_abandon)
+                self.started += 1
+            else:
+                self.joined += 1
+            flight.waiters += 1
+
+        if leader:
+            flight.task = asyncio.ensure_future(start())
+            flight.task.add_done_callback(lambda done: self._finish(key, flight, done))
+
+        try:
+            return await asyncio.shield(asyncio.wrap_future(flight.future))
+        except asyncio.CancelledError:
+            self._leave(key, flight)
+            raise
+
+    def _leave(self, key: Hashable, flight: _Flight) -> None:
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters > 0 or flight.future.done():
+                return
+            # Nessuno attende più il risultato: nuovi chiamanti ripartono da zero
+            if self._calls.get(key) is flight:
+                del self._calls[key]
+            self.abandoned += 1
+
+        task = flight.task
+        if task is not None and not task.done():
+            try:
+                task.get_loop().call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # Loop già chiuso: il task non è più in esecuzione
+        if flight.on_abandon is not None:
+            flight.on_abandon()
+
+    def _finish(self, key: Hashable, flight: _Flight, task: "asyncio.Task") -> None:
+        with self._lock:
+            if self._calls.get(key) is flight:
+                del self._calls[key]
+        future = flight.future
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "started": self.started,
+                "joined": self.joined,
+                "abandoned": self.abandoned,
+            }
+
+
+single_flight = SingleFlight()
@@ -4,19 +4,29 @@ Includes SSE streaming endpoint and conversation management.
 """
 import json
 import httpx
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
 from datetime import datetime
 from datapizza.core.clients import ClientResponse
 from app.database.database import get_db
-from app.database.models import Conversation, Message
+from app.database.models import AgentConfig, Conversation, ExecutedQuery, Message
 from app.auth.middleware import get_current_user
+from app.agents.admission import AdmissionTimeoutError, admission_controller
 from app.agents.manager import get_agent_manager
+from app.agents.query_export import (
+    ExportError,
+    ExportUnavailableError,
+    export_query,
+    export_slots,
+    start_recording,
+)
 from app.config import get_settings
-from app.llm.factory import LLMConfigurationError, build_llm_client
+from app.llm.client_pool import llm_client_pool
+from app.llm.factory import LLMConfigurationError, resolve_provider
 
 # Configurazione memoria conversazionale
 SLIDING_WINDOW_SIZE = 2  # Ultimi N messaggi da mantenere completi (2 = ultimo scambio)
@@ -106,6 +116,14 @@ class MessageResponse(BaseModel):
     timestamp: datetime
 
 
+class ExecutedQueryResponse(BaseModel):
+    """Executed query response model."""
+    id: int
+    tool_name: str
+    query_text: str
+    executed_at: datetime
+
+
 class FAQItem(BaseModel):
     """FAQ item model."""
     question: str
@@ -113,16 +131,24 @@ class FAQItem(BaseModel):
 
 
 @router.get("/agents", response_model=List[AgentInfo])
-def list_agents() -> List[AgentInfo]:
+def list_agents(request: Request, response: Response):
     """
     Get list of available agents.
     
     Returns list of agents with their names and descriptions.
     No authentication required for this endpoint.
+
+    The listing comes from the agent registry and carries an ETag: a request
+    with a matching If-None-Match gets 304 Not Modified with no body.
     """
     agent_manager = get_agent_manager()
-    agents_dict = agent_manager.list_agents()
-    
+    etag, agents_dict = agent_manager.agent_listing()
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
     return [
         AgentInfo(name=name, description=desc)
         for name, desc in agents_dict.items()
@@ -280,13 +306,26 @@ DOMANDA ATTUALE:
             
             # Esegui agent
             print(f"[chat_stream] Executing agent...")
+            # Le query SQL eseguite dai tool vengono raccolte per l'export completo
+            recorded_queries = start_recording()
+            # Ammissione: limiti per agente / provider / utente, coda equa tra utenti
+            ticket = admission_controller.request(
+                user_id, request.agent_name, resolve_provider(get_settings(), "agent")
+            )
             try:
+                async for position in ticket.queue_positions():
+                    yield f'data: {{"type": "queue", "position": {position}}}\n\n'
                 result = await agent.a_run(augmented_message)
+            except AdmissionTimeoutError:
+                raise
             except Exception as e:
                 print(f"[chat_stream] ERROR during agent execution: {e}")
                 import traceback
                 traceback.print_exc()
                 raise
+            finally:
+                # Libera lo slot anche se il client si disconnette durante l'attesa o l'esecuzione
+                ticket.release()
 
             # Extract full response text
             if hasattr(result, "text") and result.text:
@@ -344,6 +383,14 @@ DOMANDA ATTUALE:
                 content=full_response
             )
             db.add(assistant_message)
+
+            for recorded in recorded_queries:
+                db.add(ExecutedQuery(
+                    conversation_id=conversation.id,
+                    agent_name=conversation.agent_name,
+                    tool_name=recorded.tool_name,
+                    query_text=recorded.query,
+                ))
             
             # Update conversation timestamp
             conversation.updated_at = datetime.utcnow()
@@ -414,6 +461,98 @@ def get_conversation_messages(
     return messages
 
 
+@router.get("/conversations/{conversation_id}/queries", response_model=List[ExecutedQueryResponse])
+def get_conversation_queries(
+    conversation_id: int,
+    user_id: int = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> List[ExecutedQueryResponse]:
+    """
+    Get the SQL queries run by the agent tools in a conversation.
+
+    Each query can be downloaded in full with /queries/{id}/export.
+    """
+    conversation = db.query(Conversation).filter(
+        Conversation.id == conversation_id,
+        Conversation.user_id == user_id
+    ).first()
+
+    if not conversation:
+        raise HTTPException(
+            status_code=404,
+            detail="Conversazione non trovata."
+        )
+
+    return db.query(ExecutedQuery).filter(
+        ExecutedQuery.conversation_id == conversation_id
+    ).order_by(ExecutedQuery.executed_at.asc(), ExecutedQuery.id.asc()).all()
+
+
+@router.get("/queries/{query_id}/export")
+async def export_executed_query(
+    query_id: int,
+    format: str = "csv",
+    user_id: int = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Re-run a query recorded in one of the user's conversations and stream the full result.
+
+    Rows are read with a server-side cursor in chunks of EXPORT_CHUNK_ROWS and
+    written to the response as they arrive, so memory use does not depend on
+    the number of rows. Supported formats: csv, parquet (requires pyarrow).
+
+    The export is subject to the agent's estimated cost threshold and holds
+    one export slot of the database (EXPORT_MAX_CONCURRENT_PER_DB) until the
+    download ends.
+    """
+    executed = (
+        db.query(ExecutedQuery)
+        .join(Conversation, ExecutedQuery.conversation_id == Conversation.id)
+        .filter(ExecutedQuery.id == query_id, Conversation.user_id == user_id)
+        .first()
+    )
+    if not executed:
+        raise HTTPException(status_code=404, detail="Query non trovata.")
+
+    agent = db.query(AgentConfig).filter(AgentConfig.name == executed.agent_name).first()
+    if not agent:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Agente '{executed.agent_name}' non più configurato: impossibile rieseguire la query."
+        )
+
+    export_format = format.lower()
+    settings = get_settings()
+    max_cost = agent.max_query_cost if agent.max_query_cost is not None else settings.query_cost_limit
+
+    # Lo slot del database si libera alla chiusura dello stream (fine download o client disconnesso)
+    release_slot = await export_slots.acquire(agent.db_uri)
+    chunks = None
+    try:
+        chunks = await run_in_threadpool(
+            export_query, executed.query_text, agent.db_uri, export_format, max_cost, release_slot
+        )
+    except ExportUnavailableError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    except ExportError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:
+        print(f"[export] Errore esecuzione query {query_id}: {exc}")
+        raise HTTPException(status_code=500, detail=f"Errore durante l'esecuzione della query: {exc}")
+    finally:
+        if chunks is None:
+            release_slot()
+
+    print(f"[export] Query {query_id} ({export_format}) avviata per utente {user_id}")
+    media_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/vnd.apache.parquet"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="query_{query_id}.{export_format}"'}
+    )
+
+
 @router.get("/faq_suggestions", response_model=List[FAQItem])
 def get_faq_suggestions(
     agent_name: str,
@@ -452,7 +591,7 @@ def get_faq_suggestions(
 
     settings = get_settings()
     try:
-        client = build_llm_client(settings, use_case="faq")
+        client = llm_client_pool.get(settings, use_case="faq")
     except LLMConfigurationError as exc:
         raise HTTPException(
             status_code=500,
@@ -66,6 +66,10 @@ class Settings(BaseSettings):
     # Modello leggero per riassunti e FAQ (opzionale, se diverso dal principale)
     local_llm_light_model: str | None = None  # Es: "qwen2-0.5b-instruct"
 
+    # Client LLM condivisi (un client per provider/modello/temperatura/tracing):
+    # le connessioni HTTP inattive restano aperte per N secondi (0 = default SDK, 5s)
+    llm_keepalive_seconds: int = 60
+
     # ========================================
     # DEBUGGING & OBSERVABILITY
     # ========================================
@@ -85,12 +89,140 @@ class Settings(BaseSettings):
     backend_url: str = "http://localhost:8000"
     frontend_url: str = "http://localhost:8501"
 
+    # ========================================
+    # SINCRONIZZAZIONE AGENTI (più worker)
+    # ========================================
+    # Ogni worker controlla la versione di chat_ai.agents (COUNT + MAX(row_version))
+    # ogni N secondi e ricarica gli agenti modificati da un altro worker (0 = mai)
+    agent_config_poll_seconds: int = 10
+
+    # ========================================
+    # AMMISSIONE RICHIESTE CHAT (agent.a_run)
+    # ========================================
+    # Esecuzioni contemporanee degli agenti (0 = nessun limite); le richieste
+    # oltre i limiti attendono in coda, servite a turno tra gli utenti
+    admission_max_per_agent: int = 6  # Per singolo agente
+    admission_max_per_provider: int = 12  # Per provider LLM (tutti gli agenti)
+    admission_max_per_user: int = 2  # Per utente
+    admission_queue_timeout_seconds: int = 180  # Attesa massima in coda (0 = illimitata)
+
     # ========================================
     # SQL QUERY LIMITS
     # ========================================
     max_query_results: int = 100  # Numero massimo righe restituite da query SQL
     query_timeout_seconds: int = 30  # Timeout query SQL
 
+    # ========================================
+    # QUERY COST GUARD (solo SQL Server)
+    # ========================================
+    # Prima di eseguire una query, sql_select legge il piano stimato (SHOWPLAN_XML)
+    # e rifiuta le query con costo stimato oltre la soglia. La soglia per agente
+    # (chat_ai.agents.max_query_cost) ha precedenza su questa (0 = nessun controllo).
+    query_cost_limit: float = 0.0
+    query_plan_cache_ttl_seconds: int = 600  # Validità di un piano stimato in cache
+    query_plan_cache_max_entries: int = 512  # Forme di query diverse in cache
+
+    # ========================================
+    # TOOL OUTPUT RENDERING (sql_select)
+    # ========================================
+    # Ogni carattere restituito da un tool finisce nel prompt (~4 caratteri per token).
+    # "auto" sceglie il formato più corto tra table, markdown, tsv e csv.
+    tool_output_format: Literal["auto", "table", "markdown", "tsv", "csv"] = "auto"
+    tool_output_budget_chars: int = 8000  # Dimensione massima del risultato (0 = nessun limite)
+    tool_output_max_cell_chars: int = 200  # Celle più lunghe vengono troncate (0 = nessun limite)
+
+    # ========================================
+    # SQL ENGINE POOLS (database degli agenti)
+    # ========================================
+    # Default per i pool dei db_uri degli agenti; pool_size/max_overflow possono
+    # essere ridefiniti per agente (chat_ai.agents.pool_size / max_overflow).
+    sql_pool_size: int = 5
+    sql_max_overflow: int = 10
+    sql_pool_recycle_seconds: int = 1800  # Ricicla connessioni più vecchie di N secondi
+    sql_pool_timeout_seconds: int = 30  # Attesa massima di una connessione libera
+    sql_engine_idle_seconds: int = 1800  # Chiude i pool inutilizzati da N secondi (0 = mai)
+
+    # ========================================
+    # SQL QUERY RESULT CACHE
+    # ========================================
+    # Cache in memoria dei risultati di sql_select, chiave (db_uri, SQL normalizzata).
+    # Un hit restituisce direttamente il testo già formattato.
+    query_cache_enabled: bool = True
+    query_cache_ttl_seconds: int = 300  # Validità di un risultato in cache
+    query_cache_max_entries: int = 256  # Numero massimo di query in cache
+    query_cache_max_bytes: int = 8 * 1024 * 1024  # Dimensione massima totale (8 MB)
+
+    # ========================================
+    # SQL TOOL EXECUTION
+    # ========================================
+    # I tool SQL (sincroni, pyodbc) girano in un thread pool dedicato, fuori
+    # dall'event loop. Ogni db_uri ha un limite proprio di query concorrenti.
+    sql_tool_workers: int = 16  # Dimensione del thread pool dei tool SQL
+    sql_max_concurrent_queries_per_db: int = 4  # Query in parallelo per singolo database
+    # Query identiche (stesso db_uri e SQL normalizzata) in corso nello stesso momento
+    # vengono eseguite una sola volta e il risultato viene condiviso
+    sql_single_flight_enabled: bool = True
+    sql_batch_max_queries: int = 8  # Query massime per una chiamata di sql_select_batch
+
+    # ========================================
+    # SQL DESCRIBE (riepilogo statistico)
+    # ========================================
+    # sql_describe legge tutte le righe della query a blocchi e restituisce solo statistiche
+    sql_describe_max_rows: int = 1_000_000  # Righe massime lette (oltre: statistiche parziali)
+    sql_describe_chunk_rows: int = 10_000  # Righe lette dal cursore per ogni blocco
+    sql_describe_top_k: int = 5  # Valori più frequenti mostrati per colonna testuale
+    sql_describe_periods: int = 12  # Mesi più recenti mostrati nell'andamento
+
+    # ========================================
+    # PAGINAZIONE RISULTATI (sql_next_page)
+    # ========================================
+    # Agenti con il tool sql_next_page: sql_select conserva le righe oltre la prima pagina
+    result_store_max_rows: int = 10_000  # Righe conservate per handle oltre la prima pagina (0 = disabilitato)
+    result_store_ttl_seconds: int = 600  # Durata di un handle dall'ultimo accesso
+    result_store_memory_bytes: int = 64 * 1024 * 1024  # RAM totale per gli handle, oltre si usa un file temporaneo
+    result_store_max_handles: int = 200  # Handle conservati al massimo (LRU)
+
+    # ========================================
+    # EXPORT RISULTATI (CSV / Parquet)
+    # ========================================
+    # L'export riesegue una query registrata nella conversazione e la invia a blocchi
+    export_chunk_rows: int = 5000  # Righe lette dal cursore (e righe per row group Parquet)
+    export_timeout_seconds: int = 900  # Durata massima di un export, download compreso (sostituisce QUERY_TIMEOUT_SECONDS)
+    # Export in corso per database: limite separato da SQL_MAX_CONCURRENT_QUERIES_PER_DB,
+    # un download lento non toglie slot a sql_select/get_schema
+    export_max_concurrent_per_db: int = 2
+
+    # ========================================
+    # SCHEMA CATALOG (get_schema)
+    # ========================================
+    # get_schema risponde da un catalogo in memoria caricato all'avvio.
+    # Il catalogo viene ricaricato in background ogni N minuti (0 = solo all'avvio).
+    schema_catalog_refresh_minutes: int = 30
+    # Nomi simili suggeriti da get_schema quando una tabella non viene trovata
+    schema_suggestions_top_k: int = 5
+    # Cartella degli snapshot JSON dei cataloghi (letti all'avvio, vuoto = disabilitato)
+    schema_snapshot_dir: str = "schema_snapshots"
+    # Riepilogo dello schema (tabelle e colonne) aggiunto al system prompt degli agenti
+    # con get_schema: budget in caratteri, 0 = disabilitato
+    schema_digest_max_chars: int = 0
+
+    # ========================================
+    # PERCORSI DI JOIN (get_join_path)
+    # ========================================
+    # File JSON con relazioni non dichiarate come foreign key (viste, tabelle legacy)
+    join_hints_file: str = "join_hints.json"
+    join_path_max_hops: int = 4  # Join massimi in un percorso
+
+    # ========================================
+    # VALORI COLONNE CATEGORICHE (get_column_values)
+    # ========================================
+    # Dizionario dei valori delle colonne di testo corte, ricostruito in background
+    column_values_refresh_minutes: int = 360  # 0 = dizionario disabilitato
+    column_values_sample_rows: int = 100_000  # Righe campionate per colonna
+    column_values_max_distinct: int = 50  # Oltre: colonna ad alta cardinalità (nessun elenco)
+    column_values_max_length: int = 100  # Lunghezza massima delle colonne considerate categoriche
+    column_values_max_columns: int = 2000  # Colonne massime per dizionario (per refresh)
+
     # ========================================
     # SMTP EMAIL CONFIGURATION
     # ========================================
@@ -1,7 +1,10 @@
 """
 Database connection and session management using SQLAlchemy.
 """
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
@@ -40,3 +43,17 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def mask_db_uri(db_uri: Optional[str]) -> str:
+    """
+    Return a db_uri safe to show in logs and metrics (password hidden).
+
+    None means the application database and is reported as "default".
+    """
+    if not db_uri:
+        return "default"
+    try:
+        return make_url(db_uri).render_as_string(hide_password=True)
+    except Exception:
+        return "<db_uri non valido>"
@@ -101,6 +101,28 @@ BEGIN
 END
 GO
 
+-- =====================================================
+-- Executed Queries Table (SQL run by agent tools, for exports)
+-- =====================================================
+IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'chat_ai.executed_queries') AND type = 'U')
+BEGIN
+    CREATE TABLE chat_ai.executed_queries (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        conversation_id INT NOT NULL,
+        agent_name NVARCHAR(50) NOT NULL,
+        tool_name NVARCHAR(50) NOT NULL,
+        query_text NVARCHAR(MAX) NOT NULL,
+        executed_at DATETIME2 DEFAULT GETDATE() NOT NULL,
+        CONSTRAINT fk_executed_queries_conversation FOREIGN KEY (conversation_id) 
+            REFERENCES chat_ai.conversations(id) ON DELETE CASCADE
+    );
+    
+    CREATE INDEX idx_executed_queries_conversation_id ON chat_ai.executed_queries(conversation_id);
+    
+    PRINT 'Table chat_ai.executed_queries created successfully';
+END
+GO
+
 -- =====================================================
 -- Agents Table (Dynamic configuration for Datapizza Agents)
 -- =====================================================
@@ -116,8 +138,12 @@ BEGIN
         schema_name NVARCHAR(100) NULL,
         is_active BIT DEFAULT 1 NOT NULL,
         tool_names NVARCHAR(MAX) NULL,
+        max_query_cost FLOAT NULL,
+        pool_size INT NULL,
+        max_overflow INT NULL,
         created_at DATETIME2 DEFAULT GETDATE() NOT NULL,
-        updated_at DATETIME2 DEFAULT GETDATE() NOT NULL
+        updated_at DATETIME2 DEFAULT GETDATE() NOT NULL,
+        row_version ROWVERSION  -- Versione della configurazione, letta dai worker per il reload
     );
 
     CREATE INDEX idx_agents_name ON chat_ai.agents(name);
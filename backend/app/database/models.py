@@ -1,7 +1,7 @@
 """
 SQLAlchemy ORM models for the chat_ai schema.
 """
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.database import Base
@@ -52,6 +52,7 @@ class Conversation(Base):
     # Relationships
     user = relationship("User", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    executed_queries = relationship("ExecutedQuery", back_populates="conversation", cascade="all, delete-orphan")
 
 
 class Message(Base):
@@ -69,6 +70,22 @@ class Message(Base):
     conversation = relationship("Conversation", back_populates="messages")
 
 
+class ExecutedQuery(Base):
+    """SQL query run by an agent tool during a conversation (re-run by the export endpoint)."""
+    __tablename__ = "executed_queries"
+    __table_args__ = {"schema": "chat_ai"}
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    conversation_id = Column(Integer, ForeignKey("chat_ai.conversations.id", ondelete="CASCADE"), nullable=False, index=True)
+    agent_name = Column(String(50), nullable=False)
+    tool_name = Column(String(50), nullable=False)  # 'sql_select', 'sql_select_batch', 'sql_describe'
+    query_text = Column(Text, nullable=False)
+    executed_at = Column(DateTime, server_default=func.getdate(), nullable=False)
+
+    # Relationships
+    conversation = relationship("Conversation", back_populates="executed_queries")
+
+
 class AgentConfig(Base):
     __tablename__ = "agents"
     __table_args__ = {"schema": "chat_ai"}
@@ -82,6 +99,9 @@ class AgentConfig(Base):
     schema_name = Column(String(100), nullable=True)
     is_active = Column(Boolean, server_default="1", nullable=False)
     tool_names = Column(Text, nullable=True)
+    max_query_cost = Column(Float, nullable=True)  # Costo stimato massimo per sql_select (NULL = default)
+    pool_size = Column(Integer, nullable=True)  # Pool connessioni verso db_uri (NULL = SQL_POOL_SIZE)
+    max_overflow = Column(Integer, nullable=True)  # Connessioni extra oltre pool_size (NULL = SQL_MAX_OVERFLOW)
 
 
 class ScheduledTask(Base):
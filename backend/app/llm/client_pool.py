@@ -0,0 +1,102 @@
+"""
+Pool dei client LLM condivisi da agenti e FAQ.
+
+Ogni client porta con sé il proprio pool di connessioni HTTP: crearne uno per
+agente con model override, o uno per ogni richiesta di FAQ, significa nuove
+connessioni e nuovi handshake TLS ad ogni chiamata. Qui c'è un solo client per
+(provider, modello, temperatura, tracing), condiviso dall'intero processo: i
+client dei provider sono thread-safe e le connessioni restano calde tra una
+richiesta e l'altra (LLM_KEEPALIVE_SECONDS).
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.config import Settings
+from app.llm.factory import LLMClientKey, UseCase, build_llm_client, llm_client_key
+
+
+def _open_connections(client: Any) -> Dict[str, Optional[int]]:
+    """
+    Count the pooled HTTP connections of a datapizza client (sync and async SDK clients).
+
+    Best effort: relies on the httpx/httpcore internals, None when not available.
+    """
+    counts: Dict[str, Optional[int]] = {}
+    for attribute in ("client", "a_client"):
+        sdk_client = getattr(client, attribute, None)
+        pool = getattr(getattr(getattr(sdk_client, "_client", None), "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        counts[attribute] = len(connections) if connections is not None else None
+    return {"sync": counts["client"], "async": counts["a_client"]}
+
+
+class LLMClientPool:
+    """
+    Client LLM condivisi, uno per LLMClientKey.
+
+    Example:
+        >>> client = llm_client_pool.get(settings, use_case="faq")
+    """
+
+    def __init__(self):
+        self._clients: Dict[LLMClientKey, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.created = 0
+
+    def get(self, settings: Settings, *, use_case: UseCase, model_override: Optional[str] = None) -> Any:
+        """
+        Return the shared client for these parameters, creating it on first use.
+
+        Raises:
+            LLMConfigurationError: If the client cannot be built (nothing is cached)
+        """
+        key = llm_client_key(settings, use_case=use_case, model_override=model_override)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            # Creato sotto lock: richieste concorrenti non costruiscono due client uguali
+            client = build_llm_client(settings, use_case=use_case, model_override=model_override)
+            self._clients[key] = client
+            self.created += 1
+        print(f"[LLMClientPool] Nuovo client {key.provider}/{key.model}")
+        return client
+
+    async def aclose(self) -> None:
+        """Close the HTTP connections of every client (application shutdown)."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            sync_client = getattr(client, "client", None)
+            async_client = getattr(client, "a_client", None)
+            try:
+                if sync_client is not None and hasattr(sync_client, "close"):
+                    sync_client.close()
+                if async_client is not None and hasattr(async_client, "close"):
+                    await async_client.close()
+            except Exception as exc:
+                print(f"[LLMClientPool] Chiusura client fallita: {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self._clients.items())
+            hits, created = self.hits, self.created
+        clients: List[Dict[str, Any]] = []
+        for key, client in items:
+            connections = _open_connections(client)
+            clients.append({**key._asdict(), "connections": connections})
+        return {
+            "live_clients": len(clients),
+            "open_connections": sum(
+                count for entry in clients for count in entry["connections"].values() if count
+            ),
+            "hits": hits,
+            "created": created,
+            "clients": clients,
+        }
+
+
+llm_client_pool = LLMClientPool()
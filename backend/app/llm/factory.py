@@ -10,7 +10,7 @@ Il provider viene selezionato tramite la variabile LLM_PROVIDER in .env
 """
 from __future__ import annotations
 
-from typing import Literal, Optional
+from typing import Literal, NamedTuple, Optional
 
 from app.agents.client_wrapper import RetryAnthropicClient
 from app.config import Settings
@@ -70,6 +70,46 @@ def _resolve_model(settings: Settings, use_case: UseCase, override: Optional[str
     )
 
 
+class LLMClientKey(NamedTuple):
+    """Parametri che distinguono un client LLM (chiave del pool condiviso)."""
+    provider: str
+    model: str
+    temperature: float
+    tracing: bool
+
+
+def resolve_provider(settings: Settings, use_case: UseCase) -> str:
+    """Provider LLM del use case (in minuscolo)."""
+    # Usa faq_provider se configurato e use_case è "faq"
+    if use_case == "faq" and settings.faq_provider:
+        return settings.faq_provider.lower()
+    return (settings.llm_provider or "anthropic").lower()
+
+
+def llm_client_key(
+    settings: Settings,
+    *,
+    use_case: UseCase,
+    model_override: Optional[str] = None,
+) -> LLMClientKey:
+    """
+    Chiave del client che build_llm_client creerebbe per questi parametri.
+
+    Raises:
+        LLMConfigurationError: Se nessun modello è configurato
+    """
+    provider = resolve_provider(settings, use_case)
+    if provider == "lmstudio":
+        # LM Studio usa i modelli locali, non AGENT_MODEL / FAQ_MODEL
+        if use_case == "faq" and settings.local_llm_light_model:
+            model_name = settings.local_llm_light_model
+        else:
+            model_name = settings.local_llm_model
+    else:
+        model_name = _resolve_model(settings, use_case, model_override)
+    return LLMClientKey(provider, model_name, settings.llm_temperature, settings.enable_llm_tracing)
+
+
 def build_llm_client(
     settings: Settings,
     *,
@@ -101,12 +141,7 @@ def build_llm_client(
         >>> client = build_llm_client(settings, use_case="agent")
         >>> response = client.invoke("Analizza le vendite 2025")
     """
-    # Usa faq_provider se configurato e use_case è "faq"
-    if use_case == "faq" and settings.faq_provider:
-        provider = settings.faq_provider.lower()
-    else:
-        provider = (settings.llm_provider or "anthropic").lower()
-    
+    provider = resolve_provider(settings, use_case)
     model_name = _resolve_model(settings, use_case, model_override)
 
     # ========================================
@@ -124,6 +159,7 @@ def build_llm_client(
             model=model_name,
             temperature=settings.llm_temperature,  # Temperatura configurabile da .env
             trace_io=settings.enable_llm_tracing,  # NUOVO: I/O tracing configurabile
+            keepalive_seconds=settings.llm_keepalive_seconds or None,
         )
 
     if provider == "openai":
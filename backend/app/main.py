@@ -5,7 +5,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.config import get_settings
-from app.agents.manager import init_agent_manager
+from app.agents.manager import get_agent_manager, init_agent_manager
 from app.auth.routes import router as auth_router
 from app.chat.routes import router as chat_router
 from app.admin.routes import router as admin_router
@@ -33,6 +33,57 @@ async def lifespan(app: FastAPI):
     
     scheduler = get_scheduler_service()
     scheduler.start()
+
+    # Startup: carica i cataloghi schema di get_schema (e i grafi dei join) in background
+    from app.agents.join_graph import refresh_join_graphs
+    from app.agents.schema_catalog import refresh_all_catalogs
+
+    def refresh_schema_metadata():
+        refresh_all_catalogs()
+        refresh_join_graphs()
+        get_agent_manager().refresh_schema_digests()
+
+    if settings.schema_catalog_refresh_minutes > 0:
+        scheduler.add_interval_job(
+            job_id="schema_catalog_refresh",
+            seconds=settings.schema_catalog_refresh_minutes * 60,
+            callback=refresh_schema_metadata,
+            job_name="Schema catalog refresh",
+            run_now=True,
+        )
+    else:
+        import threading
+        threading.Thread(target=refresh_schema_metadata, name="schema-catalog-warmup", daemon=True).start()
+
+    # Dizionario valori delle colonne categoriche (get_column_values), ricostruito quando scaduto
+    from app.agents.column_values import refresh_stale_value_dictionaries
+    if settings.column_values_refresh_minutes > 0:
+        scheduler.add_interval_job(
+            job_id="column_values_refresh",
+            seconds=min(settings.column_values_refresh_minutes * 60, 3600),
+            callback=refresh_stale_value_dictionaries,
+            job_name="Column values refresh",
+            run_now=True,
+        )
+
+    # Con più worker: applica le modifiche agli agenti salvate da un altro worker
+    if settings.agent_config_poll_seconds > 0:
+        scheduler.add_interval_job(
+            job_id="agent_config_sync",
+            seconds=settings.agent_config_poll_seconds,
+            callback=lambda: get_agent_manager().sync_config(),
+            job_name="Agent config sync",
+        )
+
+    # Chiude i pool dei database degli agenti rimasti inutilizzati
+    from app.agents.engine_registry import engine_registry
+    if settings.sql_engine_idle_seconds > 0:
+        scheduler.add_interval_job(
+            job_id="sql_engine_idle_sweep",
+            seconds=max(settings.sql_engine_idle_seconds // 4, 60),
+            callback=engine_registry.dispose_idle,
+            job_name="SQL engine idle sweep",
+        )
     
     # Load active scheduled tasks from database
     db = SessionLocal()
@@ -65,6 +116,13 @@ async def lifespan(app: FastAPI):
     # Shutdown: Stop scheduler and cleanup
     print("Shutting down scheduler...")
     scheduler.shutdown()
+    from app.agents.tool_executor import tool_executor
+    tool_executor.shutdown()
+    engine_registry.dispose_all()
+    from app.agents.result_store import result_store
+    result_store.clear()  # Chiude (ed elimina) i file temporanei delle pagine
+    from app.llm.client_pool import llm_client_pool
+    await llm_client_pool.aclose()
     print("Shutting down application...")
 
 
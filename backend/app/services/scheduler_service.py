@@ -6,6 +6,7 @@ from typing import Optional, Callable
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.jobstores.base import JobLookupError
 import json
 
@@ -101,6 +102,50 @@ class SchedulerService:
             )
             return False
 
+    def add_interval_job(
+        self,
+        job_id: str,
+        seconds: int,
+        callback: Callable,
+        job_name: str = "",
+        run_now: bool = False,
+    ) -> bool:
+        """
+        Add an internal maintenance job that runs every ``seconds``.
+
+        Unlike add_task, these jobs are not backed by chat_ai.scheduled_tasks
+        (e.g. schema catalog refresh) and use a separate id namespace.
+
+        Args:
+            job_id: Unique identifier for the job
+            seconds: Interval between runs
+            callback: Function to call (no arguments)
+            job_name: Human-readable job name (for logging)
+            run_now: If True, the first run starts immediately
+
+        Returns:
+            True if job was added successfully, False otherwise
+        """
+        try:
+            job_options = {}
+            if run_now:
+                # next_run_time=None metterebbe il job in pausa: lo passiamo solo se serve
+                job_options["next_run_time"] = datetime.now()
+
+            self._scheduler.add_job(
+                func=callback,
+                trigger=IntervalTrigger(seconds=seconds, timezone="Europe/Rome"),
+                id=f"maintenance_{job_id}",
+                name=job_name or job_id,
+                replace_existing=True,
+                **job_options,
+            )
+            logger.info(f"Added maintenance job '{job_name or job_id}' every {seconds}s")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to add maintenance job '{job_name or job_id}': {str(e)}")
+            return False
+
     def remove_task(self, task_id: str) -> bool:
         """
         Remove a scheduled task.
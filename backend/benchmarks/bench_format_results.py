@@ -0,0 +1,129 @@
+"""
+Microbenchmark di format_results (app/agents/sql_tools.py).
+
+Confronta la vecchia rappresentazione (un dict per riga, str() chiamato due
+volte per cella: larghezze + rendering) con quella colonnare (lista colonne +
+tuple, str() una volta per cella) su un risultato sintetico 10k x 30.
+
+Riporta per ciascuna variante:
+- Tempo (ms), includendo la costruzione delle righe dal cursore
+- Picco di memoria allocata (tracemalloc)
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_format_results
+"""
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.agents.sql_tools import format_results
+
+ROWS = 10_000
+COLUMNS = 30
+
+
+def legacy_format_results(results, max_rows=None, has_more=False):
+    """Versione precedente: dict per riga, str() per larghezze e per rendering."""
+    if not results:
+        return "Nessun risultato trovato."
+
+    total_rows = len(results)
+    if max_rows:
+        results = results[:max_rows]
+        truncated = has_more or len(results) < total_rows
+    else:
+        truncated = has_more
+
+    columns = list(results[0].keys())
+
+    widths = {col: len(str(col)) for col in columns}
+    for row in results:
+        for col in columns:
+            widths[col] = max(widths[col], len(str(row[col])))
+
+    lines = []
+    header = " | ".join(str(col).ljust(widths[col]) for col in columns)
+    lines.append(header)
+    lines.append("-" * len(header))
+    for row in results:
+        line = " | ".join(str(row[col]).ljust(widths[col]) for col in columns)
+        lines.append(line)
+
+    result = "\n".join(lines)
+    if truncated:
+        result += f"\n\n(Mostrati i primi {len(results)} risultati)"
+    else:
+        result += f"\n\n(Totale: {total_rows} righe)"
+    return result
+
+
+def make_rows():
+    """Tuple come quelle restituite dal cursore: testo, interi, decimali, date, NULL."""
+    columns = [f"Colonna{i}" for i in range(COLUMNS)]
+    start = date(2024, 1, 1)
+    rows = []
+    for r in range(ROWS):
+        row = []
+        for c in range(COLUMNS):
+            kind = c % 5
+            if kind == 0:
+                row.append(f"Cliente {r % 997}")
+            elif kind == 1:
+                row.append(r * c)
+            elif kind == 2:
+                row.append(Decimal(r) / 7)
+            elif kind == 3:
+                row.append(start + timedelta(days=r % 365))
+            else:
+                row.append(None if r % 3 == 0 else "X")
+        rows.append(tuple(row))
+    return columns, rows
+
+
+def legacy_path(columns, rows):
+    results = [dict(zip(columns, row)) for row in rows]
+    return legacy_format_results(results)
+
+
+def columnar_path(columns, rows):
+    return format_results(columns, rows)
+
+
+def measure(func, columns, rows):
+    tracemalloc.start()
+    started = time.perf_counter()
+    output = func(columns, rows)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Tempo senza l'overhead di tracemalloc
+    best_ms = min(_timed(func, columns, rows) for _ in range(3))
+    return output, best_ms, elapsed_ms, peak
+
+
+def _timed(func, columns, rows):
+    started = time.perf_counter()
+    func(columns, rows)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    columns, rows = make_rows()
+    print(f"Risultato sintetico: {ROWS} righe x {COLUMNS} colonne\n")
+    print(f"  {'variante':<10} {'tempo ms':>10} {'picco MB':>10}")
+
+    outputs = {}
+    for name, func in (("legacy", legacy_path), ("colonnare", columnar_path)):
+        output, best_ms, _, peak = measure(func, columns, rows)
+        outputs[name] = output
+        print(f"  {name:<10} {best_ms:>10.1f} {peak / 1024 / 1024:>10.1f}")
+
+    # Stesso testo a parte la nota finale
+    same = outputs["legacy"].split("\n\n")[0] == outputs["colonnare"].split("\n\n")[0]
+    print(f"\nTabella identica: {'sì' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Confronto dei formati di output di sql_select (app/agents/result_renderer.py).
+
+Per tre risultati tipici (numerico stretto, anagrafica con testo lungo,
+righe con colonne costanti) riporta caratteri e token stimati per ogni
+formato, senza budget e con il budget di default.
+
+Token: tiktoken (cl100k_base) se installato, altrimenti ~4 caratteri per token.
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_result_renderer
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from app.agents.result_renderer import OUTPUT_FORMATS, render_results
+from app.config import get_settings
+
+settings = get_settings()
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(value: str) -> int:
+        return len(_encoding.encode(value))
+
+    TOKENIZER = "tiktoken cl100k_base"
+except ImportError:
+    def count_tokens(value: str) -> int:
+        return (len(value) + 3) // 4
+
+    TOKENIZER = "stima caratteri/4"
+
+
+def numeric_result():
+    columns = ["Anno", "Mese", "CodiceFiliale", "Fatturato", "NumeroOrdini"]
+    rows = [
+        (2024, month, f"F{branch:03d}", Decimal(branch * 1000 + month * 37) / 3, branch * month)
+        for month in range(1, 13)
+        for branch in range(1, 9)
+    ]
+    return columns, rows
+
+
+def text_result():
+    columns = ["CodiceCliente", "RagioneSociale", "Indirizzo", "Note", "DataUltimoOrdine"]
+    note = (
+        "Cliente storico, richiede consegna su appuntamento. Referente amministrativo "
+        "diverso dal referente acquisti; inviare sempre copia fattura via PEC. "
+    )
+    rows = [
+        (
+            f"C{i:05d}",
+            f"Ragione Sociale Cliente {i} S.r.l.",
+            f"Via Roma {i}, 20100 Milano (MI)",
+            note * (1 + i % 3) if i % 4 else None,
+            date(2024, 1, 1) + timedelta(days=i),
+        )
+        for i in range(100)
+    ]
+    return columns, rows
+
+
+def constant_columns_result():
+    columns = ["Societa", "Divisa", "Stato", "Articolo", "Giacenza"]
+    rows = [("EGM", "EUR", "ATTIVO", f"ART-{i:04d}", i * 3) for i in range(100)]
+    return columns, rows
+
+
+def main():
+    print(f"Token: {TOKENIZER}")
+    print(f"Budget di default: {settings.tool_output_budget_chars} caratteri, "
+          f"celle max {settings.tool_output_max_cell_chars}\n")
+
+    for title, (columns, rows) in (
+        ("Numerico stretto (96 x 5)", numeric_result()),
+        ("Anagrafica con testo lungo (100 x 5)", text_result()),
+        ("Colonne costanti (100 x 5)", constant_columns_result()),
+    ):
+        print(title)
+        print(f"  {'formato':<10} {'caratteri':>10} {'token':>8} {'con budget':>12} {'token':>8}")
+        for output_format in OUTPUT_FORMATS + ("auto",):
+            full = render_results(columns, rows, output_format=output_format)
+            budgeted = render_results(
+                columns,
+                rows,
+                budget_chars=settings.tool_output_budget_chars,
+                max_cell_chars=settings.tool_output_max_cell_chars,
+                output_format=output_format,
+            )
+            print(
+                f"  {output_format:<10} {len(full):>10} {count_tokens(full):>8} "
+                f"{len(budgeted):>12} {count_tokens(budgeted):>8}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
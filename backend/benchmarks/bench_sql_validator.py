@@ -0,0 +1,92 @@
+"""
+Microbenchmark del validatore SQL (app/agents/sql_validator.py).
+
+Confronta il tokenizer a passata singola con il vecchio validatore basato su
+regex + ricerca di sottostringhe, sul corpus di query reali degli agenti
+(benchmarks/corpus/agent_queries.json) e su query lunghe generate.
+
+Riporta:
+- Tempo medio per query (µs) sul corpus
+- Scalabilità con la lunghezza della query
+- Esiti errati (false rejections / false accepts) di entrambi i validatori
+
+Uso (dalla cartella backend):
+    python -m benchmarks.bench_sql_validator
+"""
+import json
+import re
+import timeit
+from pathlib import Path
+
+from app.agents.sql_validator import validate_sql_query
+
+CORPUS_PATH = Path(__file__).parent / "corpus" / "agent_queries.json"
+
+
+def legacy_validate_sql_query(query: str) -> tuple[bool, str]:
+    """Validatore precedente: due passate regex + 15 ricerche di sottostringa."""
+    query_clean = re.sub(r'--.*$', '', query, flags=re.MULTILINE)
+    query_clean = re.sub(r'/\*.*?\*/', '', query_clean, flags=re.DOTALL)
+    query_clean = query_clean.strip().upper()
+
+    dangerous_keywords = [
+        'DROP', 'DELETE', 'INSERT', 'UPDATE', 'ALTER', 'CREATE',
+        'TRUNCATE', 'REPLACE', 'MERGE', 'EXEC', 'EXECUTE',
+        'SP_', 'XP_', 'OPENROWSET', 'OPENDATASOURCE'
+    ]
+
+    for keyword in dangerous_keywords:
+        if keyword in query_clean:
+            return False, f"Keyword '{keyword}' non è permessa."
+
+    return True, ""
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def count_wrong(validator, corpus):
+    false_rejects = [c["query"] for c in corpus if c["valid"] and not validator(c["query"])[0]]
+    false_accepts = [c["query"] for c in corpus if not c["valid"] and validator(c["query"])[0]]
+    return false_rejects, false_accepts
+
+
+def time_per_call_us(validator, queries, repeat: int = 5, number: int = 200) -> float:
+    def run():
+        for q in queries:
+            validator(q)
+
+    best = min(timeit.repeat(run, repeat=repeat, number=number))
+    return best / (number * len(queries)) * 1e6
+
+
+def main():
+    corpus = load_corpus()
+    queries = [c["query"] for c in corpus]
+
+    print(f"Corpus: {len(corpus)} query ({sum(c['valid'] for c in corpus)} valide)\n")
+
+    print("Tempo medio per query sul corpus:")
+    for name, validator in (("legacy", legacy_validate_sql_query), ("tokenizer", validate_sql_query)):
+        print(f"  {name:<10} {time_per_call_us(validator, queries):8.2f} µs")
+
+    print("\nScalabilità con la lunghezza (query valida, colonne ripetute):")
+    print(f"  {'caratteri':>10} {'legacy µs':>12} {'tokenizer µs':>14}")
+    for columns in (10, 100, 1000):
+        query = "SELECT " + ", ".join(f"Colonna{i}" for i in range(columns)) + " FROM vendite.Movimenti"
+        legacy = time_per_call_us(legacy_validate_sql_query, [query], number=50)
+        new = time_per_call_us(validate_sql_query, [query], number=50)
+        print(f"  {len(query):>10} {legacy:>12.1f} {new:>14.1f}")
+
+    print("\nEsiti errati sul corpus:")
+    for name, validator in (("legacy", legacy_validate_sql_query), ("tokenizer", validate_sql_query)):
+        false_rejects, false_accepts = count_wrong(validator, corpus)
+        print(f"  {name:<10} false rejections: {len(false_rejects):2d}   false accepts: {len(false_accepts):2d}")
+        for q in false_rejects + false_accepts:
+            print(f"      - {q[:90]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+-- ========================================
+-- SCRIPT: Soglia di costo stimato per agente (query cost guard)
+-- ========================================
+--
+-- Aggiunge la colonna max_query_cost a chat_ai.agents.
+--
+-- Prima di eseguire una query, sql_select legge il piano stimato di SQL Server
+-- (SET SHOWPLAN_XML) e rifiuta le query con costo stimato oltre la soglia,
+-- restituendo al modello un suggerimento su come riscriverle.
+--
+-- Valori:
+-- - NULL: usa il default globale QUERY_COST_LIMIT (.env, 0 = disattivato)
+-- - 0:    nessun controllo per questo agente
+-- - > 0:  soglia in unità di costo SQL Server (StatementSubTreeCost)
+--
+-- COME USARE:
+-- 1. Esegui questo script:
+--    sqlcmd -S your_server -d your_database -i ADD_AGENTS_MAX_QUERY_COST.sql
+--
+-- 2. Imposta la soglia per gli agenti che interrogano tabelle grandi (esempio sotto)
+--
+-- 3. Riavvia il backend (oppure salva l'agente dal pannello admin)
+--
+-- ========================================
+
+USE [YourDatabase];  -- MODIFICA: inserisci il nome del tuo database
+GO
+
+IF NOT EXISTS (
+    SELECT * FROM sys.columns
+    WHERE object_id = OBJECT_ID(N'chat_ai.agents') AND name = 'max_query_cost'
+)
+BEGIN
+    ALTER TABLE chat_ai.agents ADD max_query_cost FLOAT NULL;
+    PRINT '  ✓ Colonna chat_ai.agents.max_query_cost aggiunta';
+END
+ELSE
+BEGIN
+    PRINT '  - Colonna chat_ai.agents.max_query_cost già presente';
+END
+GO
+
+-- Esempio (opzionale): soglia per un agente specifico
+-- UPDATE chat_ai.agents SET max_query_cost = 50 WHERE name = 'vendite';
+-- GO
+
+SELECT id, name, tool_names, max_query_cost
+FROM chat_ai.agents
+ORDER BY name;
+GO
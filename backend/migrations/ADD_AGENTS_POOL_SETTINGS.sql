@@ -0,0 +1,59 @@
+-- ========================================
+-- SCRIPT: Parametri del pool di connessioni per agente
+-- ========================================
+--
+-- Aggiunge le colonne pool_size e max_overflow a chat_ai.agents.
+--
+-- Ogni db_uri degli agenti ha un pool di connessioni gestito dal backend
+-- (app/agents/engine_registry.py). I default sono in .env:
+--   SQL_POOL_SIZE, SQL_MAX_OVERFLOW, SQL_POOL_RECYCLE_SECONDS,
+--   SQL_POOL_TIMEOUT_SECONDS, SQL_ENGINE_IDLE_SECONDS
+--
+-- Valori:
+-- - NULL: usa il default da .env
+-- - Se più agenti usano lo stesso db_uri, vale il valore più alto
+--
+-- COME USARE:
+-- 1. Esegui questo script:
+--    sqlcmd -S your_server -d your_database -i ADD_AGENTS_POOL_SETTINGS.sql
+--
+-- 2. Salva l'agente dal pannello admin (o riavvia il backend): il pool
+--    precedente viene chiuso e ricreato con i nuovi parametri
+--
+-- ========================================
+
+USE [YourDatabase];  -- MODIFICA: inserisci il nome del tuo database
+GO
+
+IF NOT EXISTS (
+    SELECT * FROM sys.columns
+    WHERE object_id = OBJECT_ID(N'chat_ai.agents') AND name = 'pool_size'
+)
+BEGIN
+    ALTER TABLE chat_ai.agents ADD pool_size INT NULL;
+    PRINT '  ✓ Colonna chat_ai.agents.pool_size aggiunta';
+END
+ELSE
+BEGIN
+    PRINT '  - Colonna chat_ai.agents.pool_size già presente';
+END
+GO
+
+IF NOT EXISTS (
+    SELECT * FROM sys.columns
+    WHERE object_id = OBJECT_ID(N'chat_ai.agents') AND name = 'max_overflow'
+)
+BEGIN
+    ALTER TABLE chat_ai.agents ADD max_overflow INT NULL;
+    PRINT '  ✓ Colonna chat_ai.agents.max_overflow aggiunta';
+END
+ELSE
+BEGIN
+    PRINT '  - Colonna chat_ai.agents.max_overflow già presente';
+END
+GO
+
+SELECT id, name, db_uri, pool_size, max_overflow
+FROM chat_ai.agents
+ORDER BY name;
+GO
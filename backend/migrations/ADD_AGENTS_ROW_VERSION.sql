@@ -0,0 +1,44 @@
+-- ========================================
+-- SCRIPT: Versione della configurazione agenti (deploy con più worker)
+-- ========================================
+--
+-- Aggiunge la colonna row_version (ROWVERSION) a chat_ai.agents.
+--
+-- Con uvicorn --workers N ogni worker ha il proprio registry di agenti: una
+-- modifica dal pannello admin ricarica subito solo il worker che l'ha servita.
+-- Gli altri worker leggono ogni AGENT_CONFIG_POLL_SECONDS (.env, default 10)
+--   SELECT COUNT(*), MAX(row_version) FROM chat_ai.agents
+-- e, se il risultato cambia, ricaricano solo gli agenti modificati.
+--
+-- SQL Server aggiorna row_version automaticamente ad ogni INSERT/UPDATE:
+-- vale anche per le modifiche fatte a mano (UPDATE da SSMS, script).
+--
+-- COME USARE:
+-- 1. Esegui questo script:
+--    sqlcmd -S your_server -d your_database -i ADD_AGENTS_ROW_VERSION.sql
+--
+-- 2. Riavvia il backend. Senza la colonna il backend funziona comunque,
+--    ma le modifiche arrivano agli altri worker solo al riavvio
+--
+-- ========================================
+
+USE [YourDatabase];  -- MODIFICA: inserisci il nome del tuo database
+GO
+
+IF NOT EXISTS (
+    SELECT * FROM sys.columns
+    WHERE object_id = OBJECT_ID(N'chat_ai.agents') AND name = 'row_version'
+)
+BEGIN
+    ALTER TABLE chat_ai.agents ADD row_version ROWVERSION;
+    PRINT '  ✓ Colonna chat_ai.agents.row_version aggiunta';
+END
+ELSE
+BEGIN
+    PRINT '  - Colonna chat_ai.agents.row_version già presente';
+END
+GO
+
+SELECT COUNT(*) AS agents, CONVERT(bigint, MAX(row_version)) AS config_version
+FROM chat_ai.agents;
+GO
@@ -0,0 +1,49 @@
+-- ========================================
+-- SCRIPT: Registro delle query eseguite dagli agenti
+-- ========================================
+--
+-- Crea la tabella chat_ai.executed_queries.
+--
+-- Durante una conversazione le query SQL valide eseguite dai tool
+-- (sql_select, sql_select_batch, sql_describe) vengono salvate qui.
+-- L'utente può elencarle e scaricarne il risultato completo:
+--   GET /api/chat/conversations/{id}/queries
+--   GET /api/chat/queries/{id}/export?format=csv|parquet
+--
+-- L'export riesegue la query in streaming (EXPORT_CHUNK_ROWS righe alla
+-- volta), senza il limite MAX_QUERY_RESULTS applicato al modello.
+-- Il formato parquet richiede il pacchetto pyarrow sul server.
+--
+-- COME USARE:
+-- 1. Esegui questo script:
+--    sqlcmd -S your_server -d your_database -i ADD_EXECUTED_QUERIES.sql
+--
+-- 2. Riavvia il backend
+--
+-- ========================================
+
+USE [YourDatabase];  -- MODIFICA: inserisci il nome del tuo database
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.objects WHERE object_id = OBJECT_ID(N'chat_ai.executed_queries') AND type = 'U')
+BEGIN
+    CREATE TABLE chat_ai.executed_queries (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        conversation_id INT NOT NULL,
+        agent_name NVARCHAR(50) NOT NULL,
+        tool_name NVARCHAR(50) NOT NULL,
+        query_text NVARCHAR(MAX) NOT NULL,
+        executed_at DATETIME2 DEFAULT GETDATE() NOT NULL,
+        CONSTRAINT fk_executed_queries_conversation FOREIGN KEY (conversation_id)
+            REFERENCES chat_ai.conversations(id) ON DELETE CASCADE
+    );
+
+    CREATE INDEX idx_executed_queries_conversation_id ON chat_ai.executed_queries(conversation_id);
+
+    PRINT '  ✓ Tabella chat_ai.executed_queries creata';
+END
+ELSE
+BEGIN
+    PRINT '  - Tabella chat_ai.executed_queries già presente';
+END
+GO
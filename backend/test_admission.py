@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.admin import routes as admin_routes
+from app.agents.admission import AdmissionController, AdmissionTimeoutError
+
+
+async def _admitted(ticket, positions=None):
+    async for position in ticket.queue_positions(timeout=5):
+        if positions is not None:
+            positions.append(position)
+    return ticket
+
+
+class TestAdmissionController(unittest.IsolatedAsyncioTestCase):
+    async def test_round_robin_between_users(self):
+        controller = AdmissionController(max_per_agent=1, max_per_provider=0, max_per_user=0)
+        first = controller.request("anna", "vendite", "anthropic")
+        self.assertTrue(first.admitted)
+
+        anna = [controller.request("anna", "vendite", "anthropic") for _ in range(2)]
+        bruno = controller.request("bruno", "vendite", "anthropic")
+        self.assertEqual(controller._position(anna[0]), 1)
+        self.assertEqual(controller._position(bruno), 2)
+        self.assertEqual(controller._position(anna[1]), 3)
+
+        first.release()
+        self.assertTrue(anna[0].admitted and not bruno.admitted)
+        anna[0].release()
+        self.assertTrue(bruno.admitted and not anna[1].admitted)  # bruno passa prima della terza di anna
+        bruno.release()
+        self.assertTrue(anna[1].admitted)
+
+    async def test_limits_and_queue_events(self):
+        controller = AdmissionController(max_per_agent=0, max_per_provider=2, max_per_user=1)
+        running = controller.request("anna", "vendite", "anthropic")
+        other = controller.request("bruno", "magazzino", "anthropic")
+        self.assertTrue(running.admitted and other.admitted)
+
+        waiting = controller.request("carla", "ordini", "anthropic")  # provider pieno
+        positions = []
+        task = asyncio.create_task(_admitted(waiting, positions))
+        await asyncio.sleep(0)
+        self.assertEqual(controller.stats()["providers"]["anthropic"]["saturation"], 1.0)
+
+        running.release()
+        self.assertTrue((await task).admitted)
+        self.assertEqual(positions, [1])
+        self.assertEqual(controller.stats()["admitted"], 3)
+
+    async def test_timeout_leaves_the_queue(self):
+        controller = AdmissionController(max_per_agent=1, max_per_provider=0, max_per_user=0)
+        running = controller.request("anna", "vendite", "anthropic")
+        waiting = controller.request("bruno", "vendite", "anthropic")
+        with self.assertRaises(AdmissionTimeoutError):
+            async for _ in waiting.queue_positions(timeout=0.05):
+                pass
+        waiting.release()
+        running.release()
+        stats = controller.stats()
+        self.assertEqual((stats["queued"], stats["timeouts"], stats["agents"]), (0, 1, {}))
+
+
+class TestScheduledTaskAdmission(unittest.IsolatedAsyncioTestCase):
+    async def test_scheduled_run_waits_for_a_slot(self):
+        controller = AdmissionController(max_per_agent=1, max_per_provider=0, max_per_user=0)
+        task = SimpleNamespace(
+            id=7, name="Report", is_active=True, agent_name="vendite", prompt="Fatturato di ieri",
+            recipient_emails=["a@example.com"],
+        )
+        db = mock.MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = task
+        agent = SimpleNamespace(a_run=mock.AsyncMock(return_value="ok"))
+
+        with mock.patch.object(admin_routes, "admission_controller", controller), \
+                mock.patch.object(admin_routes, "get_agent_manager") as get_manager, \
+                mock.patch.object(admin_routes, "EmailService"), \
+                mock.patch.object(admin_routes, "get_scheduler_service"):
+            get_manager.return_value.get_agent.return_value = agent
+            running = controller.request("anna", "vendite", "anthropic")
+            run = asyncio.create_task(admin_routes.execute_scheduled_task(task.id, db))
+            await asyncio.sleep(0.01)
+            agent.a_run.assert_not_called()
+            self.assertEqual(controller.stats()["queued"], 1)
+
+            running.release()
+            await run
+
+        agent.a_run.assert_awaited_once_with("Fatturato di ieri")
+        self.assertEqual(task.last_run_status, "success")
+        self.assertEqual((controller.stats()["queued"], controller.stats()["agents"]), (0, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.agents import manager
+from app.agents.manager import AgentManager
+from app.config import get_settings
+from app.llm import client_pool
+
+
+def _row(name, **overrides):
+    fields = dict(
+        name=name, description=name, system_prompt=f"Prompt {name}", model=None, db_uri=None,
+        schema_name=None, tool_names="sql_select", max_query_cost=None, pool_size=None,
+        max_overflow=None, is_active=True,
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+class TestAgentReload(unittest.TestCase):
+    def setUp(self):
+        self.rows = {"magazzino": _row("magazzino"), "vendite": _row("vendite", model="modello-b")}
+        session = mock.MagicMock()
+        query = session.query.return_value.filter.return_value
+        query.order_by.return_value.all.side_effect = lambda: [
+            r for _, r in sorted(self.rows.items()) if r.is_active
+        ]
+        query.first.side_effect = lambda: self.rows.get(self.lookup)
+        self.version = (2, 100)
+        session.execute.return_value.one.side_effect = lambda: self.version
+
+        for patcher in (
+            mock.patch.object(manager, "SessionLocal", return_value=session),
+            mock.patch.object(manager, "Agent", side_effect=lambda **kw: SimpleNamespace(**kw)),
+            mock.patch.object(manager, "llm_client_pool", client_pool.LLMClientPool()),
+            mock.patch.object(client_pool, "build_llm_client", side_effect=lambda *a, **kw: object()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = AgentManager(get_settings())
+
+    def reload(self, name):
+        self.lookup = name
+        return self.manager.reload_agent(name)
+
+    def test_only_changed_agent_is_rebuilt(self):
+        before = self.manager.agents
+        self.rows["magazzino"].system_prompt = "Nuovo prompt"
+        self.assertEqual(self.reload("magazzino"), "updated")
+
+        after = self.manager.agents
+        self.assertIsNot(after, before)  # copy-on-write: il vecchio registry resta intatto
+        self.assertTrue(before["magazzino"].system_prompt.startswith("Prompt magazzino"))
+        self.assertTrue(after["magazzino"].system_prompt.startswith("Nuovo prompt"))
+        self.assertIs(after["vendite"], before["vendite"])
+        self.assertEqual(self.reload("magazzino"), "unchanged")
+
+    def test_clients_reused_and_deactivation_removes(self):
+        client = self.manager.agents["vendite"].client
+        self.rows["vendite"].tool_names = "sql_select,get_schema"
+        self.assertEqual(self.reload("vendite"), "updated")
+        self.assertIs(self.manager.agents["vendite"].client, client)
+
+        self.rows["vendite"].is_active = False
+        self.assertEqual(self.reload("vendite"), "removed")
+        self.assertEqual(list(self.manager.agents), ["magazzino"])
+
+    def test_full_reload_reports_changes(self):
+        self.rows["ordini"] = _row("ordini")
+        del self.rows["vendite"]
+        self.assertEqual(self.manager.reload_agents(), {"ordini": "created", "vendite": "removed"})
+
+    def test_sync_config_reloads_only_when_version_changes(self):
+        self.assertEqual(self.manager.config_version, (2, 100))
+        self.rows["magazzino"].system_prompt = "Modificato da un altro worker"
+        self.assertEqual(self.manager.sync_config(), {})  # versione invariata: nessuna lettura
+
+        self.version = (2, 101)
+        self.assertEqual(self.manager.sync_config(), {"magazzino": "updated"})
+        self.assertEqual(self.manager.config_version, (2, 101))
+
+    def test_description_change_updates_listing_without_rebuild(self):
+        etag, listing = self.manager.agent_listing()
+        self.assertEqual(listing, {"magazzino": "magazzino", "vendite": "vendite"})
+        agent = self.manager.agents["magazzino"]
+
+        self.rows["magazzino"].description = "Giacenze e articoli"
+        self.assertEqual(self.reload("magazzino"), "updated")
+        self.assertIs(self.manager.agents["magazzino"], agent)
+        new_etag, listing = self.manager.agent_listing()
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(listing["magazzino"], "Giacenze e articoli")
+
+    def test_schema_digest_refresh_publishes_new_agent(self):
+        with self.manager._reload_lock:
+            entry = self.manager._entries["magazzino"]
+            self.manager._publish({**self.manager._entries, "magazzino": entry._replace(digest_catalog=object())})
+        before = self.manager.agents
+
+        with mock.patch.object(manager, "get_schema_digest", return_value="dbo.Articoli(Codice nvarchar)"):
+            self.manager.refresh_schema_digests()
+            after = self.manager.agents
+            self.manager.refresh_schema_digests()
+
+        self.assertIsNot(after, before)
+        self.assertNotIn("dbo.Articoli", before["magazzino"].system_prompt)
+        self.assertIn("dbo.Articoli", after["magazzino"].system_prompt)
+        self.assertIs(after["magazzino"].client, before["magazzino"].client)
+        self.assertIs(after["vendite"], before["vendite"])
+        self.assertIs(self.manager.agents, after)  # riepilogo invariato: nessuna ripubblicazione
+
+
+if __name__ == "__main__":
+    unittest.main()
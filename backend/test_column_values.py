@@ -0,0 +1,64 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+
+from app.agents import column_values, schema_catalog
+from app.agents.column_values import ValueDictionary, _sample_column, candidate_columns
+from app.agents.schema_catalog import ColumnInfo, TableInfo
+
+STATI = TableInfo("main", "ordini", "BASE TABLE", (
+    ColumnInfo("stato", "varchar", "YES", 20),
+    ColumnInfo("codice", "varchar", "NO", 20),
+    ColumnInfo("note", "nvarchar", "YES", -1),
+    ColumnInfo("importo", "decimal", "YES", None),
+))
+
+
+class TestColumnValues(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        with cls.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE ordini (stato TEXT, codice TEXT, note TEXT, importo REAL)"))
+            conn.execute(
+                text("INSERT INTO ordini VALUES (:stato, :codice, NULL, 1)"),
+                [{"stato": "EVASO" if i % 4 else "APERTO", "codice": f"C{i}"} for i in range(200)],
+            )
+
+    def test_candidate_columns_skip_long_and_non_text(self):
+        view = STATI._replace(name="v_ordini", table_type="VIEW")
+        self.assertEqual(
+            [(t.name, c) for t, c in candidate_columns([STATI, view])],
+            [("ordini", "stato"), ("ordini", "codice")],
+        )
+
+    def test_sample_counts_and_scaling(self):
+        with self.engine.connect() as conn:
+            values = _sample_column(conn, STATI._replace(schema="main"), "stato", total_rows=400)
+        self.assertFalse(values.high_cardinality)
+        self.assertEqual(values.values, (("EVASO", 300), ("APERTO", 100)))
+
+    def test_high_cardinality(self):
+        with self.engine.connect() as conn:
+            values = _sample_column(conn, STATI, "codice", total_rows=None)
+        self.assertTrue(values.high_cardinality)
+        self.assertEqual(values.values, ())
+
+    def test_snapshot_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(schema_catalog.settings, "schema_snapshot_dir", directory), \
+                mock.patch.object(column_values.engine_registry, "get", return_value=self.engine), \
+                mock.patch.object(ValueDictionary, "catalog") as catalog:
+            catalog.list_tables.return_value = [STATI]
+            ValueDictionary("sqlite://", None).refresh()
+
+            restored = ValueDictionary("sqlite://", None)
+            self.assertTrue(restored.load_snapshot())
+            self.assertEqual(restored.lookup("MAIN.Ordini", "STATO").values[0], ("EVASO", 150))
+            self.assertTrue(restored.lookup("main.ordini", "codice").high_cardinality)
+
+
+if __name__ == "__main__":
+    unittest.main()
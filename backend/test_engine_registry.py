@@ -0,0 +1,81 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import text
+
+from app.agents.engine_registry import EngineRegistry, PoolConfig, merge_pool_configs, set_driver_timeout
+
+
+class TestEngineRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = EngineRegistry(idle_seconds=3600)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.db_a = f"sqlite:///{os.path.join(directory.name, 'a.db')}"
+        self.db_b = f"sqlite:///{os.path.join(directory.name, 'b.db')}"
+
+    def tearDown(self):
+        self.registry.dispose_all()
+
+    def test_same_engine_for_same_uri(self):
+        self.assertIs(self.registry.get(self.db_a), self.registry.get(self.db_a))
+
+    def test_retain_disposes_unreferenced(self):
+        engine_a = self.registry.get(self.db_a)
+        self.registry.get(self.db_b)
+        self.registry.retain({self.db_a: None})
+        self.assertIs(self.registry.get(self.db_a), engine_a)
+        uris = [e["db"] for e in self.registry.stats()["engines"] if e["managed"]]
+        self.assertEqual(uris, [self.db_a])
+        self.assertEqual(self.registry.stats()["disposed_total"], 1)
+
+    def test_changed_pool_config_recreates_engine(self):
+        engine_a = self.registry.get(self.db_a)
+        self.registry.retain({self.db_a: PoolConfig.from_settings()._replace(pool_size=2)})
+        engine = self.registry.get(self.db_a)
+        self.assertIsNot(engine, engine_a)
+        self.assertEqual(engine.pool.size(), 2)
+
+    def test_idle_engines_are_disposed_unless_in_use(self):
+        self.registry.idle_seconds = 0.01
+        with self.registry.get(self.db_a).connect() as conn:
+            conn.execute(text("SELECT 1"))
+            time.sleep(0.02)
+            self.assertEqual(self.registry.dispose_idle(), 0)
+        self.assertEqual(self.registry.dispose_idle(), 1)
+
+    def test_stats_report_pool_counters(self):
+        with self.registry.get(self.db_a).connect():
+            stats = [e for e in self.registry.stats()["engines"] if e["managed"]][0]
+            self.assertEqual(stats["checkedout"], 1)
+            self.assertIn("overflow", stats)
+
+    def test_merge_pool_configs_keeps_default_for_agents_without_override(self):
+        default = PoolConfig.from_settings()
+        small = default._replace(pool_size=1, max_overflow=0)
+        large = default._replace(pool_size=default.pool_size + 10)
+
+        self.assertIsNone(merge_pool_configs([None, None]))
+        self.assertEqual(merge_pool_configs([small]), small)
+        self.assertEqual(merge_pool_configs([small, None]), default)
+        self.assertEqual(
+            merge_pool_configs([large, default._replace(max_overflow=default.max_overflow + 5)]),
+            large._replace(max_overflow=default.max_overflow + 5),
+        )
+
+    def test_set_driver_timeout_restores_previous_value(self):
+        dbapi_connection = SimpleNamespace(timeout=0)
+        conn = mock.Mock()
+        conn.connection.dbapi_connection = dbapi_connection
+        restore = set_driver_timeout(conn, 30)
+        self.assertEqual(dbapi_connection.timeout, 30)
+        restore()
+        self.assertEqual(dbapi_connection.timeout, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
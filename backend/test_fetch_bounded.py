@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.agents import sql_tools
+from app.agents.sql_tools import _fetch_bounded, execute_query
+
+
+class TestFetchBounded(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE numeri (n INTEGER)"))
+            conn.execute(text("INSERT INTO numeri VALUES " + ", ".join(f"({i})" for i in range(20))))
+        self.addCleanup(self.engine.dispose)
+
+    def _fetch(self, query, limit):
+        with self.engine.connect() as conn:
+            return _fetch_bounded(conn.execute(text(query)), limit)
+
+    def test_truncates_and_reports_more_rows(self):
+        rows, has_more = self._fetch("SELECT n FROM numeri ORDER BY n", 5)
+        self.assertEqual([row[0] for row in rows], [0, 1, 2, 3, 4])
+        self.assertTrue(has_more)
+
+    def test_exact_limit_is_not_truncated(self):
+        rows, has_more = self._fetch("SELECT n FROM numeri WHERE n < 5", 5)
+        self.assertEqual(len(rows), 5)
+        self.assertFalse(has_more)
+
+    def test_execute_query_footer_reflects_bounded_fetch(self):
+        with mock.patch.object(sql_tools.engine_registry, "get", return_value=self.engine), \
+                mock.patch.object(sql_tools.settings, "max_query_results", 5), \
+                mock.patch.object(sql_tools.settings, "query_cache_enabled", False):
+            truncated = execute_query("SELECT n FROM numeri ORDER BY n", db_uri="sqlite://")
+            complete = execute_query("SELECT n FROM numeri WHERE n < 3", db_uri="sqlite://")
+
+        self.assertIn("Mostrati i primi 5 risultati", truncated)
+        self.assertIn("(Totale: 3 righe)", complete)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+
+from app.agents import join_graph
+from app.agents.join_graph import JoinGraph, format_join_path
+from app.agents.sql_tools import describe_join_path
+
+HINTS = [
+    {"from": "ordini.righe", "to": "ordini.testata", "on": [["NumeroOrdine", "NumeroOrdine"], ["Anno", "Anno"]]},
+    {"from": "ordini.righe", "to": "magazzino.prodotti", "on": [["CodArticolo", "Codice"]]},
+    {"from": "magazzino.prodotti", "to": "magazzino.famiglie", "on": [["Famiglia", "Codice"]]},
+    {"from": "acquisti.famiglie", "to": "acquisti.fornitori", "on": [["Fornitore", "Codice"]]},
+    {"db": "mssql://altro", "from": "ordini.testata", "to": "clienti.anagrafica", "on": [["Cliente", "Codice"]]},
+]
+
+
+class TestJoinGraph(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "join_hints.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(HINTS, handle)
+
+        for patcher in (
+            mock.patch.object(join_graph.settings, "join_hints_file", path),
+            mock.patch.object(join_graph.engine_registry, "get", return_value=create_engine("sqlite://")),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.graph = JoinGraph("sqlite://")
+        self.assertTrue(self.graph.refresh())
+
+    def test_shortest_path_and_on_clauses(self):
+        path = self.graph.find_path("ordini.testata", "magazzino.famiglie")
+        self.assertEqual(path.tables, ("ordini.testata", "ordini.righe", "magazzino.prodotti", "magazzino.famiglie"))
+        self.assertEqual(
+            format_join_path(path),
+            "FROM ordini.testata AS t1\n"
+            "JOIN ordini.righe AS t2 ON t2.NumeroOrdine = t1.NumeroOrdine AND t2.Anno = t1.Anno\n"
+            "JOIN magazzino.prodotti AS t3 ON t3.Codice = t2.CodArticolo\n"
+            "JOIN magazzino.famiglie AS t4 ON t4.Codice = t3.Famiglia",
+        )
+
+    def test_max_hops_and_other_database_hints(self):
+        self.assertIsNone(self.graph.find_path("ordini.testata", "magazzino.famiglie", max_hops=2))
+        self.assertEqual(self.graph.resolve("anagrafica"), [])
+
+    def test_unqualified_names_pick_shortest_match(self):
+        self.assertEqual(sorted(self.graph.resolve("FAMIGLIE")), ["acquisti.famiglie", "magazzino.famiglie"])
+        text = describe_join_path("[ordini].[righe]", "famiglie", self.graph)
+        self.assertIn("da ordini.righe a magazzino.famiglie (2 join", text)
+        self.assertIn("Nessun percorso", describe_join_path("righe", "fornitori", self.graph))
+
+    def test_refresh_skipped_when_unchanged(self):
+        self.assertFalse(self.graph.refresh(force=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
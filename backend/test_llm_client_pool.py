@@ -0,0 +1,41 @@
+import unittest
+from unittest import mock
+
+from app.config import get_settings
+from app.llm import client_pool
+from app.llm.client_pool import LLMClientPool
+
+
+class TestLLMClientPool(unittest.TestCase):
+    def setUp(self):
+        self.settings = get_settings().model_copy(update={
+            "llm_provider": "anthropic", "faq_provider": None, "anthropic_api_key": "sk-test",
+            "agent_model": "modello-agent", "faq_model": "modello-faq",
+        })
+        self.pool = LLMClientPool()
+
+    def test_one_client_per_key(self):
+        agent = self.pool.get(self.settings, use_case="agent")
+        self.assertIs(self.pool.get(self.settings, use_case="agent"), agent)
+        self.assertIs(self.pool.get(self.settings, use_case="agent", model_override="modello-agent"), agent)
+        self.assertIsNot(self.pool.get(self.settings, use_case="faq"), agent)
+
+        stats = self.pool.stats()
+        self.assertEqual((stats["live_clients"], stats["created"], stats["hits"]), (2, 2, 2))
+        self.assertEqual(stats["clients"][0]["model"], "modello-agent")
+        self.assertEqual(stats["clients"][0]["connections"]["sync"], 0)
+
+    def test_temperature_is_part_of_the_key(self):
+        agent = self.pool.get(self.settings, use_case="agent")
+        warmer = self.settings.model_copy(update={"llm_temperature": 0.9})
+        self.assertIsNot(self.pool.get(warmer, use_case="agent"), agent)
+
+    def test_failed_build_is_not_cached(self):
+        with mock.patch.object(client_pool, "build_llm_client", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.pool.get(self.settings, use_case="agent")
+        self.assertEqual(self.pool.stats()["live_clients"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from app.agents import sql_tools
+from app.agents.sql_tools import QueryResultCache, normalize_sql
+
+DB = "mssql://erp"
+
+
+class TestQueryResultCache(unittest.TestCase):
+    def test_normalized_queries_share_a_key(self):
+        cache = QueryResultCache(ttl_seconds=60, max_entries=10, max_bytes=10_000)
+        cache.put(DB, "SELECT  *\nFROM Clienti -- tutti\n;", "risultato")
+        self.assertEqual(cache.get(DB, "SELECT * FROM Clienti"), "risultato")
+        self.assertEqual(normalize_sql("SELECT 'a  b'  FROM t"), "SELECT 'a  b' FROM t")
+        self.assertIsNone(cache.get("mssql://altro", "SELECT * FROM Clienti"))
+
+    def test_entries_expire_after_ttl(self):
+        cache = QueryResultCache(ttl_seconds=60, max_entries=10, max_bytes=10_000)
+        with mock.patch.object(sql_tools.time, "monotonic", return_value=1000.0):
+            cache.put(DB, "SELECT 1", "uno")
+        with mock.patch.object(sql_tools.time, "monotonic", return_value=1059.0):
+            self.assertEqual(cache.get(DB, "SELECT 1"), "uno")
+        with mock.patch.object(sql_tools.time, "monotonic", return_value=1060.0):
+            self.assertIsNone(cache.get(DB, "SELECT 1"))
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_least_recently_used_entry_is_evicted_first(self):
+        cache = QueryResultCache(ttl_seconds=60, max_entries=2, max_bytes=10_000)
+        cache.put(DB, "SELECT 1", "uno")
+        cache.put(DB, "SELECT 2", "due")
+        cache.get(DB, "SELECT 1")
+        cache.put(DB, "SELECT 3", "tre")
+
+        self.assertEqual(cache.get(DB, "SELECT 1"), "uno")
+        self.assertIsNone(cache.get(DB, "SELECT 2"))
+        self.assertEqual(cache.get(DB, "SELECT 3"), "tre")
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_bound(self):
+        cache = QueryResultCache(ttl_seconds=60, max_entries=10, max_bytes=10)
+        cache.put(DB, "SELECT 1", "aaaa")
+        cache.put(DB, "SELECT 2", "bbbb")
+        cache.put(DB, "SELECT 3", "cccc")
+        self.assertIsNone(cache.get(DB, "SELECT 1"))
+        self.assertEqual(cache.stats()["bytes"], 8)
+
+        # Un risultato più grande dell'intera cache non viene salvato
+        cache.put(DB, "SELECT 4", "x" * 11)
+        self.assertIsNone(cache.get(DB, "SELECT 4"))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+        # La dimensione è in byte UTF-8, non in caratteri
+        cache.put(DB, "SELECT 5", "àààà")
+        self.assertEqual(cache.stats()["bytes"], 8)
+        self.assertEqual(cache.get(DB, "SELECT 5"), "àààà")
+
+    def test_cost_threshold_is_part_of_the_key(self):
+        cache = QueryResultCache(ttl_seconds=60, max_entries=10, max_bytes=10_000)
+        cache.put(DB, "SELECT * FROM Movimenti", "righe")
+        self.assertIsNone(cache.get(DB, "SELECT * FROM Movimenti", max_cost=50))
+        self.assertEqual(cache.get(DB, "SELECT * FROM Movimenti", max_cost=0), "righe")
+
+        cache.put(DB, "SELECT * FROM Movimenti", "righe (limite 50)", max_cost=50)
+        self.assertEqual(cache.get(DB, "SELECT * FROM Movimenti", max_cost=50), "righe (limite 50)")
+        self.assertIsNone(cache.get(DB, "SELECT * FROM Movimenti", max_cost=500))
+        self.assertEqual(cache.invalidate(DB), 2)
+
+    def test_invalidate_by_database(self):
+        cache = QueryResultCache(ttl_seconds=60, max_entries=10, max_bytes=10_000)
+        cache.put(DB, "SELECT 1", "uno")
+        cache.put("mssql://altro", "SELECT 1", "uno")
+        self.assertEqual(cache.invalidate(DB), 1)
+        self.assertIsNone(cache.get(DB, "SELECT 1"))
+        self.assertEqual(cache.invalidate(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+
+from app.agents import query_export, sql_tools
+from app.agents.engine_registry import engine_registry
+from app.agents.query_export import (
+    ExportError,
+    export_query,
+    record_query,
+    start_recording,
+)
+
+
+class TestRecordQuery(unittest.TestCase):
+    def test_records_only_valid_unique_queries(self):
+        queries = start_recording()
+        record_query("sql_select", "SELECT 1")
+        record_query("sql_select", "  SELECT 1  ")
+        record_query("sql_select", "DELETE FROM t")
+        self.assertEqual([(q.tool_name, q.query) for q in queries], [("sql_select", "SELECT 1")])
+
+
+class TestExportQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.db_uri = f"sqlite:///{os.path.join(cls.directory.name, 'export.db')}"
+        engine = create_engine(cls.db_uri)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE righe (n INTEGER, nome TEXT)"))
+            conn.execute(
+                text("INSERT INTO righe VALUES (:n, :nome)"),
+                [{"n": i, "nome": None if i % 10 == 0 else f"riga {i}"} for i in range(12_345)],
+            )
+        engine.dispose()
+
+    @classmethod
+    def tearDownClass(cls):
+        engine_registry.dispose_all()
+        cls.directory.cleanup()
+
+    def test_csv_contains_all_rows_in_chunks(self):
+        chunks = list(export_query("SELECT n, nome FROM righe ORDER BY n", self.db_uri, "csv"))
+        self.assertGreater(len(chunks), 1)
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+        self.assertEqual(rows[0], ["n", "nome"])
+        self.assertEqual(len(rows), 12_346)
+        self.assertEqual(rows[11], ["10", ""])
+
+    def test_query_is_validated_again(self):
+        with self.assertRaises(ExportError):
+            export_query("DELETE FROM righe", self.db_uri, "csv")
+
+    def test_unknown_format(self):
+        with self.assertRaises(ExportError):
+            export_query("SELECT n FROM righe", self.db_uri, "xlsx")
+
+    def test_on_close_runs_once_the_stream_ends(self):
+        on_close = mock.Mock()
+        chunks = export_query("SELECT n FROM righe WHERE n < 3", self.db_uri, "csv", on_close=on_close)
+        on_close.assert_not_called()
+        list(chunks)
+        on_close.assert_called_once()
+
+        on_close.reset_mock()
+        chunks = export_query("SELECT n FROM righe", self.db_uri, "csv", on_close=on_close)
+        next(chunks)
+        chunks.close()
+        on_close.assert_called_once()
+
+        on_close.reset_mock()
+        with self.assertRaises(ExportError):
+            export_query("DELETE FROM righe", self.db_uri, "csv", on_close=on_close)
+        on_close.assert_called_once()
+
+    def test_expensive_query_is_rejected(self):
+        with mock.patch.object(query_export, "check_query_cost", return_value="ERRORE: troppo costosa") as check:
+            with self.assertRaisesRegex(ExportError, "troppo costosa"):
+                export_query("SELECT n FROM righe", self.db_uri, "csv", max_cost=10.0)
+        self.assertEqual(check.call_args[0][1:], ("SELECT n FROM righe", self.db_uri, 10.0))
+
+    def test_runs_on_guarded_connection_with_export_timeout(self):
+        restore = mock.Mock()
+        with mock.patch.object(sql_tools, "set_driver_timeout", return_value=restore) as set_timeout:
+            list(export_query("SELECT n FROM righe WHERE n < 3", self.db_uri, "csv"))
+        self.assertEqual(set_timeout.call_args[0][1], query_export.settings.export_timeout_seconds)
+        restore.assert_called_once()
+
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow è opzionale
+    pa = None
+
+
+@unittest.skipIf(pa is None, "pyarrow non installato")
+class TestParquetSchema(unittest.TestCase):
+    # cursor.description come lo riporta pyodbc: (nome, tipo, display, size, precisione, scala, nullable)
+    DESCRIPTION = (
+        ("n", int, None, 10, 10, 0, True),
+        ("importo", Decimal, None, 19, 19, 4, True),
+        ("data", datetime, None, 23, 23, 3, True),
+    )
+
+    def test_types_come_from_cursor_description(self):
+        chunks = (chunk for chunk in [[(None, None, None)], [(1, Decimal("2.5000"), datetime(2024, 1, 1))]])
+        data = b"".join(query_export._parquet_chunks(["n", "importo", "data"], self.DESCRIPTION, chunks, pa, pq))
+        table = pq.read_table(io.BytesIO(data))
+        self.assertEqual(
+            [field.type for field in table.schema],
+            [pa.int64(), pa.decimal128(19, 4), pa.timestamp("us")],
+        )
+        self.assertEqual(table.column("n").to_pylist(), [None, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest import mock
+
+from app.agents import query_guard
+from app.agents.query_guard import (
+    PlanEstimate,
+    QueryPlanCache,
+    check_query_cost,
+    fetch_plan,
+    parse_showplan,
+    query_shape,
+)
+
+SHOWPLAN = """<?xml version="1.0" encoding="utf-16"?>
+<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan" Version="1.5">
+  <BatchSequence><Batch><Statements>
+    <StmtSimple StatementText="SELECT ..." StatementType="SELECT"
+                StatementSubTreeCost="1843.27" StatementEstRows="125000000">
+      <QueryPlan>
+        <Warnings><NoJoinPredicate /></Warnings>
+        <RelOp PhysicalOp="Nested Loops" LogicalOp="Inner Join" EstimateRows="125000000">
+          <NestedLoops>
+            <RelOp PhysicalOp="Clustered Index Scan" LogicalOp="Clustered Index Scan" EstimateRows="250000">
+              <IndexScan><Object Database="[erp]" Schema="[dwarehe]" Table="[Movimenti]" /></IndexScan>
+            </RelOp>
+            <RelOp PhysicalOp="Table Scan" LogicalOp="Table Scan" EstimateRows="500">
+              <TableScan><Object Database="[erp]" Schema="[dbo]" Table="[Clienti]" /></TableScan>
+            </RelOp>
+          </NestedLoops>
+        </RelOp>
+      </QueryPlan>
+    </StmtSimple>
+  </Statements></Batch></BatchSequence>
+</ShowPlanXML>"""
+
+
+class TestQueryGuard(unittest.TestCase):
+    def test_parse_showplan(self):
+        estimate = parse_showplan(SHOWPLAN)
+        self.assertAlmostEqual(estimate.cost, 1843.27)
+        self.assertEqual(estimate.rows, 125000000)
+        self.assertTrue(estimate.missing_join_predicate)
+        self.assertEqual(estimate.scans[0], ("[dwarehe].[Movimenti]", 250000))
+
+    def test_parse_showplan_without_statement(self):
+        with self.assertRaises(ValueError):
+            parse_showplan('<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan"/>')
+
+    def test_query_shape_ignores_literals_and_layout(self):
+        a = query_shape("SELECT * FROM t WHERE Cliente = 'C001' AND Anno = 2024")
+        b = query_shape("select *  from t -- filtro\nwhere Cliente = N'C999' and Anno = 2023")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, query_shape("SELECT * FROM t WHERE Cliente = 'C001'"))
+
+    def test_query_shape_keeps_row_counts(self):
+        self.assertNotEqual(query_shape("SELECT TOP 10 * FROM t"), query_shape("SELECT TOP 1000000 * FROM t"))
+        self.assertNotEqual(query_shape("SELECT TOP (10) * FROM t"), query_shape("SELECT TOP (5000) * FROM t"))
+        self.assertNotEqual(
+            query_shape("SELECT * FROM t ORDER BY 1 OFFSET 0 ROWS FETCH NEXT 10 ROWS ONLY"),
+            query_shape("SELECT * FROM t ORDER BY 1 OFFSET 0 ROWS FETCH NEXT 900000 ROWS ONLY"),
+        )
+        self.assertEqual(
+            query_shape("SELECT TOP 10 * FROM t WHERE Anno = 2024"),
+            query_shape("SELECT TOP 10 * FROM t WHERE Anno = 2023"),
+        )
+
+    def test_plan_cache_lru(self):
+        cache = QueryPlanCache(ttl_seconds=60, max_entries=1)
+        estimate = PlanEstimate(1.0, 1.0, False, ())
+        cache.put(None, "a", estimate)
+        cache.put(None, "b", estimate)
+        self.assertIsNone(cache.get(None, "a"))
+        self.assertEqual(cache.get(None, "b"), estimate)
+
+    def test_failed_plan_invalidates_connection(self):
+        conn = mock.Mock()
+        conn.exec_driver_sql.side_effect = [None, RuntimeError("timeout"), RuntimeError("link down")]
+        with self.assertRaises(RuntimeError):
+            fetch_plan(conn, "SELECT 1")
+        conn.invalidate.assert_called_once()
+
+    def test_plan_is_fetched_on_its_own_connection(self):
+        engine = mock.MagicMock()
+        engine.dialect.name = "mssql"
+        plan_conn = engine.connect.return_value.__enter__.return_value
+        plan_conn.exec_driver_sql.return_value.scalar.return_value = SHOWPLAN
+
+        with mock.patch.object(query_guard, "plan_cache", QueryPlanCache(ttl_seconds=60, max_entries=10)):
+            rejection = check_query_cost(engine, "SELECT * FROM a, b", "mssql://erp", max_cost=100)
+            self.assertIn("costo stimato 1843.3", rejection)
+            # Piano in cache: nessuna nuova connessione
+            check_query_cost(engine, "SELECT * FROM a, b", "mssql://erp", max_cost=5000)
+        engine.connect.assert_called_once()
+
+    def test_plan_failure_does_not_block_the_query(self):
+        engine = mock.MagicMock()
+        engine.dialect.name = "mssql"
+        engine.connect.return_value.__enter__.return_value.exec_driver_sql.side_effect = RuntimeError("boom")
+        with mock.patch.object(query_guard, "plan_cache", QueryPlanCache(ttl_seconds=60, max_entries=10)):
+            self.assertIsNone(check_query_cost(engine, "SELECT 1", "mssql://erp", max_cost=100))
+        engine.connect.return_value.__enter__.return_value.invalidate.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
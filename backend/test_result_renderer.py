@@ -0,0 +1,71 @@
+import unittest
+
+from app.agents.result_renderer import fit_rows, render_results
+from app.agents.sql_tools import format_results
+
+
+class TestResultRenderer(unittest.TestCase):
+    def test_empty_result(self):
+        self.assertEqual(render_results(["a"], []), "Nessun risultato trovato.")
+
+    def test_auto_picks_shortest_format(self):
+        output = render_results(["id", "nome"], [(1, "Mario"), (2, None)])
+        self.assertTrue(output.startswith("id\tnome\n1\tMario\n2\tNULL"))
+        self.assertIn("(Totale: 2 righe)", output)
+
+    def test_long_cells_are_truncated_and_reported(self):
+        output = render_results(["note"], [("x" * 50,), ("y",)], max_cell_chars=10, output_format="tsv")
+        self.assertIn("x" * 9 + "…", output)
+        self.assertIn("1 celle troncate a 10 caratteri", output)
+
+    def test_constant_columns_are_pruned_over_budget(self):
+        rows = [(i, "EUR") for i in range(20)]
+        output = render_results(["id", "divisa"], rows, budget_chars=60, output_format="tsv")
+        self.assertTrue(output.startswith("id\n0\n1"))
+        self.assertIn("divisa=EUR", output)
+
+    def test_rows_are_elided_over_budget(self):
+        rows = [(f"riga {i}", i) for i in range(100)]
+        output = render_results(["testo", "n"], rows, budget_chars=100, output_format="csv")
+        self.assertIn("righe omesse per limite di output (100 caratteri)", output)
+        self.assertLessEqual(len(output.split("\n\n")[0]), 100)
+
+    def test_footer_counts_rows_left_after_elision(self):
+        rows = [(f"riga {i}", i) for i in range(10)]
+        output = render_results(["testo", "n"], rows, max_rows=10, has_more=True, budget_chars=60, output_format="csv")
+        kept = output.split("\n\n")[0].count("\n")
+        self.assertIn(f"mostrate {kept} di 10", output)
+        self.assertIn(f"(Mostrati i primi {kept} risultati", output)
+
+        output = render_results(["n"], [(i,) for i in range(50)], budget_chars=20, footer=lambda shown: f"[{shown}]")
+        kept = output.split("\n\n")[0].count("\n")
+        self.assertLess(kept, 50)
+        self.assertTrue(output.endswith(f"[{kept}]"))
+
+    def test_fit_rows_matches_rendered_rows(self):
+        rows = [(f"riga {i}", i) for i in range(30)]
+        shown = fit_rows(["testo", "n"], rows, budget_chars=100, output_format="csv")
+        output = render_results(["testo", "n"], rows, budget_chars=100, output_format="csv")
+        self.assertEqual(output.split("\n\n")[0].count("\n"), shown)
+        self.assertLess(shown, 30)
+        self.assertEqual(fit_rows(["testo", "n"], rows[:shown], budget_chars=100, output_format="csv"), shown)
+        self.assertEqual(fit_rows(["n"], []), 0)
+
+    def test_csv_quotes_separators(self):
+        output = render_results(["a"], [('x,"y"',)], output_format="csv")
+        self.assertTrue(output.startswith('a\n"x,""y"""'))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            render_results(["a"], [(1,)], output_format="xml")
+
+    def test_format_results_keeps_aligned_table(self):
+        output = format_results(["Colonna", "Nullable"], [("Id", "NO"), ("Note", None)])
+        self.assertEqual(
+            output,
+            "Colonna | Nullable\n------------------\nId      | NO      \nNote    | None    \n\n(Totale: 2 righe)",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import re
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.agents import sql_tools
+from app.agents.result_store import ResultStore, fit_page
+
+
+def _fetcher(rows):
+    remaining = list(rows)
+
+    def fetch(size):
+        chunk = remaining[:size]
+        del remaining[:size]
+        return chunk
+
+    return fetch
+
+
+class TestResultStore(unittest.TestCase):
+    def make_store(self, **overrides):
+        options = dict(ttl_seconds=60, max_rows=1000, memory_bytes=1 << 20, max_handles=10)
+        options.update(overrides)
+        return ResultStore(**options)
+
+    def test_pages_after_first_are_served(self):
+        store = self.make_store()
+        rows = [(i, f"r{i}") for i in range(25)]
+        # Prima pagina (0-9) già mostrata; la riga 10 è già stata letta dal chiamante
+        handle, stored = store.capture(None, ["n", "s"], rows[10:11], _fetcher(rows[11:]), 10, 10)
+        self.assertTrue(stored.complete)
+        self.assertEqual(stored.page_count, 3)
+
+        page = store.get_page(handle, 3, None)
+        self.assertEqual(page.rows, rows[20:])
+        self.assertEqual((page.first_row, page.total_rows), (21, 25))
+        with self.assertRaises(IndexError):
+            store.get_page(handle, 4, None)
+
+    def test_row_limit_marks_incomplete(self):
+        store = self.make_store(max_rows=15)
+        rows = [(i,) for i in range(100)]
+        handle, stored = store.capture(None, ["n"], [], _fetcher(rows), 10, 10)
+        self.assertFalse(stored.complete)
+        self.assertEqual(stored.stored_rows, 15)
+        self.assertEqual(store.get_page(handle, 3, None).rows, rows[10:15])
+
+    def test_handle_is_scoped_to_database(self):
+        store = self.make_store()
+        handle, _ = store.capture("db-a", ["n"], [(1,)], _fetcher([]), 10, 10)
+        self.assertIsNone(store.get_page(handle, 2, "db-b"))
+        self.assertIsNotNone(store.get_page(handle, 2, "db-a"))
+
+    def test_spills_to_disk_over_memory_budget(self):
+        store = self.make_store(memory_bytes=200)
+        rows = [(i, "x" * 50) for i in range(40)]
+        handle, stored = store.capture(None, ["n", "s"], [], _fetcher(rows), 10, 10)
+        self.assertTrue(stored.on_disk)
+        self.assertEqual(store.stats()["memory_bytes"], 0)
+        self.assertEqual(store.get_page(handle, 5, None).rows, rows[30:])
+
+    def test_ttl_and_lru_eviction(self):
+        store = self.make_store(ttl_seconds=0.05, max_handles=2)
+        first, _ = store.capture(None, ["n"], [(1,)], _fetcher([]), 10, 10)
+        store.capture(None, ["n"], [(2,)], _fetcher([]), 10, 10)
+        store.capture(None, ["n"], [(3,)], _fetcher([]), 10, 10)
+        self.assertIsNone(store.get_page(first, 2, None))
+        self.assertEqual(store.stats()["evicted"], 1)
+
+        time.sleep(0.1)
+        self.assertEqual(store.stats()["handles"], 2)
+        store.capture(None, ["n"], [(4,)], _fetcher([]), 10, 10)
+        self.assertEqual(store.stats()["handles"], 1)
+        self.assertEqual(store.stats()["expired"], 2)
+
+    def test_colliding_handle_is_regenerated(self):
+        store = self.make_store()
+        with mock.patch("app.agents.result_store.secrets.token_hex", side_effect=["aaaa", "aaaa", "bbbb"]):
+            first, _ = store.capture(None, ["n"], [(1,)], _fetcher([]), 10, 10)
+            second, _ = store.capture(None, ["n"], [(2,)], _fetcher([]), 10, 10)
+        self.assertEqual((first, second), ("aaaa", "bbbb"))
+        self.assertEqual(store.get_page(first, 2, None).rows, [(1,)])
+        self.assertEqual(store.get_page(second, 2, None).rows, [(2,)])
+        self.assertEqual(store.stats()["handles"], 2)
+
+    def test_rows_that_do_not_fit_move_to_next_page(self):
+        store = self.make_store()
+        rows = [(i,) for i in range(10)]
+        # Al massimo 3 righe per pagina entrano nel budget
+        handle, stored = store.capture(None, ["n"], [], _fetcher(rows), 5, 5, fit=lambda page: min(len(page), 3))
+        self.assertEqual(stored.page_count, 5)
+        pages = [store.get_page(handle, page, None) for page in range(2, 6)]
+        self.assertEqual([row for page in pages for row in page.rows], rows)
+        self.assertEqual([page.first_row for page in pages], [6, 9, 12, 15])
+
+    def test_fit_page_shrinks_until_all_rows_fit(self):
+        # Il numero di righe che entrano dipende dalla pagina stessa (es. colonne costanti)
+        shown = {8: 5, 5: 4}
+        self.assertEqual(fit_page(list(range(8)), lambda page: shown.get(len(page), len(page))), (list(range(4)), [4, 5, 6, 7]))
+        self.assertEqual(fit_page([1, 2], lambda page: 1), ([1], [2]))
+
+
+class TestPagedSelect(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE righe (n INTEGER, testo TEXT)"))
+            conn.execute(text("INSERT INTO righe VALUES (:n, :testo)"), [
+                {"n": i, "testo": f"descrizione riga {i}"} for i in range(60)
+            ])
+        self.addCleanup(engine.dispose)
+
+        store = ResultStore(ttl_seconds=60, max_rows=1000, memory_bytes=1 << 20, max_handles=10)
+        for patcher in (
+            mock.patch.object(sql_tools.engine_registry, "get", return_value=engine),
+            mock.patch.object(sql_tools, "result_store", store),
+            mock.patch.object(sql_tools.settings, "max_query_results", 20),
+            mock.patch.object(sql_tools.settings, "tool_output_budget_chars", 150),
+            mock.patch.object(sql_tools.settings, "tool_output_format", "csv"),
+            mock.patch.object(sql_tools.settings, "query_cache_enabled", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_every_row_is_shown_on_some_page(self):
+        output = sql_tools.execute_query("SELECT n, testo FROM righe ORDER BY n", "sqlite://", paging=True)
+        self.assertNotIn("omesse", output)
+        handle = re.search(r'handle="(\w+)"', output).group(1)
+        page_count = int(re.search(r"pagine disponibili: 2-(\d+)", output).group(1))
+
+        shown = re.findall(r"^(\d+),", output, re.MULTILINE)
+        for page in range(2, page_count + 1):
+            text_page = sql_tools.read_result_page(handle, page, "sqlite://")
+            self.assertNotIn("omesse", text_page)
+            shown += re.findall(r"^(\d+),", text_page, re.MULTILINE)
+        self.assertEqual(list(map(int, shown)), list(range(60)))
+
+
+if __name__ == "__main__":
+    unittest.main()
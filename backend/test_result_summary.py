@@ -0,0 +1,53 @@
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from app.agents.result_summary import ResultSummary, summarize_rows
+
+
+class TestResultSummary(unittest.TestCase):
+    def test_numeric_statistics_over_all_chunks(self):
+        chunks = [[(i,) for i in range(1, 51)], [(i,) for i in range(51, 101)]]
+        text = summarize_rows(["n"], chunks)
+        self.assertIn("Righe analizzate: 100 (tutte le righe)", text)
+        self.assertIn("n | 100 | 0 | 5,050 | 50.50 | 1 |", text)
+
+    def test_text_top_k(self):
+        rows = [("A",)] * 3 + [("B",)] * 2 + [(None,)]
+        text = summarize_rows(["c"], [rows], top_k=1)
+        self.assertIn("c: 2 distinti, 1 NULL; A 3 (60.0%)", text)
+        self.assertNotIn("B 2", text)
+
+    def test_monthly_trend_with_delta(self):
+        rows = [
+            (date(2024, 1, 10), Decimal("100")),
+            (date(2024, 1, 20), Decimal("100")),
+            (date(2024, 2, 5), Decimal("300")),
+        ]
+        text = summarize_rows(["data", "importo"], [rows])
+        self.assertIn("2024-01 | 2 | 200 | -", text)
+        self.assertIn("2024-02 | 1 | 300 | +50.0%", text)
+
+    def test_leading_null_chunk_keeps_rows_aligned(self):
+        summary = ResultSummary(["data", "v"])
+        summary.add_rows([(None, None)])
+        summary.add_rows([(date(2024, 3, 1), 7)])
+        text = summary.render()
+        self.assertIn("2024-03 | 1 | 7 | -", text)
+
+    def test_mixed_column_falls_back_to_text_summary(self):
+        summary = ResultSummary(["codice", "v"])
+        summary.add_rows([(1, 2), (1, 3)])
+        summary.add_rows([("A12", 4), (object(), 5)])
+        text = summary.render(top_k=1)
+        self.assertIn("codice: 3 distinti, 0 NULL; 1 2 (50.0%)", text)
+        self.assertIn("v | 4 | 0 | 14 |", text)
+        self.assertNotIn("codice |", text)
+
+    def test_empty_and_truncated(self):
+        self.assertEqual(summarize_rows(["x"], []), "Nessun risultato trovato.")
+        self.assertIn("PARZIALI", summarize_rows(["x"], [[(1,)]], truncated=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.agents import schema_catalog
+from app.agents.schema_catalog import ColumnInfo, SchemaCatalog, TableInfo
+
+# Righe come le restituisce la query bulk (TABLES LEFT JOIN COLUMNS)
+BULK_ROWS = [
+    ("dbo", "Clienti", "BASE TABLE", "Id", "int", "NO", None, 1),
+    ("dbo", "Clienti", "BASE TABLE", "Nome", "nvarchar", "YES", 100, 2),
+    ("dbo", "Vuota", "BASE TABLE", None, None, None, None, None),
+    ("vendite", "Clienti", "VIEW", "Totale", "decimal", "YES", None, 1),
+]
+
+
+class TestSchemaCatalogLoad(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE bulk (s TEXT, t TEXT, tt TEXT, c TEXT, dt TEXT, n TEXT, ml INTEGER, pos INTEGER)"
+            ))
+            conn.execute(text("INSERT INTO bulk VALUES (:s, :t, :tt, :c, :dt, :n, :ml, :pos)"), [
+                dict(zip(("s", "t", "tt", "c", "dt", "n", "ml", "pos"), row)) for row in BULK_ROWS
+            ])
+        self.addCleanup(engine.dispose)
+
+        bulk_query = ("SELECT s, t, tt, c, dt, n, ml FROM bulk ORDER BY s, t, pos", {})
+        for patcher in (
+            mock.patch.object(schema_catalog.engine_registry, "get", return_value=engine),
+            mock.patch.object(schema_catalog.settings, "schema_snapshot_dir", ""),
+            mock.patch.object(SchemaCatalog, "_bulk_query", return_value=bulk_query),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.catalog = SchemaCatalog("sqlite://", None)
+        self.catalog.load()
+
+    def test_rows_are_grouped_per_table_in_order(self):
+        self.assertEqual(self.catalog.list_tables(), [
+            TableInfo("dbo", "Clienti", "BASE TABLE", (
+                ColumnInfo("Id", "int", "NO", None),
+                ColumnInfo("Nome", "nvarchar", "YES", 100),
+            )),
+            TableInfo("dbo", "Vuota", "BASE TABLE", ()),
+            TableInfo("vendite", "Clienti", "VIEW", (ColumnInfo("Totale", "decimal", "YES", None),)),
+        ])
+        stats = self.catalog.stats()
+        self.assertEqual((stats["source"], stats["last_error"]), ("database", None))
+
+    def test_lookup_by_name_and_full_name(self):
+        self.assertEqual(len(self.catalog.find_tables("CLIENTI")), 2)
+        self.assertEqual(self.catalog.find_tables("[vendite].[clienti]")[0].table_type, "VIEW")
+        self.assertEqual(self.catalog.find_tables("Inesistente"), [])
+
+    def test_load_sets_driver_timeout(self):
+        restore = mock.Mock()
+        with mock.patch.object(schema_catalog, "set_driver_timeout", return_value=restore) as set_timeout:
+            self.catalog.load()
+        self.assertEqual(set_timeout.call_args[0][1], schema_catalog.settings.query_timeout_seconds)
+        restore.assert_called_once()
+
+    def test_failed_reload_keeps_previous_snapshot(self):
+        with mock.patch.object(SchemaCatalog, "_bulk_query", return_value=("SELECT * FROM manca", {})):
+            with self.assertRaises(Exception):
+                self.catalog.load()
+        self.assertEqual(len(self.catalog.list_tables()), 3)
+        self.assertIsNotNone(self.catalog.last_error)
+
+
+if __name__ == "__main__":
+    unittest.main()
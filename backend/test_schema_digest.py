@@ -0,0 +1,58 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from app.admin import routes as admin_routes
+from app.agents.schema_catalog import ColumnInfo, TableInfo
+from app.agents.schema_digest import build_schema_digest, get_schema_digest
+
+ARTICOLI = TableInfo("magazzino", "Articoli", "BASE TABLE", (
+    ColumnInfo("Codice", "varchar", "NO", 20),
+    ColumnInfo("Prezzo", "numeric", "YES", None),
+))
+GIACENZE = TableInfo("magazzino", "v_Giacenze", "VIEW", (
+    ColumnInfo("Codice", "varchar", "NO", 20),
+    ColumnInfo("Aggiornato", "datetime2", "YES", None),
+))
+
+
+class TestSchemaDigest(unittest.TestCase):
+    def test_lines_and_short_types(self):
+        self.assertEqual(
+            build_schema_digest([ARTICOLI, GIACENZE], 1000),
+            "magazzino.Articoli(Codice varchar, Prezzo decimal)\n"
+            "magazzino.v_Giacenze [vista](Codice varchar, Aggiornato datetime)",
+        )
+
+    def test_budget_counts_tables_left_out(self):
+        digest = build_schema_digest([ARTICOLI, GIACENZE], 60)
+        self.assertEqual(digest.splitlines()[1], "... altre 1 tabelle/viste non elencate: usa get_schema")
+
+    def test_rebuilt_only_when_catalog_reloaded(self):
+        catalog = mock.Mock(db_uri="sqlite://", schema_name="magazzino", fingerprint="1:x",
+                            loaded_at=datetime(2026, 1, 1), is_loaded=True)
+        catalog.list_tables.return_value = [ARTICOLI]
+        first = get_schema_digest(catalog, 1000)
+        catalog.list_tables.return_value = [ARTICOLI, GIACENZE]
+        self.assertEqual(get_schema_digest(catalog, 1000), first)
+
+        catalog.loaded_at = datetime(2026, 1, 2)
+        self.assertIn("v_Giacenze", get_schema_digest(catalog, 1000))
+        self.assertIsNone(get_schema_digest(catalog, 0))
+
+    def test_admin_refresh_updates_agent_digests(self):
+        db = mock.MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = SimpleNamespace(
+            name="magazzino", db_uri="sqlite://", schema_name="magazzino",
+        )
+        catalog = mock.MagicMock()
+        with mock.patch.object(admin_routes, "get_schema_catalog", return_value=catalog), \
+                mock.patch.object(admin_routes, "get_agent_manager") as get_manager:
+            admin_routes.refresh_agent_schema_catalog(1, user_id=1, db=db)
+        catalog.load.assert_called_once_with()
+        get_manager.return_value.refresh_schema_digests.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
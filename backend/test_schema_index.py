@@ -0,0 +1,42 @@
+import unittest
+
+from app.agents.schema_index import FuzzyNameIndex, NameEntry, levenshtein, similarity
+
+
+class TestSchemaIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = FuzzyNameIndex([
+            NameEntry("table", "vendite.Movimenti", "Movimenti"),
+            NameEntry("table", "magazzino.Prodotti", "Prodotti"),
+            NameEntry("table", "ordini.Testata", "Testata"),
+            NameEntry("column", "vendite.Movimenti.CodiceCliente (nvarchar)", "CodiceCliente"),
+            NameEntry("column", "vendite.Movimenti.Importo (decimal)", "Importo"),
+            NameEntry("column", "magazzino.Prodotti.CodiceArticolo (nvarchar)", "CodiceArticolo"),
+        ])
+
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein("kitten", "sitting"), 3)
+        self.assertEqual(levenshtein("", "abc"), 3)
+        self.assertEqual(levenshtein("same", "same"), 0)
+
+    def test_exact_match_scores_one(self):
+        self.assertEqual(similarity("Movimenti", "movimenti"), 1.0)
+
+    def test_typo_finds_table(self):
+        results = self.index.search("Movimento", kind="table")
+        self.assertEqual(results[0][0].label, "vendite.Movimenti")
+
+    def test_plural_guess_finds_column(self):
+        results = self.index.search("Clienti", kind="column")
+        self.assertEqual(results[0][0].label, "vendite.Movimenti.CodiceCliente (nvarchar)")
+
+    def test_kind_filter(self):
+        results = self.index.search("Prodotto", kind="column")
+        self.assertTrue(all(entry.kind == "column" for entry, _ in results))
+
+    def test_unrelated_name_has_no_suggestions(self):
+        self.assertEqual(self.index.search("xyz", kind="table"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
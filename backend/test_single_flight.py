@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+from app.agents.tool_executor import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started = []
+
+        async def work():
+            started.append(1)
+            await asyncio.sleep(0.05)
+            return "risultato"
+
+        async def main():
+            return await asyncio.gather(*(flight.run("k", work) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(main()), ["risultato"] * 5)
+        self.assertEqual(len(started), 1)
+        self.assertEqual(flight.stats(), {"in_flight": 0, "started": 1, "joined": 4, "abandoned": 0})
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        async def main():
+            first = asyncio.ensure_future(flight.run("k", work))
+            second = asyncio.ensure_future(flight.run("k", work))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(main()), "ok")
+
+    def test_work_is_abandoned_when_all_callers_are_cancelled(self):
+        flight = SingleFlight()
+        abandoned = []
+
+        async def work():
+            await asyncio.sleep(1)
+            return "mai"
+
+        async def main():
+            callers = [
+                asyncio.ensure_future(flight.run("k", work, on_abandon=lambda: abandoned.append(1)))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.01)
+            callers[0].cancel()
+            await asyncio.sleep(0.01)
+            self.assertEqual(abandoned, [])
+            callers[1].cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+
+        asyncio.run(main())
+        self.assertEqual(abandoned, [1])
+        self.assertEqual(flight.stats()["abandoned"], 1)
+
+    def test_errors_are_shared_and_key_is_released(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        async def ok():
+            return "di nuovo"
+
+        async def main():
+            results = await asyncio.gather(flight.run("k", fail), flight.run("k", fail), return_exceptions=True)
+            return results, await flight.run("k", ok)
+
+        results, again = asyncio.run(main())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(again, "di nuovo")
+
+
+if __name__ == "__main__":
+    unittest.main()
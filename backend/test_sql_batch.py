@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.agents import sql_tools
+from app.agents.sql_tools import execute_query_batch
+
+
+class TestExecuteQueryBatch(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE numeri (n INTEGER)"))
+            conn.execute(text("INSERT INTO numeri VALUES (1), (2), (3)"))
+        self.addCleanup(engine.dispose)
+
+        for patcher in (
+            mock.patch.object(sql_tools.engine_registry, "get", return_value=engine),
+            mock.patch.object(sql_tools.settings, "query_cache_enabled", False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _run(self, queries):
+        return asyncio.run(execute_query_batch(queries, db_uri="sqlite://"))
+
+    def test_failures_stay_in_place(self):
+        output = self._run([
+            "SELECT COUNT(*) AS totale FROM numeri",
+            "DELETE FROM numeri",
+            "SELECT n FROM tabella_inesistente",
+            "SELECT MAX(n) AS massimo FROM numeri",
+        ])
+        sections = output.split("### Query ")[1:]
+        self.assertEqual(len(sections), 4)
+        self.assertTrue(sections[0].startswith("1 di 4"))
+        self.assertIn("totale\n3", sections[0])
+        self.assertIn("ERRORE", sections[1])
+        self.assertIn("ERRORE", sections[2])
+        self.assertIn("massimo\n3", sections[3])
+
+        with sql_tools.engine_registry.get().connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT COUNT(*) FROM numeri")).scalar(), 3)
+
+    def test_empty_batch(self):
+        self.assertEqual(self._run(["", "   "]), "ERRORE: Nessuna query fornita.")
+
+    def test_too_many_queries(self):
+        with mock.patch.object(sql_tools.settings, "sql_batch_max_queries", 2):
+            output = self._run(["SELECT 1", "SELECT 2", "SELECT 3"])
+        self.assertTrue(output.startswith("ERRORE: Troppe query nel batch (3)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import unittest
+from pathlib import Path
+
+from app.agents.sql_validator import tokenize, validate_sql_query
+
+CORPUS_PATH = Path(__file__).parent / "benchmarks" / "corpus" / "agent_queries.json"
+
+
+class TestSqlValidator(unittest.TestCase):
+    def test_corpus(self):
+        with open(CORPUS_PATH, encoding="utf-8") as f:
+            corpus = json.load(f)
+        for case in corpus:
+            with self.subTest(query=case["query"]):
+                self.assertEqual(validate_sql_query(case["query"])[0], case["valid"])
+
+    def test_keyword_inside_identifier_is_allowed(self):
+        self.assertTrue(validate_sql_query("SELECT CREATED_AT, CodiceSP_Filiale FROM t")[0])
+
+    def test_keyword_after_digits_is_rejected(self):
+        valid, error = validate_sql_query("SELECT 1EXEC('x')")
+        self.assertFalse(valid)
+        self.assertIn("EXEC", error)
+
+    def test_system_procedure_is_rejected(self):
+        valid, error = validate_sql_query("SELECT * FROM t WHERE 1 = 1 OR sp_who2 = 1")
+        self.assertFalse(valid)
+        self.assertIn("SP_", error)
+
+    def test_trailing_semicolons_and_comments(self):
+        self.assertTrue(validate_sql_query("SELECT a FROM t;; -- fine\n")[0])
+        self.assertFalse(validate_sql_query("SELECT a FROM t; (SELECT 1)")[0])
+
+    def test_escaped_quote_inside_string(self):
+        self.assertTrue(validate_sql_query("SELECT * FROM t WHERE a = 'x'';drop'")[0])
+
+    def test_leading_parenthesis(self):
+        self.assertTrue(validate_sql_query("(SELECT 1) UNION (SELECT 2)")[0])
+        self.assertTrue(validate_sql_query("((SELECT a FROM t)) ORDER BY 1")[0])
+        self.assertFalse(validate_sql_query("(DELETE FROM t)")[0])
+
+    def test_keywords_in_identifier_position_are_allowed(self):
+        self.assertTrue(validate_sql_query("SELECT c.Set, c.[Use], 1 AS Into FROM dbo.Config c")[0])
+        self.assertFalse(validate_sql_query("SELECT 1 AS x DROP TABLE t")[0])
+        self.assertFalse(validate_sql_query("SELECT * INTO dbo.Copia FROM t")[0])
+
+    def test_exemption_covers_only_the_next_token(self):
+        # Letterali e identificatori quotati dopo "."/AS consumano l'esenzione
+        for query in (
+            "SELECT 1 AS [x] DROP TABLE t",
+            "SELECT 1 AS 'x' DELETE FROM t",
+            "SELECT t.[a] DROP TABLE x",
+            "SELECT 1 AS \"x\" EXEC('xp_cmdshell')",
+            "SELECT 1 AS [x] SHUTDOWN",
+        ):
+            with self.subTest(query=query):
+                self.assertFalse(validate_sql_query(query)[0])
+        self.assertTrue(validate_sql_query("SELECT t.[a], 1 AS 'x', 2 AS \"y\" FROM t")[0])
+
+    def test_bare_reserved_column_names_are_rejected(self):
+        # In T-SQL una nuova istruzione può iniziare senza ";": vanno scritte [Set], [Use], [Into]
+        for column in ("Set", "Use", "Into"):
+            with self.subTest(column=column):
+                valid, error = validate_sql_query(f"SELECT {column} FROM dbo.Config")
+                self.assertFalse(valid)
+                self.assertIn(column.upper(), error)
+                self.assertTrue(validate_sql_query(f"SELECT [{column}] FROM dbo.Config")[0])
+
+    def test_validator_and_tokenize_share_word_rules(self):
+        words = [value for kind, value in tokenize("SELECT a$b, $EXEC FROM t") if kind == "word"]
+        self.assertEqual(words, ["SELECT", "a$b", "EXEC", "FROM", "t"])
+        self.assertTrue(validate_sql_query("SELECT a$b FROM t")[0])
+        self.assertFalse(validate_sql_query("SELECT $EXEC FROM t")[0])
+
+    def test_tokenize_kinds(self):
+        kinds = [kind for kind, _ in tokenize("SELECT N'a' -- c\nFROM [t]")]
+        self.assertEqual(kinds, ["word", "ws", "string", "ws", "comment", "ws", "word", "ws", "quoted"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import time
+import unittest
+
+from app.agents.tool_executor import DatabaseGate, DatabaseSlots, SqlToolExecutor
+
+
+class TestDatabaseGate(unittest.TestCase):
+    def test_waiters_are_served_in_fifo_order(self):
+        gate = DatabaseGate(1)
+        order = []
+
+        async def worker(name):
+            await gate.acquire()
+            try:
+                order.append(name)
+                await asyncio.sleep(0.01)
+            finally:
+                gate.release()
+
+        async def main():
+            await gate.acquire()
+            tasks = []
+            for name in ("a", "b", "c"):
+                tasks.append(asyncio.ensure_future(worker(name)))
+                await asyncio.sleep(0)
+            self.assertEqual(gate.queued, 3)
+            gate.release()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(main())
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual((gate.active, gate.queued), (0, 0))
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        gate = DatabaseGate(1)
+
+        async def main():
+            await gate.acquire()
+            waiter = asyncio.ensure_future(gate.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            self.assertEqual(gate.queued, 0)
+            gate.release()
+
+        asyncio.run(main())
+        self.assertEqual(gate.active, 0)
+
+    def test_slot_handed_to_cancelled_waiter_is_passed_on(self):
+        gate = DatabaseGate(1)
+
+        async def main():
+            await gate.acquire()
+            first = asyncio.ensure_future(gate.acquire())
+            second = asyncio.ensure_future(gate.acquire())
+            await asyncio.sleep(0)
+            # Il release assegna lo slot a "first", che viene cancellato prima di riprendere
+            gate.release()
+            first.cancel()
+            await asyncio.gather(first, return_exceptions=True)
+            await asyncio.wait_for(second, timeout=1)
+            self.assertEqual(gate.active, 1)
+            gate.release()
+
+        asyncio.run(main())
+        self.assertEqual((gate.active, gate.queued), (0, 0))
+
+
+class TestSqlToolExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = SqlToolExecutor(max_workers=4, max_concurrent_per_db=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_per_database_limit_and_stats(self):
+        def slow(value):
+            time.sleep(0.05)
+            return value
+
+        async def main():
+            return await asyncio.gather(
+                self.executor.run("sqlite:///a", slow, 1),
+                self.executor.run("sqlite:///a", slow, 2),
+                self.executor.run("sqlite:///b", slow, 3),
+            )
+
+        started = time.perf_counter()
+        self.assertEqual(asyncio.run(main()), [1, 2, 3])
+        # Le due chiamate su "a" sono in serie, quella su "b" in parallelo
+        self.assertGreaterEqual(time.perf_counter() - started, 0.1)
+
+        databases = self.executor.stats()["databases"]
+        self.assertEqual(len(databases), 2)
+        stats_a = next(stats for stats in databases.values() if stats["calls"] == 2)
+        self.assertEqual((stats_a["limit"], stats_a["active"], stats_a["in_flight"]), (1, 0, 0))
+        self.assertGreaterEqual(stats_a["wait_ms_max"], 40)
+        self.assertGreaterEqual(stats_a["exec_ms_avg"], 40)
+
+    def test_errors_are_counted_and_slot_released(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        async def main():
+            with self.assertRaises(RuntimeError):
+                await self.executor.run(None, fail)
+            return await self.executor.run(None, lambda: "ok")
+
+        self.assertEqual(asyncio.run(main()), "ok")
+        stats = next(iter(self.executor.stats()["databases"].values()))
+        self.assertEqual((stats["calls"], stats["errors"], stats["active"]), (2, 1, 0))
+
+
+class TestDatabaseSlots(unittest.TestCase):
+    def test_slots_are_limited_per_database(self):
+        slots = DatabaseSlots(limit=1)
+
+        async def main():
+            release = await slots.acquire("sqlite:///a")
+            other = await slots.acquire("sqlite:///b")  # altro database: nessuna attesa
+            waiting = asyncio.ensure_future(slots.acquire("sqlite:///a"))
+            await asyncio.sleep(0.01)
+            self.assertFalse(waiting.done())
+            release()
+            release()
+            (await waiting)()
+            other()
+
+        asyncio.run(main())
+        self.assertEqual(
+            [(db["active"], db["queued"]) for db in slots.stats()["databases"].values()],
+            [(0, 0), (0, 0)],
+        )
+
+    def test_export_slots_do_not_use_tool_gates(self):
+        executor = SqlToolExecutor(max_workers=2, max_concurrent_per_db=1)
+        self.addCleanup(executor.shutdown)
+        slots = DatabaseSlots(limit=1)
+
+        async def main():
+            release = await slots.acquire("sqlite:///a")
+            try:
+                return await asyncio.wait_for(executor.run("sqlite:///a", lambda: "ok"), timeout=1)
+            finally:
+                release()
+
+        self.assertEqual(asyncio.run(main()), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -37,6 +37,8 @@ def init_session_state():
         st.session_state.pending_prompt = None
     if "faq_suggestions" not in st.session_state:
         st.session_state.faq_suggestions = {}
+    if "agents_cache" not in st.session_state:
+        st.session_state.agents_cache = None  # {"etag": ..., "agents": [...]} da /api/chat/agents
     if "active_page" not in st.session_state:
         st.session_state.active_page = "chat"
 
@@ -114,11 +116,20 @@ def login_page():
 
 
 def get_agents() -> List[Dict]:
-    """Get list of available agents."""
+    """Get list of available agents (revalidated with ETag: 304 reuses the cached list)."""
+    cached = st.session_state.get("agents_cache")
+    headers = {}
+    if cached:
+        headers["If-None-Match"] = cached["etag"]
     try:
-        response = requests.get(f"{API_BASE_URL}/api/chat/agents")
+        response = requests.get(f"{API_BASE_URL}/api/chat/agents", headers=headers)
+        if response.status_code == 304 and cached:
+            return cached["agents"]
         if response.status_code == 200:
-            return response.json()
+            agents = response.json()
+            etag = response.headers.get("ETag")
+            st.session_state.agents_cache = {"etag": etag, "agents": agents} if etag else None
+            return agents
         return []
     except:
         return []
@@ -419,6 +430,10 @@ def chat_page():
                                     
                                     if data["type"] == "conversation_id":
                                         st.session_state.conversation_id = data["id"]
+                                    elif data["type"] == "queue":
+                                        message_placeholder.markdown(
+                                            f"⏳ Molte richieste in corso: sei in coda (posizione {data['position']})..."
+                                        )
                                     elif data["type"] == "content":
                                         full_response += data["content"]
                                         message_placeholder.markdown(full_response + "▌")
@@ -513,6 +528,7 @@ def admin_page():
                 "System prompt": selected_agent.get("system_prompt"),
                 "Attivo": selected_agent.get("is_active"),
                 "Tools": selected_agent.get("tool_names"),
+                "Costo massimo query": selected_agent.get("max_query_cost"),
             })
 
         with col_actions: